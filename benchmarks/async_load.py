@@ -0,0 +1,95 @@
+"""Requests/sec of the hot read endpoints with sync handlers versus DB_ASYNC=true.
+
+Starts uvicorn once per mode against a fresh SQLite file and drives it with
+concurrent httpx clients. Run from the project root:
+
+    python -m benchmarks.async_load --concurrency 200 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from sqlalchemy.orm import sessionmaker
+from benchmarks.common import seed_catalog
+from database import create_db_engine, upgrade_database
+from services import order_service
+import schemas
+
+
+def seed(url: str, orders: int):
+    engine = create_db_engine(url)
+    upgrade_database(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        seed_catalog(db, products=20)
+        for i in range(orders):
+            products = [schemas.OrderProductCreate(product_id=(i + j) % 20 + 1, quantity=1) for j in range(3)]
+            order_service.create_order(order=schemas.OrderCreate(client_id=1, products=products), db=db)
+    engine.dispose()
+
+
+async def drive(base_url: str, concurrency: int, seconds: float, orders: int):
+    paths = ["/orders/?limit=10", "/reports/revenue/"] + [f"/order/{i}/status/" for i in range(1, orders + 1, max(1, orders // 50))]
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def user(client: httpx.AsyncClient, offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get(paths[i % len(paths)])
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            i += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await asyncio.gather(*(user(client, n) for n in range(concurrency)))
+
+    latencies.sort()
+    return len(latencies) / seconds, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+def wait_until_up(base_url: str):
+    for _ in range(100):
+        try:
+            httpx.get(base_url + "/docs")
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='ots-bench-'), 'bench.db')}"
+    seed(url, args.orders)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    for mode in ("false", "true"):
+        env = dict(os.environ, DATABASE_URL=url, DB_ASYNC=mode, PAYMENT_CLIENT="fake", DB_POOL_SIZE="20")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+            env=env
+        )
+        try:
+            wait_until_up(base_url)
+            throughput, p99 = asyncio.run(drive(base_url, args.concurrency, args.seconds, args.orders))
+            print(f"{'async' if mode == 'true' else 'sync':5s} {throughput:8.0f} req/s   p99 {p99:8.2f} ms")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
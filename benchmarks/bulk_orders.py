@@ -0,0 +1,65 @@
+"""Orders/sec through create_order one at a time versus create_orders_bulk in batches.
+
+Both run against the same tuned SQLite engine the app uses (WAL, synchronous=NORMAL).
+Run from the project root:
+
+    python -m benchmarks.bulk_orders --orders 5000 --batch 1000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy.orm import sessionmaker
+from benchmarks.common import seed_catalog
+from database import Base, create_db_engine
+from services import order_service
+import schemas
+
+
+def fresh_session_factory():
+    engine = create_db_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='ots-bench-'), 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        seed_catalog(db, products=200, clients=50)
+    return Session
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=5_000)
+    parser.add_argument("--batch", type=int, default=1_000)
+    parser.add_argument("--lines", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    orders = [
+        {
+            "client_id": rng.randint(1, 50),
+            "products": [{"product_id": rng.randint(1, 200), "quantity": rng.randint(1, 3)} for _ in range(args.lines)]
+        }
+        for _ in range(args.orders)
+    ]
+
+    Session = fresh_session_factory()
+    with Session() as db:
+        start = time.perf_counter()
+        for order in orders:
+            order_service.create_order(order=schemas.OrderCreate.model_validate(order), db=db)
+        single = time.perf_counter() - start
+    print(f"create_order        {args.orders / single:10,.0f} orders/s   ({single:.2f} s)")
+
+    Session = fresh_session_factory()
+    with Session() as db:
+        start = time.perf_counter()
+        for offset in range(0, len(orders), args.batch):
+            result = order_service.create_orders_bulk(entries=orders[offset:offset + args.batch], db=db)
+            assert result["rejected"] == 0, result
+        bulk = time.perf_counter() - start
+    print(f"create_orders_bulk  {args.orders / bulk:10,.0f} orders/s   ({bulk:.2f} s, batches of {args.batch})")
+    print(f"speedup             {single / bulk:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
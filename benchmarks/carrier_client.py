@@ -0,0 +1,150 @@
+"""Per-call latency of DHL tracking calls: a new httpx.AsyncClient per call (before) versus the pooled DHLClient.
+
+Starts benchmarks.fake_carrier in a subprocess, over TLS with a throwaway self-signed certificate
+unless --plain is given, and times --calls tracking calls one after another and --concurrency at a
+time. The server reports how many connections each variant opened. A last pass injects 503s and
+429s to compare how many calls succeed with and without retries. Run from the project root:
+
+    python -m benchmarks.carrier_client --calls 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from benchmarks.common import summarize
+from services.DHL_service import DHLClient, DHL_API_URL_TRACK
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def self_signed_certificate(directory: str):
+    certfile, keyfile = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run([
+        "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+        "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", keyfile, "-out", certfile
+    ], check=True, capture_output=True)
+    return certfile, keyfile
+
+
+async def wait_until_up(base_url: str, verify) -> None:
+    for _ in range(100):
+        try:
+            async with httpx.AsyncClient(verify=verify) as client:
+                await client.get(base_url + "/_stats")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("fake carrier did not start")
+
+
+async def carrier_stats(base_url: str, verify, **reset) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, verify=verify) as client:
+        stats = (await client.get("/_stats")).json()
+        await client.post("/_reset", params=reset)
+    return stats
+
+
+async def run(track, calls: int, concurrency: int):
+    """Time calls tracking calls with at most concurrency in flight; returns per-call ms and how many got a 200"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, succeeded = [], 0
+
+    async def one(i: int):
+        nonlocal succeeded
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await track(f"T{i}")
+                succeeded += response.status_code == 200
+            except httpx.HTTPError:
+                pass
+            samples.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return samples, succeeded
+
+
+async def benchmark(args, base_url: str, certfile) -> None:
+    verify = ssl.create_default_context(cafile=certfile) if certfile else True
+    await wait_until_up(base_url, verify)
+    await carrier_stats(base_url, verify)
+
+    async def per_call(tracking_number: str) -> httpx.Response:
+        # What DHL_service did before: a client, its SSL context and a connection for every call
+        async with httpx.AsyncClient(verify=ssl.create_default_context(cafile=certfile) if certfile else True) as client:
+            return await client.get(base_url + DHL_API_URL_TRACK, params={"trackingNumber": tracking_number})
+
+    pooled = DHLClient(base_url=base_url, verify=verify)
+
+    async def pooled_call(tracking_number: str) -> httpx.Response:
+        return await pooled.request("GET", DHL_API_URL_TRACK, params={"trackingNumber": tracking_number})
+
+    for concurrency in (1, args.concurrency):
+        for label, track in (("per-call client", per_call), ("pooled client", pooled_call)):
+            samples, _ = await run(track, args.calls, concurrency)
+            stats = await carrier_stats(base_url, verify)
+            print(
+                f"{label:<16} concurrency {concurrency:3d}   {summarize(samples)}   "
+                f"{stats['connections']:4d} connections for {stats['requests']} calls"
+            )
+
+    await carrier_stats(base_url, verify, error_rate=args.error_rate, rate_limit_rate=args.error_rate / 2)
+    no_retries = DHLClient(base_url=base_url, verify=verify, max_retries=0)
+    retrying = DHLClient(base_url=base_url, verify=verify, backoff=0.01)
+    for label, client in (("no retries", no_retries), ("jittered retries", retrying)):
+        samples, succeeded = await run(
+            lambda number: client.request("GET", DHL_API_URL_TRACK, params={"trackingNumber": number}),
+            args.calls, args.concurrency
+        )
+        stats = await carrier_stats(base_url, verify)
+        print(
+            f"{label:<16} {succeeded:4d}/{args.calls} succeeded   {summarize(samples)}   "
+            f"{stats['failures']} injected failures"
+        )
+
+    for client in (pooled, no_retries, retrying):
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds the fake carrier takes per call")
+    parser.add_argument("--error-rate", type=float, default=0.2, help="fraction of 503s in the retry pass, half as many 429s on top")
+    parser.add_argument("--plain", action="store_true", help="plain HTTP instead of TLS")
+    args = parser.parse_args()
+    # Every retry logs a warning, which would drown the results
+    logging.getLogger("services.DHL_service").setLevel(logging.ERROR)
+
+    port = free_port()
+    command = [sys.executable, "-m", "benchmarks.fake_carrier", "--port", str(port), "--latency", str(args.latency)]
+    certfile = None
+    if args.plain:
+        base_url = f"http://127.0.0.1:{port}"
+    else:
+        certfile, keyfile = self_signed_certificate(tempfile.mkdtemp(prefix="ots-bench-"))
+        command += ["--certfile", certfile, "--keyfile", keyfile]
+        base_url = f"https://127.0.0.1:{port}"
+
+    server = subprocess.Popen(command)
+    try:
+        asyncio.run(benchmark(args, base_url, certfile))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Client report latency over client_stats at 100k clients.
+
+Run from the project root:
+
+    python -m benchmarks.client_report --clients 100000
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from benchmarks.common import temp_database, timed, summarize
+from services import reporting_service
+import models
+import schemas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    engine, Session = temp_database()
+    rng = random.Random(0)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Client), [
+            {"name": f"Client {i}", "email": f"client{i}@bench.local", "phone_number": "0"} for i in range(args.clients)
+        ])
+        conn.execute(insert(models.ClientStats), [
+            {
+                "client_id": i + 1,
+                "lifetime_spend": rng.uniform(0, 10_000),
+                "order_count": rng.randint(1, 200),
+                "last_order_date": datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 500_000)),
+                "invoice_total": rng.uniform(0, 8_000),
+                "invoice_count": rng.randint(0, 100)
+            }
+            for i in range(args.clients)
+        ])
+
+    with Session() as db:
+        for sort_by in schemas.ClientReportSortEnum:
+            def top_ten():
+                reporting_service.get_client_report_with_history(db=db, sort_by=sort_by, limit=10)
+            print(f"top 10 by {sort_by.value:17s} {summarize(timed(top_ten, args.repeat))}")
+
+        def deep_page():
+            reporting_service.get_client_report(db=db, skip=5_000, limit=50)
+        print(f"page at skip=5000           {summarize(timed(deep_page, args.repeat))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Worker cold start with create_all at import (before) versus verifying the Alembic revision (after).
+
+Spawns --workers processes at once against an already migrated SQLite file, the way a process manager
+boots a fleet. Each one imports the app and runs its schema step: "create_all" reflects every table
+as main.py used to, "verify" is the check the lifespan now runs, which only reads alembic_version.
+Reports time from spawn to ready per worker, and the schema step on its own with the number of
+statements it sends; on a networked database each one is a round trip. Run from the project root:
+
+    python -m benchmarks.cold_start --workers 16 --rounds 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def worker(mode: str) -> None:
+    import main  # noqa: F401, the import is part of the cold start
+    from sqlalchemy import event
+    from database import Base, engine, verify_schema
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    start = time.perf_counter()
+    if mode == "create_all":
+        Base.metadata.create_all(bind=engine)
+    else:
+        verify_schema()
+    print(f"ready {(time.perf_counter() - start) * 1000:.3f} {len(statements)}", flush=True)
+
+
+def boot_fleet(mode: str, workers: int, env: dict):
+    """Spawn the workers together; returns spawn-to-ready seconds and schema step ms per worker, and the step's statement count"""
+    started = time.perf_counter()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.cold_start", "--worker", mode],
+            env=env, stdout=subprocess.PIPE, text=True
+        )
+        for _ in range(workers)
+    ]
+
+    ready, schema = [], []
+    for process in processes:
+        line = process.stdout.readline()
+        ready.append(time.perf_counter() - started)
+        process.wait()
+        assert line.startswith("ready"), f"worker failed to start ({mode})"
+        _, milliseconds, statements = line.split()
+        schema.append(float(milliseconds))
+    return ready, schema, int(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--worker", choices=["create_all", "verify"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker)
+        return
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='ots-bench-'), 'bench.db')}"
+    env = dict(os.environ, DATABASE_URL=url, PAYMENT_CLIENT="fake")
+    subprocess.run([sys.executable, "manage.py", "upgrade"], env=env, check=True, stdout=subprocess.DEVNULL)
+
+    for mode in ("create_all", "verify"):
+        ready, schema = [], []
+        for _ in range(args.rounds):
+            round_ready, round_schema, statements = boot_fleet(mode, args.workers, env)
+            ready += round_ready
+            schema += round_schema
+
+        print(
+            f"{mode:<11} {args.workers} workers   ready median {statistics.median(ready):6.2f} s  max {max(ready):6.2f} s   "
+            f"schema step median {statistics.median(schema):7.2f} ms  max {max(schema):7.2f} ms, {statements} statements"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import os
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+import models
+
+
+def temp_database(name: str = "bench.db"):
+    """Create an empty schema in a throwaway SQLite file and return (engine, session factory)"""
+    path = os.path.join(tempfile.mkdtemp(prefix="ots-bench-"), name)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed_catalog(db, products: int = 200, stock: int = 1_000_000, clients: int = 1):
+    vendor = models.Vendor(name="Bench Vendor", email="vendor@bench.example.com", phone_number="0", address="-", type="bench")
+    db.add(vendor)
+    db.flush()
+
+    db.add_all([
+        models.Client(name=f"Client {i}", email=f"client{i}@bench.example.com", phone_number="0")
+        for i in range(clients)
+    ])
+    db.add_all([
+        models.Product(
+            name=f"Product {i}", description="-", price=1.0 + i % 50, stock=stock,
+            category=f"category-{i % 5}", vendor_id=vendor.id
+        )
+        for i in range(products)
+    ])
+    db.commit()
+
+
+def timed(fn, repeat: int = 20):
+    """Run fn repeat times and return the samples in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"median {statistics.median(ordered):8.2f} ms   p99 {p99:8.2f} ms"
@@ -0,0 +1,82 @@
+"""Bytes and latency of a polling workload with and without If-None-Match revalidation.
+
+Each poll cycle reads order status, shipment tracking, a product page and two reports;
+between cycles a small fraction of orders change status. Run from the project root:
+
+    python -m benchmarks.conditional_get --orders 1000 --cycles 20
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1_000)
+    parser.add_argument("--pollers", type=int, default=100)
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--change-rate", type=float, default=0.02, help="fraction of polled orders updated per cycle")
+    args = parser.parse_args()
+
+    # The app builds its engine at import time, so point it at a scratch database first
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='ots-bench-'), 'bench.db')}"
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    from database import SessionLocal, engine, upgrade_database
+    from benchmarks.common import seed_catalog, summarize
+    from services import order_service
+    import main as app_module
+    import models
+    import schemas
+
+    upgrade_database()
+    with SessionLocal() as db:
+        seed_catalog(db, products=200)
+        for i in range(args.orders):
+            products = [schemas.OrderProductCreate(product_id=(i + j) % 200 + 1, quantity=1) for j in range(3)]
+            order_service.create_order(order=schemas.OrderCreate(client_id=1, products=products), db=db)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Shipment), [
+            {"order_id": i + 1, "tracking_number": f"T{i}", "status": models.ShipmentStatusEnum.SHIPPED.name}
+            for i in range(args.orders)
+        ])
+
+    client = TestClient(app_module.app)
+    rng = random.Random(0)
+    polled = rng.sample(range(1, args.orders + 1), min(args.pollers, args.orders))
+    paths = [path for order_id in polled for path in (f"/order/{order_id}/status/", f"/shipments/{order_id}/")]
+    paths += ["/products/?limit=50", "/reports/orders", "/reports/popular_product?limit=10"]
+    statuses = [models.OrderStatusEnum.APPROVED.value, models.OrderStatusEnum.PENDING.value]
+
+    etags = {}
+    latencies = {False: [], True: []}
+    transferred = {False: 0, True: 0}
+    not_modified = 0
+
+    # Both modes poll the same paths back to back each cycle so they see identical data
+    for cycle in range(args.cycles):
+        for order_id in rng.sample(polled, max(1, int(len(polled) * args.change_rate))):
+            client.put(f"/orders/{order_id}/manual_status/", params={"new_status": statuses[cycle % 2]})
+
+        for path in paths:
+            for conditional in (False, True):
+                headers = {"If-None-Match": etags[path]} if conditional and path in etags else {}
+                start = time.perf_counter()
+                response = client.get(path, headers=headers)
+                latencies[conditional].append((time.perf_counter() - start) * 1000)
+                transferred[conditional] += len(response.content)
+
+                if response.status_code == 304:
+                    not_modified += 1
+                elif conditional:
+                    assert response.status_code == 200, (path, response.status_code, response.text)
+                    etags[path] = response.headers["etag"]
+
+    for conditional, label in ((False, "unconditional"), (True, "If-None-Match")):
+        print(f"{label:14s} {summarize(latencies[conditional])}   body bytes {transferred[conditional]:>10,}")
+    print(f"304s {not_modified}/{len(latencies[True])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Mixed create_order/get_orders throughput under concurrent threads per engine configuration.
+
+Run from the project root:
+
+    python -m benchmarks.db_concurrency --threads 16 --seconds 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from benchmarks.common import seed_catalog
+from database import Base, create_db_engine
+from services import order_service
+import schemas
+
+
+CONFIGURATIONS = {
+    "rollback-journal": {"sqlite_pragmas": {}},
+    "wal": {"sqlite_pragmas": {"journal_mode": "WAL", "busy_timeout": 5000}},
+    "wal-tuned": {},
+}
+
+
+def run(configuration: dict, threads: int, seconds: float, write_ratio: float):
+    path = os.path.join(tempfile.mkdtemp(prefix="ots-bench-"), "bench.db")
+    engine = create_db_engine(f"sqlite:///{path}", pool_size=threads, **configuration)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        seed_catalog(db, products=50)
+
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        rng = random.Random()
+        local = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    if rng.random() < write_ratio:
+                        products = [schemas.OrderProductCreate(product_id=rng.randint(1, 50), quantity=1) for _ in range(5)]
+                        order_service.create_order(order=schemas.OrderCreate(client_id=1, products=products), db=db)
+                    else:
+                        try:
+                            order_service.get_orders(db=db, skip=rng.randint(0, 100), limit=10)
+                        except HTTPException:
+                            pass
+                local.append(time.perf_counter() - start)
+            except (OperationalError, HTTPException):
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    engine.dispose()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float("nan")
+    return len(latencies) / seconds, p99, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    for name, configuration in CONFIGURATIONS.items():
+        throughput, p99, errors = run(configuration, args.threads, args.seconds, args.write_ratio)
+        print(f"{name:17s} {throughput:8.0f} req/s   p99 {p99:8.2f} ms   errors {errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Read-heavy lookup mix with the read-through cache against going to the database every time.
+
+Run from the project root:
+
+    python -m benchmarks.entity_cache --orders 10000 --lookups 20000
+"""
+import argparse
+import random
+from sqlalchemy import insert
+from benchmarks.common import temp_database, seed_catalog, timed, summarize
+from services import order_service, product_service, shipping_service
+import cache
+import models
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--hot", type=int, default=500, help="distinct ids the lookups are drawn from")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine, Session = temp_database()
+    with Session() as db:
+        seed_catalog(db, products=args.hot)
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.Order), [
+            {"client_id": 1, "total_amount": 10.0, "status": models.OrderStatusEnum.SHIPPED.name} for _ in range(args.orders)
+        ])
+        conn.execute(insert(models.Shipment), [
+            {"order_id": i + 1, "tracking_number": f"T{i}", "status": models.ShipmentStatusEnum.SHIPPED.name}
+            for i in range(args.orders)
+        ])
+
+    rng = random.Random(0)
+    lookups = [(rng.randrange(3), rng.randint(1, args.hot)) for _ in range(args.lookups)]
+
+    def run():
+        with Session() as db:
+            for kind, ident in lookups:
+                if kind == 0:
+                    order_service.track_order_status(order_id=ident, db=db)
+                elif kind == 1:
+                    shipping_service.track_shipments(order_id=ident, db=db)
+                else:
+                    product_service.product_availability(product_id=ident, db=db)
+
+    for name, backend in [("database", cache.NullCache()), ("memory cache", cache.LRUCache())]:
+        cache.cache = backend
+        print(f"{args.lookups} lookups, {name:12s} {summarize(timed(run, args.repeat))}")
+        print(f"    {backend.info()}")
+
+
+if __name__ == "__main__":
+    main()
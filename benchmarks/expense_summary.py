@@ -0,0 +1,74 @@
+"""Expense summary over 1M expenses: grouped SQL aggregate vs loading rows and summing in Python.
+
+Run from the project root:
+
+    python -m benchmarks.expense_summary --expenses 1000000
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from benchmarks.common import temp_database, timed, summarize
+from services import expense_service
+import models
+import schemas
+
+
+def python_summary(db, start_date, end_date):
+    expenses = db.query(models.Expense).filter(models.Expense.date >= start_date, models.Expense.date <= end_date).all()
+
+    summary = {
+        "total_amount": sum(expense.amount for expense in expenses),
+        "categories": {category.value: 0 for category in schemas.ExpensecategoryEnum}
+    }
+    for expense in expenses:
+        summary["categories"][expense.category.value] += expense.amount
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--expenses", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine, Session = temp_database()
+    rng = random.Random(0)
+    categories = list(schemas.ExpensecategoryEnum)
+    start = datetime(2023, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, args.expenses, 100_000):
+            conn.execute(insert(models.Expense), [
+                {
+                    "category": rng.choice(categories).name,
+                    "amount": round(rng.uniform(1, 500), 2),
+                    "description": "-",
+                    "date": start + timedelta(minutes=rng.randint(0, 1_000_000))
+                }
+                for _ in range(min(100_000, args.expenses - offset))
+            ])
+
+    window = (datetime(2023, 3, 1), datetime(2024, 3, 1))
+    with Session() as db:
+        def sql():
+            expense_service.get_expense_summary(db=db, start_date=window[0], end_date=window[1])
+        print(f"summary, SQL              {summarize(timed(sql, args.repeat))}")
+
+        for granularity in schemas.ExpenseGranularityEnum:
+            def sql_by_period():
+                expense_service.get_expense_summary(
+                    db=db, start_date=window[0], end_date=window[1], granularity=granularity
+                )
+            print(f"summary by {granularity.value:6s} SQL     {summarize(timed(sql_by_period, args.repeat))}")
+
+        def python():
+            python_summary(db, *window)
+            db.expunge_all()
+        print(f"summary, Python rows      {summarize(timed(python, args.repeat))}")
+
+        sql_result = expense_service.get_expense_summary(db=db, start_date=window[0], end_date=window[1])
+        assert abs(sql_result["total_amount"] - python_summary(db, *window)["total_amount"]) < 1e-3
+
+
+if __name__ == "__main__":
+    main()
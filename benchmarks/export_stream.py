@@ -0,0 +1,68 @@
+"""Peak memory and throughput of the streaming order export as the table grows.
+
+Each size is exported into a fresh database; peak memory should stay flat while time grows linearly.
+Run from the project root:
+
+    python -m benchmarks.export_stream --sizes 1000 100000 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--lines", type=int, default=2, help="order lines per order")
+    args = parser.parse_args()
+
+    # The export opens sessions from database.SessionLocal, so point it at a scratch database before importing
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='ots-bench-'), 'bench.db')}"
+    from sqlalchemy import insert
+    from database import Base, SessionLocal, engine
+    from benchmarks.common import seed_catalog
+    from services import export_service
+    import models
+    import schemas
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        seed_catalog(db, products=200)
+
+    start = datetime(2024, 1, 1)
+    loaded = 0
+    for size in sorted(args.sizes):
+        with engine.begin() as conn:
+            for offset in range(loaded, size, 50_000):
+                batch = range(offset, min(offset + 50_000, size))
+                conn.execute(insert(models.Order), [
+                    {"id": i + 1, "client_id": 1, "total_amount": 10.0, "status": models.OrderStatusEnum.PENDING.name,
+                     "created_at": start + timedelta(seconds=i)}
+                    for i in batch
+                ])
+                conn.execute(insert(models.OrderProduct), [
+                    {"order_id": i + 1, "product_id": (i + j) % 200 + 1, "vendor_id": 1, "quantity": 1, "price": 5.0}
+                    for i in batch for j in range(args.lines)
+                ])
+        loaded = size
+
+        for format in schemas.ExportFormatEnum:
+            began = time.perf_counter()
+            exported = sum(len(chunk) for chunk in export_service.export_orders(format=format))
+            elapsed = time.perf_counter() - began
+
+            # tracemalloc slows allocation-heavy code several times over, so memory gets its own pass
+            tracemalloc.start()
+            for _ in export_service.export_orders(format=format):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f"{size:>10,} orders {format.value:6s} {elapsed:8.2f} s   {exported / 1e6:9.1f} MB out   peak {peak / 1e6:6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Local stand-in for the DHL shipment booking and tracking API.
+
+Serves the two endpoints DHL_service calls with configurable latency and injected failures, and
+counts the TCP connections it accepts so callers can see how many handshakes they paid for.
+Point the app at it with DHL_API_URL, or mount app on an httpx.ASGITransport in-process:
+
+    python -m benchmarks.fake_carrier --port 8081 --latency 0.02 --error-rate 0.1
+"""
+import argparse
+import asyncio
+import random
+from uuid import uuid4
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class FakeCarrier:
+    def __init__(
+            self,
+            latency: float = 0.0,
+            error_rate: float = 0.0,
+            rate_limit_rate: float = 0.0,
+            deliver_rate: float = 0.0,
+            seed: int = 0
+        ):
+        self.latency = latency
+        self.deliver_rate = deliver_rate
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rng = random.Random(seed)
+        self.connections = set()
+        self.requests = 0
+        self.failures = 0
+        self.shipments = {}
+
+    def inject_failure(self):
+        roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            self.failures += 1
+            return JSONResponse({"detail": "Too many requests"}, status_code=429, headers={"Retry-After": "0"})
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.failures += 1
+            return JSONResponse({"detail": "Service unavailable"}, status_code=503)
+        return None
+
+    async def handle(self, request: Request) -> JSONResponse:
+        self.requests += 1
+        self.connections.add(request.client)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        failure = self.inject_failure()
+        if failure is not None:
+            return failure
+
+        if request.method == "POST":
+            tracking_number = uuid4().hex
+            self.shipments[tracking_number] = "booked"
+            return JSONResponse({"shipments": [{"trackingNumber": tracking_number}]})
+
+        tracking_number = request.query_params.get("trackingNumber")
+        if self.shipments.get(tracking_number) != "delivered" and self.rng.random() < self.deliver_rate:
+            self.shipments[tracking_number] = "delivered"
+        return JSONResponse({"shipments": [{"trackingNumber": tracking_number, "status": self.shipments.get(tracking_number, "in transit")}]})
+
+    async def stats(self, request: Request) -> JSONResponse:
+        return JSONResponse({"requests": self.requests, "failures": self.failures, "connections": len(self.connections)})
+
+    async def reset(self, request: Request) -> JSONResponse:
+        self.connections.clear()
+        self.requests = 0
+        self.failures = 0
+        self.error_rate = float(request.query_params.get("error_rate", self.error_rate))
+        self.rate_limit_rate = float(request.query_params.get("rate_limit_rate", self.rate_limit_rate))
+        self.latency = float(request.query_params.get("latency", self.latency))
+        return JSONResponse({})
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/dgff/transportation/shipment-booking", self.handle, methods=["POST"]),
+            Route("/dgff/transportation/v2/shipment-tracking", self.handle, methods=["GET"]),
+            Route("/_stats", self.stats, methods=["GET"]),
+            Route("/_reset", self.reset, methods=["POST"]),
+        ])
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--deliver-rate", type=float, default=0.0, help="chance a tracking call finds the shipment delivered")
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args()
+
+    carrier = FakeCarrier(
+        latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, deliver_rate=args.deliver_rate
+    )
+    uvicorn.run(
+        carrier.app(), host="127.0.0.1", port=args.port, log_level="warning",
+        ssl_certfile=args.certfile, ssl_keyfile=args.keyfile
+    )
+
+
+if __name__ == "__main__":
+    main()
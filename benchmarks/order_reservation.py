@@ -0,0 +1,45 @@
+"""Per-order stock reservation latency versus line-item count.
+
+Compares the old per-line lookup and read-modify-write loop with
+order_service.reserve_stock. Run from the project root:
+
+    python -m benchmarks.order_reservation
+"""
+import argparse
+from benchmarks.common import temp_database, seed_catalog, timed, summarize
+from services import order_service
+import schemas
+import models
+
+
+def legacy_reserve(items, db):
+    for item in items:
+        db_product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
+        if db_product.stock < item.quantity:
+            raise ValueError("not enough stock")
+        db_product.stock -= item.quantity
+    db.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    _, Session = temp_database()
+    with Session() as db:
+        seed_catalog(db, products=max(args.lines))
+
+    for lines in args.lines:
+        items = [schemas.OrderProductCreate(product_id=i + 1, quantity=1) for i in range(lines)]
+        for label, reserve in (("per-line", legacy_reserve), ("batched", order_service.reserve_stock)):
+            def run():
+                with Session() as db:
+                    reserve(items=items, db=db)
+                    db.commit()
+            print(f"{lines:4d} lines  {label:9s} {summarize(timed(run, args.repeat))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Deep page latency: skip/limit versus cursor paging on a seeded SQLite database.
+
+Seeds one million expenses and times fetching the given page of
+expense_service.get_expenses both ways. Run from the project root:
+
+    python -m benchmarks.pagination --rows 1000000 --page 1000
+"""
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from benchmarks.common import temp_database, timed, summarize
+from pagination import encode_cursor
+from services import expense_service
+import models
+
+
+def seed_expenses(engine, rows: int, chunk: int = 50_000):
+    start = datetime(2020, 1, 1)
+    categories = list(models.ExpensecategoryEnum)
+    with engine.begin() as conn:
+        for offset in range(0, rows, chunk):
+            conn.execute(insert(models.Expense), [
+                {
+                    "category": categories[i % len(categories)],
+                    "amount": float(i % 500),
+                    "description": "seed",
+                    "date": start + timedelta(seconds=i * 30)
+                }
+                for i in range(offset, min(rows, offset + chunk))
+            ])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine, Session = temp_database()
+    seed_expenses(engine, args.rows)
+
+    skip = (args.page - 1) * args.page_size
+    with Session() as db:
+        previous = db.query(models.Expense).order_by(*expense_service.EXPENSES_KEYSET).offset(skip - 1).first()
+        cursor = encode_cursor([previous.date, previous.id])
+
+        def offset_page():
+            expense_service.get_expenses(db=db, skip=skip, limit=args.page_size)
+
+        def cursor_page():
+            expense_service.get_expenses(db=db, limit=args.page_size, cursor=cursor)
+
+        print(f"{args.rows} rows, page {args.page} of {args.page_size}")
+        print(f"offset  {summarize(timed(offset_page, args.repeat))}")
+        print(f"cursor  {summarize(timed(cursor_page, args.repeat))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Reconciling pending payments: one PaymentIntent lookup and two commits per order (before) versus
+payment_service.confirm_payments.
+
+Seeds --orders pending orders whose PaymentIntents live in a FakePaymentClient with --latency per
+lookup; --paid-rate of them have succeeded. The sequential variant checks --sequential orders the way
+the confirm_payment endpoint does, one lookup, one status change and its commits at a time; the batch
+job pages through every pending order, looks the intents up concurrently and approves each page with
+one UPDATE. Each variant runs on its own copy of the database. Run from the project root:
+
+    python -m benchmarks.payment_confirmation --orders 10000 --latency 0.05 --concurrency 20 50
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import sessionmaker
+from benchmarks.common import seed_catalog
+from database import create_db_engine, upgrade_database
+from services import aggregate_service, order_service, payment_service
+from cache import invalidate
+import models
+
+
+def seed(path: str, orders: int, client: payment_service.FakePaymentClient, paid_rate: float) -> None:
+    engine = create_db_engine(f"sqlite:///{path}")
+    upgrade_database(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    rng = random.Random(0)
+    with Session() as db:
+        seed_catalog(db, products=200, clients=50)
+        order_service.create_orders_bulk(entries=[
+            {"client_id": i % 50 + 1, "products": [{"product_id": i % 200 + 1, "quantity": 1}]} for i in range(orders)
+        ], db=db)
+
+        rows = []
+        for order_id, total_amount in db.query(models.Order.id, models.Order.total_amount):
+            payment_intent_id = f"pi_bench_{order_id}"
+            client.intents[payment_intent_id] = {
+                "order_id": order_id, "amount": int(total_amount * 100),
+                "status": "succeeded" if rng.random() < paid_rate else "requires_payment_method"
+            }
+            rows.append({"id": order_id, "payment_intent_id": payment_intent_id, "payment_pending": False})
+        db.execute(update(models.Order), rows)
+        db.commit()
+    engine.dispose()
+
+
+async def sequential(db, client, limit: int) -> int:
+    """The confirm_payment endpoint once per order, with the lookup going through the fake client"""
+    pending = db.query(models.Order.id, models.Order.payment_intent_id).filter(
+        models.Order.status == models.OrderStatusEnum.PENDING, models.Order.payment_intent_id != None
+    ).order_by(models.Order.id).limit(limit).all()
+
+    for order_id, payment_intent_id in pending:
+        db_order = db.query(models.Order).filter(models.Order.id == order_id).first()
+        if await client.retrieve_payment_intent(payment_intent_id) != "succeeded":
+            continue
+
+        aggregate_service.record_order_status_changed(
+            db=db, created_at=db_order.created_at, old_status=db_order.status, new_status=models.OrderStatusEnum.APPROVED
+        )
+        db_order.status = models.OrderStatusEnum.APPROVED
+        db.add(models.OrderHistory(order_id=db_order.id, status=db_order.status, changed_at=datetime.utcnow()))
+        invalidate(db, models.Order, db_order.id)
+        db.commit()
+    return len(pending)
+
+
+def run(source: str, variant):
+    path = os.path.join(tempfile.mkdtemp(prefix="ots-bench-"), "bench.db")
+    shutil.copy(source, path)
+    engine = create_db_engine(f"sqlite:///{path}")
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+    with Session() as db:
+        start = time.perf_counter()
+        checked = asyncio.run(variant(db))
+        elapsed = time.perf_counter() - start
+        sent = len(statements)
+
+        approved = db.query(func.count(models.Order.id)).filter(models.Order.status == models.OrderStatusEnum.APPROVED).scalar()
+        history = db.query(func.count(models.OrderHistory.id)).filter(models.OrderHistory.status == models.OrderStatusEnum.APPROVED).scalar()
+        rollup = db.query(func.sum(models.DailyOrderRollup.approved_count)).scalar()
+    engine.dispose()
+    return checked, elapsed, sent, (approved, history, rollup)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--sequential", type=int, default=500, help="orders the one-at-a-time variant checks")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per PaymentIntent lookup")
+    parser.add_argument("--paid-rate", type=float, default=0.8, help="fraction of intents that have succeeded")
+    parser.add_argument("--batch-size", type=int, default=payment_service.PAYMENT_CONFIRM_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[payment_service.PAYMENT_CONFIRM_CONCURRENCY])
+    args = parser.parse_args()
+    logging.getLogger("services.payment_service").setLevel(logging.ERROR)
+
+    client = payment_service.FakePaymentClient(latency=args.latency)
+    source = os.path.join(tempfile.mkdtemp(prefix="ots-bench-"), "seed.db")
+    seed(source, args.orders, client, args.paid_rate)
+
+    variants = [("one at a time", lambda db: sequential(db, client, args.sequential))]
+    for concurrency in args.concurrency:
+        async def batch(db, concurrency=concurrency):
+            totals = await payment_service.confirm_payments(
+                db=db, client=client, batch_size=args.batch_size, concurrency=concurrency
+            )
+            return totals["checked"]
+        variants.append((f"batch x{concurrency}", batch))
+
+    for label, variant in variants:
+        checked, elapsed, sent, (approved, history, rollup) = run(source, variant)
+        print(
+            f"{label:<14} {checked:6d} orders in {elapsed:7.2f} s   {checked / elapsed:8.1f} orders/s   "
+            f"{sent:6d} statements   {approved} approved, {history} history rows, rollup approved={rollup}"
+        )
+
+
+if __name__ == "__main__":
+    main()
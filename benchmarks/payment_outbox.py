@@ -0,0 +1,68 @@
+"""Write transaction time of create_order with the PaymentIntent outbox.
+
+The "inline" run reproduces the old flow (flush, call the payment provider,
+commit) against a fake provider with the given latency; the "outbox" run is
+order_service.create_order followed by draining the worker queue. Run from the
+project root:
+
+    python -m benchmarks.payment_outbox
+"""
+import argparse
+import asyncio
+import time
+from benchmarks.common import temp_database, seed_catalog, timed, summarize
+from services import order_service, payment_service
+import schemas
+import models
+
+
+def inline_create_order(order, db, client):
+    db_products = order_service.reserve_stock(items=order.products, db=db)
+    new_order = models.Order(
+        client_id=order.client_id,
+        total_amount=sum(db_products[item.product_id].price * item.quantity for item in order.products),
+        status=models.OrderStatusEnum.PENDING
+    )
+    db.add(new_order)
+    db.flush()
+    new_order.payment_intent_id = asyncio.run(client.create_payment_intent(order_id=new_order.id, amount=new_order.total_amount))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--provider-latency", type=float, default=0.15, help="seconds per PaymentIntent call")
+    args = parser.parse_args()
+
+    _, Session = temp_database()
+    with Session() as db:
+        seed_catalog(db, products=10)
+
+    client = payment_service.FakePaymentClient(latency=args.provider_latency)
+    order = schemas.OrderCreate(client_id=1, products=[schemas.OrderProductCreate(product_id=i + 1, quantity=1) for i in range(5)])
+
+    def inline():
+        with Session() as db:
+            inline_create_order(order, db, client)
+
+    def outbox():
+        with Session() as db:
+            order_service.create_order(order=order, db=db)
+
+    print(f"inline  {summarize(timed(inline, repeat=20))}")
+    print(f"outbox  {summarize(timed(outbox, repeat=args.orders))}")
+
+    async def drain():
+        with Session() as db:
+            while await payment_service.create_pending_payment_intents(db=db, client=client, batch_size=100):
+                pass
+
+    start = time.perf_counter()
+    asyncio.run(drain())
+    elapsed = time.perf_counter() - start
+    print(f"worker backfilled {args.orders} intents in {elapsed:.2f}s ({args.orders / elapsed:.0f} orders/s)")
+
+
+if __name__ == "__main__":
+    main()
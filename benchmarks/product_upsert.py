@@ -0,0 +1,119 @@
+"""Catalog sync throughput: PATCH-style update_product per row versus the streamed bulk upsert.
+
+The bulk side feeds a generated CSV or JSON body through bulk.iter_records in 64 KB chunks, the way
+POST /products/bulk receives it, and reports peak traced memory to show it does not grow with the body.
+Run from the project root:
+
+    python -m benchmarks.product_upsert --rows 100000 --existing 50000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+from benchmarks.common import seed_catalog
+from bulk import iter_records
+from database import Base, create_db_engine
+from services import product_service
+import schemas
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def fresh_session_factory(existing: int):
+    engine = create_db_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='ots-bench-'), 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        seed_catalog(db, products=existing, stock=100)
+    return Session
+
+
+def csv_body(rows: int):
+    # Half the rows update seeded products by name, the rest are new
+    yield "name,vendor_id,description,price,stock,category\n"
+    for i in range(rows):
+        yield f"Product {i},1,synced,{1 + i % 97}.5,{i % 500},category-{i % 5}\n"
+
+
+def json_body(rows: int):
+    yield "["
+    for i in range(rows):
+        record = {"name": f"Product {i}", "vendor_id": 1, "description": "synced", "price": 1 + i % 97 + 0.5, "stock": i % 500, "category": f"category-{i % 5}"}
+        yield ("," if i else "") + json.dumps(record)
+    yield "]"
+
+
+def chunked(parts):
+    buffer = ""
+    for part in parts:
+        buffer += part
+        if len(buffer) >= CHUNK_SIZE:
+            yield buffer.encode()
+            buffer = ""
+    yield buffer.encode()
+
+
+def request_for(body, content_type: str) -> Request:
+    chunks = chunked(body)
+
+    async def receive():
+        chunk = next(chunks, None)
+        return {"type": "http.request", "body": chunk or b"", "more_body": chunk is not None}
+
+    scope = {"type": "http", "method": "POST", "path": "/products/bulk", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+
+def run_bulk(Session, body, content_type: str) -> dict:
+    with Session() as db:
+        return asyncio.run(product_service.upsert_products(iter_records(request_for(body, content_type)), db=db))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--existing", type=int, default=50_000)
+    parser.add_argument("--single-rows", type=int, default=2_000, help="rows sent through update_product one at a time")
+    args = parser.parse_args()
+
+    Session = fresh_session_factory(args.existing)
+    with Session() as db:
+        start = time.perf_counter()
+        for product_id in range(1, args.single_rows + 1):
+            product_service.update_product(
+                product_id=product_id, product_update=schemas.ProductUpdate(price=2.5, stock=product_id % 500), db=db
+            )
+        single = time.perf_counter() - start
+    print(f"update_product per row    {args.single_rows / single:10,.0f} rows/s")
+
+    for label, body, content_type in (
+        ("csv", lambda: csv_body(args.rows), "text/csv"),
+        ("json", lambda: json_body(args.rows), "application/json"),
+    ):
+        Session = fresh_session_factory(args.existing)
+        start = time.perf_counter()
+        summary = run_bulk(Session, body(), content_type)
+        elapsed = time.perf_counter() - start
+        assert summary["rejected"] == 0, summary
+
+        # Memory is traced in a separate pass, tracemalloc slows the timed one down considerably
+        Session = fresh_session_factory(args.existing)
+        tracemalloc.start()
+        run_bulk(Session, body(), content_type)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(
+            f"bulk upsert {label:<4}          {args.rows / elapsed:10,.0f} rows/s   "
+            f"({summary['created']:,} created, {summary['updated']:,} updated, {elapsed:.2f} s, peak {peak / 2**20:.1f} MB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Query-plan regression check: no statement the API issues should full-scan a large table.
+
+Seeds a scratch SQLite database, drives the API through a TestClient, records every statement
+the services send and runs EXPLAIN QUERY PLAN on each. A plain "SCAN <table>" on a table of at
+least --min-rows rows is reported, except for unfiltered paged reads (no WHERE, with LIMIT) and
+the deliberate full reads listed in EXPECTED_SCANS.
+Index scans ("SCAN ... USING INDEX") are fine. Exits with status 1 when anything is reported,
+so it can gate CI. Run from the project root:
+
+    python -m benchmarks.query_plans --orders 20000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+
+SCAN = re.compile(r"^SCAN (\S+)(?: AS (\S+))?(.*)$")
+PLANNED = ("SELECT", "UPDATE", "DELETE", "WITH", "INSERT INTO")
+# Statements that read (nearly) the whole table on purpose, keyed by a fragment of their SQL
+EXPECTED_SCANS = {
+    "products.units_sold > ?": "the product leaderboard loads every product with sales when it refreshes",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--min-rows", type=int, default=1_000, help="smaller tables may be scanned")
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not only the failures")
+    args = parser.parse_args()
+
+    # The app builds its engine at import time, so point it at a scratch database first,
+    # and turn the entity cache off so every lookup reaches the database
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='ots-bench-'), 'bench.db')}"
+    os.environ["CACHE_BACKEND"] = "none"
+    os.environ.setdefault("PAYMENT_CLIENT", "fake")
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, func, insert, select, text
+    from database import Base, SessionLocal, engine, upgrade_database
+    from benchmarks.common import seed_catalog
+    from services import order_service, payment_service
+    import main as app_module
+    import models
+
+    upgrade_database()
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        seed_catalog(db, products=2_000, clients=2_000)
+        for offset in range(0, args.orders, 1_000):
+            order_service.create_orders_bulk(entries=[
+                {
+                    "client_id": rng.randint(1, 2_000),
+                    "products": [{"product_id": rng.randint(1, 2_000), "quantity": 1} for _ in range(3)]
+                }
+                for _ in range(min(1_000, args.orders - offset))
+            ], db=db)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Shipment), [
+            {"order_id": order_id, "tracking_number": f"T{order_id}", "status": models.ShipmentStatusEnum.SHIPPED.name}
+            for order_id in range(1, args.orders + 1, 2)
+        ])
+        conn.execute(insert(models.Invoice), [
+            {"order_id": order_id, "amount": 10.0, "status": models.InvoiceStatusEnum.PENDING.name, "due_date": now}
+            for order_id in range(1, args.orders + 1, 2)
+        ])
+        conn.execute(insert(models.Expense), [
+            {
+                "category": rng.choice(list(models.ExpensecategoryEnum)).name, "amount": 1.0, "description": "-",
+                "date": now - timedelta(days=rng.randint(0, 365))
+            }
+            for _ in range(args.orders)
+        ])
+        # Spread orders over a year so date ranges are selective, as they are in production
+        conn.execute(text("UPDATE orders SET created_at = datetime(created_at, '-' || (id % 365) || ' days')"))
+        conn.execute(text("UPDATE orders SET payment_intent_id = 'pi_plan_' || id, payment_pending = 0"))
+        conn.execute(text("UPDATE invoices SET due_date = datetime(due_date, '-' || (id % 365) || ' days')"))
+        conn.execute(text("ANALYZE"))
+
+    statements = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(PLANNED) and "sqlite_" not in statement:
+            statements.setdefault(statement, parameters)
+
+    event.listen(engine, "before_cursor_execute", record)
+
+    start = (now - timedelta(days=30)).isoformat()
+    end = now.isoformat()
+    order_id = args.orders // 2 + 1
+    shipped_id = 1
+    reads = [
+        "/orders/?limit=20", "/orders/?limit=20&cursor={cursor}", f"/order/{order_id}/status/",
+        f"/orders/order_history/?order_id={order_id}", f"/orders/order_history/?before={end}",
+        "/orders/order_history/?limit=20&cursor={history_cursor}", f"/orders/order_history/?order_id={order_id}&cursor={{history_cursor}}",
+        "/clients/?limit=20", "/clients/17/order_history",
+        "/products/?limit=20", "/products/17/availability",
+        f"/shipments/{shipped_id}/", f"/invoices/{shipped_id}/status/", "/invoices/?limit=20",
+        f"/expenses/?category=shipping&start_date={start}", f"/expenses/summary/?start_date={start}&end_date={end}",
+        f"/expenses/summary/?start_date={start}&granularity=week",
+        f"/reports/revenue/?start_date={start}&end_date={end}", f"/reports/orders?start_date={start}&end_date={end}",
+        f"/reports/popular_product?limit=5&start_date={start}", "/reports/popular_product?limit=5&category=category-1",
+        f"/reports/expense/?start_date={start}&end_date={end}", "/reports/client/?limit=5", "/reports/client_history/?limit=5",
+        f"/reports/vendor/?start_date={start}&end_date={end}",
+        f"/export/orders?start_date={start}", f"/export/invoices?start_date={start}", f"/export/expenses?start_date={start}&category=shipping",
+    ]
+
+    with TestClient(app_module.app) as client:
+        cursor = client.get("/orders/?limit=20").headers.get("x-next-cursor", "")
+        history_cursor = client.get("/orders/order_history/?limit=20").headers.get("x-next-cursor", "")
+        for path in reads:
+            response = client.get(path.format(cursor=cursor, history_cursor=history_cursor))
+            assert response.status_code < 500, (path, response.status_code, response.text)
+
+        writes = [
+            ("post", "/orders/", {"json": {"client_id": 3, "products": [{"product_id": 5, "quantity": 1}]}}),
+            ("put", f"/order/{order_id}/product/", {"json": {"product_id": 9, "quantity": 1, "action": "add"}}),
+            ("put", f"/orders/{order_id}/manual_status/", {"params": {"new_status": "approved"}}),
+            ("post", f"/orders/{order_id}/shipments/", {}),
+            ("post", "/shipments/wave", {"json": {"order_ids": list(range(order_id + 1, order_id + 50))}}),
+            ("post", "/shipments/wave", {"json": {"limit": 50}}),
+            ("patch", f"/shipments/{order_id}/update", {"json": {"status": "delivered"}}),
+            ("get", f"/invoices/{order_id}", {}),
+            ("patch", "/products/18", {"json": {"stock": 5}}),
+            ("patch", "/clients/18", {"json": {"name": "renamed"}}),
+            ("delete", "/products/19", {}),
+            ("delete", "/clients/19", {}),
+        ]
+        for method, path, options in writes:
+            response = getattr(client, method)(path, **options)
+            assert response.status_code < 500, (path, response.status_code, response.text)
+
+    # Reconciliation runs from manage.py rather than an endpoint; one page with half the intents paid
+    payments = payment_service.FakePaymentClient()
+    payments.intents = {f"pi_plan_{i}": {"status": "succeeded"} for i in range(order_id, order_id + 100, 2)}
+    logging.getLogger("services.payment_service").setLevel(logging.ERROR)
+    with SessionLocal() as db:
+        asyncio.run(payment_service.confirm_pending_payments(db=db, client=payments, batch_size=100, after_id=order_id - 1))
+
+    event.remove(engine, "before_cursor_execute", record)
+
+    with engine.connect() as conn:
+        sizes = {table.name: conn.scalar(select(func.count()).select_from(table)) for table in Base.metadata.sorted_tables}
+        failures = 0
+        for statement, parameters in statements.items():
+            plan = [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            paged = " LIMIT " in statement and " WHERE " not in statement
+            expected = any(fragment in statement for fragment in EXPECTED_SCANS)
+            scans = []
+            for detail in plan:
+                match = SCAN.match(detail)
+                if not match or "USING" in match.group(3):
+                    continue
+                # Aliases look like orders_1 when the statement names the table more than once
+                table = match.group(1) if match.group(1) in sizes else re.sub(r"_\d+$", "", match.group(1))
+                if sizes.get(table, 0) >= args.min_rows and not paged and not expected:
+                    scans.append(f"{table} ({sizes[table]:,} rows)")
+
+            if scans or args.verbose:
+                print(("FULL SCAN " + ", ".join(scans)) if scans else "ok")
+                print("  " + " ".join(statement.split()))
+                for detail in plan:
+                    print(f"    {detail}")
+            failures += bool(scans)
+
+    print(f"{len(statements)} distinct statements, {failures} with full scans of tables over {args.min_rows:,} rows")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
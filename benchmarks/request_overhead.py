@@ -0,0 +1,90 @@
+"""Latency cost of the request instrumentation, and a check that an N+1 handler gets flagged.
+
+Drives a few read endpoints through a TestClient with the middleware and statement hooks installed
+and again with both removed, alternating rounds so both see the same warm caches. Then mounts a
+deliberately lazy endpoint that touches order.client for every order on a page and reports the
+X-N-Plus-One header and counter it produces. Run from the project root:
+
+    python -m benchmarks.request_overhead --requests 2000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2_000, help="requests per mode")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # The app builds its engine at import time, so point it at a scratch database first
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='ots-bench-'), 'bench.db')}"
+    os.environ["INSTRUMENTATION_HEADERS"] = "true"
+    os.environ.setdefault("PAYMENT_CLIENT", "fake")
+    from fastapi import Depends
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from database import SessionLocal, engine, get_db, upgrade_database
+    from benchmarks.common import seed_catalog, summarize
+    from instrumentation import InstrumentationMiddleware, after_cursor_execute, before_cursor_execute, metrics
+    from services import order_service
+    import main as app_module
+    import models
+
+    upgrade_database()
+    with SessionLocal() as db:
+        seed_catalog(db, products=200, clients=50)
+        order_service.create_orders_bulk(entries=[
+            {"client_id": i % 50 + 1, "products": [{"product_id": i % 200 + 1, "quantity": 1}]}
+            for i in range(1_000)
+        ], db=db)
+
+    app = app_module.app
+    instrumented = list(app.user_middleware)
+    bare = [middleware for middleware in instrumented if middleware.cls is not InstrumentationMiddleware]
+
+    def configure(enabled: bool) -> None:
+        app.user_middleware = instrumented if enabled else bare
+        app.middleware_stack = app.build_middleware_stack()
+        for name, hook in (("before_cursor_execute", before_cursor_execute), ("after_cursor_execute", after_cursor_execute)):
+            if enabled and not event.contains(engine, name, hook):
+                event.listen(engine, name, hook)
+            if not enabled and event.contains(engine, name, hook):
+                event.remove(engine, name, hook)
+
+    @app.get("/bench/lazy_clients")
+    def lazy_clients(db: Session = Depends(get_db)):
+        # One query for the page, then one lazy load per distinct client: the pattern the check is for
+        orders = db.query(models.Order).order_by(models.Order.id).limit(50).all()
+        return [{"order": order.id, "client": order.client.name} for order in orders]
+
+    paths = ["/orders/?limit=20", "/products/?limit=20", "/clients/7/order_history", "/reports/popular_product?limit=5"]
+    samples = {True: [], False: []}
+    with TestClient(app) as client:
+        for path in paths:
+            client.get(path)
+        for _ in range(args.rounds):
+            for enabled in (False, True):
+                configure(enabled)
+                for i in range(args.requests // args.rounds):
+                    start = time.perf_counter()
+                    client.get(paths[i % len(paths)])
+                    samples[enabled].append((time.perf_counter() - start) * 1000)
+
+        configure(True)
+        response = client.get("/bench/lazy_clients")
+
+    for enabled in (False, True):
+        print(f"{'instrumented' if enabled else 'bare':<13} {len(samples[enabled]):6d} requests   {summarize(samples[enabled])}")
+    overhead = statistics.median(samples[True]) - statistics.median(samples[False])
+    print(f"overhead      {overhead * 1000:6.1f} us per request (median)")
+    print(f"lazy endpoint {response.headers['x-db-statements']} statements, X-N-Plus-One: {response.headers.get('x-n-plus-one', '-')}")
+    print(next(line for line in metrics.render().splitlines() if line.startswith("n_plus_one_requests_total")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Shipping a wave of approved orders: create_shipments once per order (before) versus create_shipment_wave.
+
+Seeds --orders approved orders and ships all of them, each variant on its own copy of the database.
+Reports wall time, SQL statements sent and a check that both leave the same shipments, history and
+daily rollups behind. Run from the project root:
+
+    python -m benchmarks.shipment_wave --orders 1000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import sessionmaker
+from benchmarks.common import seed_catalog
+from database import create_db_engine, upgrade_database
+from services import aggregate_service, order_service, shipping_service
+import models
+
+
+def seed(path: str, orders: int) -> None:
+    engine = create_db_engine(f"sqlite:///{path}")
+    upgrade_database(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        seed_catalog(db, products=200, clients=50)
+        order_service.create_orders_bulk(entries=[
+            {"client_id": i % 50 + 1, "products": [{"product_id": i % 200 + 1, "quantity": 1}]} for i in range(orders)
+        ], db=db)
+        day = db.query(models.Order.created_at).first()[0].date()
+        db.execute(update(models.Order).values(status=models.OrderStatusEnum.APPROVED))
+        aggregate_service.increment_daily_rollups(db, {day: {
+            aggregate_service.status_column(models.OrderStatusEnum.PENDING): -orders,
+            aggregate_service.status_column(models.OrderStatusEnum.APPROVED): orders
+        }})
+        db.commit()
+    engine.dispose()
+
+
+def run(source: str, ship):
+    path = os.path.join(tempfile.mkdtemp(prefix="ots-bench-"), "bench.db")
+    shutil.copy(source, path)
+    engine = create_db_engine(f"sqlite:///{path}")
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+    with Session() as db:
+        order_ids = [order_id for (order_id,) in db.query(models.Order.id).order_by(models.Order.id)]
+        statements.clear()
+        start = time.perf_counter()
+        ship(db, order_ids)
+        elapsed = time.perf_counter() - start
+        sent = len(statements)
+
+        shipments = db.query(func.count(models.Shipment.id)).scalar()
+        history = db.query(func.count(models.OrderHistory.id)).filter(models.OrderHistory.status == models.OrderStatusEnum.SHIPPED).scalar()
+        rollup = db.query(func.sum(models.DailyOrderRollup.shipped_count), func.sum(models.DailyOrderRollup.approved_count)).one()
+    engine.dispose()
+    return elapsed, sent, (shipments, history, tuple(rollup))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1_000)
+    args = parser.parse_args()
+
+    source = os.path.join(tempfile.mkdtemp(prefix="ots-bench-"), "seed.db")
+    seed(source, args.orders)
+
+    def one_by_one(db, order_ids):
+        for order_id in order_ids:
+            shipping_service.create_shipments(order_id=order_id, db=db)
+
+    outcomes = []
+    for label, ship in (
+        ("per order", one_by_one),
+        ("wave", lambda db, order_ids: shipping_service.create_shipment_wave(db=db, order_ids=order_ids)),
+    ):
+        elapsed, sent, outcome = run(source, ship)
+        outcomes.append(outcome)
+        print(f"{label:<10} {args.orders} orders in {elapsed:7.3f} s   {args.orders / elapsed:9.1f} orders/s   {sent:6d} statements")
+
+    shipments, history, (shipped, approved) = outcomes[-1]
+    print(f"{shipments} shipments, {history} history rows, rollup shipped={shipped} approved={approved}; "
+          f"{'same' if outcomes[0] == outcomes[1] else 'DIFFERENT'} end state for both variants")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Deleting a client with a large order history: the previous ORM loop versus the set-based delete_client.
+
+The ORM variant is the old implementation, kept here for comparison: it lazy-loads every order and
+nulls client_id one object at a time. Each variant runs on its own copy of the seeded database, once
+timed and once under tracemalloc for peak memory. Run from the project root:
+
+    python -m benchmarks.soft_delete --orders 100000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+from benchmarks.common import seed_catalog
+from database import Base, create_db_engine
+from cache import invalidate
+from services import client_service
+import models
+
+
+def seed(path: str, orders: int) -> None:
+    engine = create_db_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        seed_catalog(db, products=10, clients=2)
+        now = datetime.utcnow()
+        rows = [
+            {"client_id": 1 + (i % 10 == 0), "status": models.OrderStatusEnum.DELIVERED, "total_amount": 10.0, "created_at": now}
+            for i in range(orders)
+        ]
+        db.execute(insert(models.Order), rows)
+        db.commit()
+    engine.dispose()
+
+
+def orm_delete_client(client_id: int, db) -> None:
+    db_client = db.query(models.Client).filter(models.Client.id == client_id, models.Client.is_deleted == False).first()
+    db_client.is_deleted = True
+    invalidate(db, models.Order, *(order.id for order in db_client.orders))
+    for order in db_client.orders:
+        order.client_id = None
+    invalidate(db, models.Client, client_id)
+    db.commit()
+
+
+def run(source: str, delete, trace: bool):
+    path = os.path.join(tempfile.mkdtemp(prefix="ots-bench-"), "bench.db")
+    shutil.copy(source, path)
+    engine = create_db_engine(f"sqlite:///{path}")
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with Session() as db:
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        delete(1, db)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+        if trace:
+            tracemalloc.stop()
+        detached = db.query(models.Order).filter(models.Order.client_id == None).count()
+    engine.dispose()
+    return elapsed, peak, detached
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100_000)
+    args = parser.parse_args()
+
+    source = os.path.join(tempfile.mkdtemp(prefix="ots-bench-"), "seed.db")
+    seed(source, args.orders)
+
+    for label, delete in (
+        ("ORM loop", orm_delete_client),
+        ("set-based", lambda client_id, db: client_service.delete_client(client_id=client_id, db=db)),
+    ):
+        elapsed, _, detached = run(source, delete, trace=False)
+        _, peak, _ = run(source, delete, trace=True)
+        print(f"{label:<10} {elapsed:8.2f} s   peak {peak / 2**20:8.1f} MB   ({detached:,} orders detached)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Carrier calls and latency when many customers refresh the same orders, with and without the tracking cache.
+
+Each round --customers readers ask at once for the status of one of --shipments tracking numbers,
+then wait --interval seconds. Uncached, every read is a DHL tracking call; cached, reads within the
+TTL are hits and concurrent misses for one number share a call. A last phase slows the fake carrier
+down to --slow-latency to show stale-while-revalidate keeping reads fast. TTLs are scaled down so
+the run takes seconds. Run from the project root:
+
+    python -m benchmarks.tracking_cache --customers 200 --shipments 20 --rounds 10
+"""
+import argparse
+import asyncio
+import logging
+import random
+import subprocess
+import sys
+import time
+from benchmarks.carrier_client import carrier_stats, free_port, wait_until_up
+from benchmarks.common import summarize
+from cache import AsyncCache
+from services import DHL_service
+
+
+async def rounds(read, args, rng) -> list:
+    samples = []
+
+    async def one(tracking_number: str):
+        start = time.perf_counter()
+        await read(tracking_number)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    for _ in range(args.rounds):
+        await asyncio.gather(*(one(f"T{rng.randrange(args.shipments)}") for _ in range(args.customers)))
+        await asyncio.sleep(args.interval)
+    return samples
+
+
+async def benchmark(args, base_url: str) -> None:
+    await wait_until_up(base_url, True)
+    await carrier_stats(base_url, True)
+    client = DHL_service.DHLClient(base_url=base_url, rate_limit=0)
+    tracking_cache = AsyncCache(ttl=args.ttl, stale_ttl=args.stale_ttl)
+
+    async def uncached(tracking_number: str):
+        return await DHL_service.track_dhl_shipment(tracking_number=tracking_number, client=client)
+
+    async def cached(tracking_number: str):
+        return await tracking_cache.get_or_load(tracking_number, lambda: uncached(tracking_number))
+
+    for label, read in (("uncached", uncached), ("cached", cached)):
+        samples = await rounds(read, args, random.Random(0))
+        stats = await carrier_stats(base_url, True)
+        print(f"{label:<9} {len(samples):6d} reads   {stats['requests']:6d} carrier calls   {summarize(samples)}")
+    print(f"cache     {tracking_cache.info()}")
+
+    # Let every entry go stale, then slow the carrier down: cached reads keep answering from the stale
+    # entries while one refresh per number runs in the background
+    await asyncio.sleep(args.ttl)
+    await carrier_stats(base_url, True, latency=args.slow_latency)
+    for label, read in (("uncached", uncached), ("cached", cached)):
+        samples = await rounds(read, argparse.Namespace(**{**vars(args), "rounds": 1}), random.Random(1))
+        stats = await carrier_stats(base_url, True)
+        print(f"{label:<9} slow carrier   {len(samples):4d} reads   {stats['requests']:4d} carrier calls   {summarize(samples)}")
+
+    await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=200, help="concurrent reads per round")
+    parser.add_argument("--shipments", type=int, default=20, help="distinct tracking numbers being read")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between rounds")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds the fake carrier takes per call")
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--ttl", type=float, default=2.0)
+    parser.add_argument("--stale-ttl", type=float, default=60.0)
+    args = parser.parse_args()
+    # Connections the fake carrier closed while idle are retried with a warning each
+    logging.getLogger("services.DHL_service").setLevel(logging.ERROR)
+
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.fake_carrier", "--port", str(port), "--latency", str(args.latency)])
+    try:
+        asyncio.run(benchmark(args, f"http://127.0.0.1:{port}"))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
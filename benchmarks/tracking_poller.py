@@ -0,0 +1,148 @@
+"""Refreshing shipment tracking: one shipment at a time (before) versus the batched tracking poller.
+
+Seeds in-transit shipments with estimated deliveries spread over the next --days days, starts
+benchmarks.fake_carrier with --latency per call, and times both variants on their own copy of the
+database. The sequential variant tracks and commits one shipment per call, as on-demand tracking
+would; the poller pages through due shipments, tracks a page concurrently under the rate limit and
+writes it back with bulk UPDATEs. Also reports how many carrier calls a day the adaptive schedule
+costs against polling every shipment at the minimum interval. Run from the project root:
+
+    python -m benchmarks.tracking_poller --shipments 5000 --latency 0.05
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, insert
+from sqlalchemy.orm import sessionmaker
+from benchmarks.carrier_client import free_port, wait_until_up
+from database import create_db_engine, upgrade_database
+from services import DHL_service, tracking_service
+import models
+
+
+def seed(path: str, shipments: int, days: int) -> None:
+    engine = create_db_engine(f"sqlite:///{path}")
+    upgrade_database(bind=engine)
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(models.Order), [
+            {"status": models.OrderStatusEnum.SHIPPED.name, "total_amount": 10.0, "created_at": now} for _ in range(shipments)
+        ])
+        conn.execute(insert(models.Shipment), [
+            {
+                "order_id": i + 1, "tracking_number": f"T{i}", "status": models.ShipmentStatusEnum.IN_TRANSIT.name,
+                "estimated_delivery_date": now + timedelta(hours=rng.uniform(-12, days * 24)), "next_check_at": now
+            }
+            for i in range(shipments)
+        ])
+    engine.dispose()
+
+
+def open_copy(source: str):
+    path = os.path.join(tempfile.mkdtemp(prefix="ots-bench-"), "bench.db")
+    shutil.copy(source, path)
+    engine = create_db_engine(f"sqlite:///{path}")
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine), statements
+
+
+async def sequential(Session, client, limit: int) -> int:
+    with Session() as db:
+        shipments = db.query(models.Shipment).filter(models.Shipment.next_check_at != None).limit(limit).all()
+        for shipment in shipments:
+            status = await DHL_service.track_dhl_shipment(tracking_number=shipment.tracking_number, client=client)
+            shipment.status = tracking_service.carrier_status(status) or shipment.status
+            shipment.next_check_at = tracking_service.next_check(shipment.status, shipment.estimated_delivery_date, datetime.utcnow())
+            db.commit()
+    return len(shipments)
+
+
+async def batched(Session, client, batch_size: int) -> int:
+    polled = 0
+    while True:
+        with Session() as db:
+            count = await tracking_service.refresh_tracking_batch(db=db, client=client, batch_size=batch_size)
+        polled += count
+        if count < batch_size:
+            return polled
+
+
+def calls_per_day(Session) -> float:
+    """Carrier calls a day the schedule left behind by a sweep implies, counting every active shipment at its interval"""
+    with Session() as db:
+        now = db.query(func.max(models.Shipment.updated_at)).scalar() or datetime.utcnow()
+        intervals = [
+            max((next_check_at - now).total_seconds(), tracking_service.TRACKING_MIN_INTERVAL.total_seconds())
+            for (next_check_at,) in db.query(models.Shipment.next_check_at).filter(models.Shipment.next_check_at != None)
+        ]
+    return sum(86_400 / interval for interval in intervals)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shipments", type=int, default=5_000)
+    parser.add_argument("--sequential", type=int, default=300, help="shipments the one-at-a-time variant tracks")
+    parser.add_argument("--days", type=int, default=30, help="estimated deliveries are spread over this many days")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the fake carrier takes per call")
+    parser.add_argument("--batch-size", type=int, default=tracking_service.TRACKING_BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=0, help="carrier calls per second, 0 for no limit")
+    args = parser.parse_args()
+    logging.getLogger("services.tracking_service").setLevel(logging.ERROR)
+
+    source = os.path.join(tempfile.mkdtemp(prefix="ots-bench-"), "seed.db")
+    seed(source, args.shipments, args.days)
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_carrier", "--port", str(port),
+        "--latency", str(args.latency), "--deliver-rate", "0.05"
+    ])
+
+    async def run():
+        await wait_until_up(base_url, True)
+        client = DHL_service.DHLClient(base_url=base_url, rate_limit=args.rate)
+        for label, variant, count in (
+            ("one at a time", lambda Session: sequential(Session, client, args.sequential), args.sequential),
+            ("batched poller", lambda Session: batched(Session, client, args.batch_size), args.shipments),
+        ):
+            engine, Session, statements = open_copy(source)
+            start = time.perf_counter()
+            polled = await variant(Session)
+            elapsed = time.perf_counter() - start
+            updates = sum(statement.startswith("UPDATE") for statement in statements)
+            print(
+                f"{label:<15} {polled:6d} shipments in {elapsed:7.2f} s   {polled / elapsed:8.1f} shipments/s   "
+                f"{len(statements):6d} statements, {updates} UPDATE"
+            )
+            if label == "batched poller":
+                with Session() as db:
+                    delivered = db.query(models.Shipment).filter(models.Shipment.status == models.ShipmentStatusEnum.DELIVERED).count()
+                adaptive = calls_per_day(Session)
+                fixed = (args.shipments - delivered) * 86_400 / tracking_service.TRACKING_MIN_INTERVAL.total_seconds()
+                print(
+                    f"{delivered} delivered; schedule after the sweep: {adaptive:,.0f} carrier calls a day "
+                    f"vs {fixed:,.0f} polling every {tracking_service.TRACKING_MIN_INTERVAL}"
+                )
+            engine.dispose()
+        await client.aclose()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, List
+from fastapi import HTTPException, Request, status
+
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_MEDIA_TYPES = ("text/csv",)
+NUMBER_CHARACTERS = frozenset("0123456789+-.eE")
+
+
+async def iter_lines(request: Request) -> AsyncIterator[str]:
+    """Decode the request body incrementally and yield it line by line"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+def invalid_body() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Body must be a JSON array, NDJSON or CSV"
+    )
+
+
+async def iter_json_array(request: Request) -> AsyncIterator[Any]:
+    """Decode the elements of a top-level JSON array one at a time as the body streams in"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parser = json.JSONDecoder()
+    chunks = request.stream().__aiter__()
+    buffer = ""
+    position = 0
+    finished = False
+
+    async def read_more() -> bool:
+        nonlocal buffer, position, finished
+        if finished:
+            return False
+        chunk = await anext(chunks, None)
+        finished = chunk is None
+        buffer = buffer[position:] + decoder.decode(chunk or b"", final=finished)
+        position = 0
+        return True
+
+    async def next_token() -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not await read_more():
+                return ""
+
+    if await next_token() != "[":
+        raise invalid_body()
+    position += 1
+
+    if await next_token() == "]":
+        position += 1
+    else:
+        while True:
+            await next_token()
+            try:
+                record, end = parser.raw_decode(buffer, position)
+            except ValueError:
+                end = None
+
+            # A number that reaches the end of the buffer, or stops at a character a number can continue with,
+            # may have been split across chunks
+            if end is None or (not finished and (end == len(buffer) or buffer[end] in NUMBER_CHARACTERS)):
+                if await read_more():
+                    continue
+                raise invalid_body()
+
+            position = end
+            yield record
+
+            token = await next_token()
+            position += 1
+            if token == "]":
+                break
+            if token != ",":
+                raise invalid_body()
+
+    if await next_token():
+        raise invalid_body()
+
+
+async def iter_records(request: Request) -> AsyncIterator[Any]:
+    """Yield records from a JSON array, NDJSON or CSV body.
+
+    All three are parsed while the body streams in, so memory stays bounded by the caller.
+    An NDJSON line that is not valid JSON is yielded as the raw string for the caller's validation to reject.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_MEDIA_TYPES:
+        async for line in iter_lines(request):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
+
+    elif content_type in CSV_MEDIA_TYPES:
+        header = None
+        record = ""
+        async for line in iter_lines(request):
+            record += line
+            # An odd number of quotes means a quoted field continues on the next line
+            if record.count('"') % 2:
+                record += "\n"
+                continue
+            if not record.strip():
+                record = ""
+                continue
+            row = next(csv.reader([record]))
+            record = ""
+            if header is None:
+                header = row
+                continue
+            # Empty cells mean "not provided" rather than an empty string
+            yield {column: value for column, value in zip(header, row) if value != ""}
+
+    else:
+        async for record in iter_json_array(request):
+            yield record
+
+
+async def read_records(request: Request, limit: int) -> List[Any]:
+    records = []
+    async for record in iter_records(request):
+        if len(records) == limit:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {limit} records per request"
+            )
+        records.append(record)
+    return records
@@ -0,0 +1,339 @@
+import asyncio
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+from dotenv import load_dotenv
+from database import after_commit, run_in_thread
+
+load_dotenv()
+
+# Worker processes serving the app, as uvicorn and gunicorn read it. The in-process cache only sees
+# the invalidations of its own worker, so it is the default only for a single worker; pass
+# --workers on the command line without setting this and every worker believes it is alone.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory" if WEB_CONCURRENCY <= 1 else "none")
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+class LRUCache:
+    """In-process cache bounded by entry count, with a TTL on every entry"""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                    self.stats.evictions += 1
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> dict:
+        return {"backend": "memory", "size": len(self._entries), "max_entries": self.max_entries, **self.stats.as_dict()}
+
+
+class RedisCache:
+    """Cache shared between workers through a Redis-compatible server; entries expire through SETEX"""
+
+    # Every call is a network round trip, which async code must not wait on from the event loop
+    blocking = True
+
+    def __init__(self, url: str = REDIS_URL, ttl: float = CACHE_TTL_SECONDS, prefix: str = "ots:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = max(1, int(ttl))
+        self.prefix = prefix
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return pickle.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        self.client.setex(self.prefix + key, self.ttl, pickle.dumps(value))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def info(self) -> dict:
+        # Redis evicts on its own, so evictions are only known to the in-process backend
+        return {"backend": "redis", **self.stats.as_dict()}
+
+
+class NullCache:
+    blocking = False
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[Any]:
+        self.stats.misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def delete(self, *keys: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def info(self) -> dict:
+        return {"backend": "none", **self.stats.as_dict()}
+
+
+class AsyncCacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+        }
+
+
+class AsyncCache:
+    """Read-through cache for slow async lookups such as carrier API calls.
+
+    Entries are fresh for ttl seconds and may then be served stale for stale_ttl more while one
+    background call refreshes them, so a slow upstream does not slow readers down. Concurrent misses
+    for a key share a single upstream call. Failed calls are not cached and leave a stale entry in
+    place. Belongs to one event loop; nothing is shared between worker processes.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.stats = AsyncCacheStats()
+        self._entries = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def get_or_load(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now < entry[0]:
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+        if entry is not None and now < entry[0] + self.stale_ttl:
+            self.stats.stale_hits += 1
+            self._refresh(key, load)
+            return entry[1]
+
+        if key in self._inflight:
+            self.stats.coalesced += 1
+        else:
+            self.stats.misses += 1
+        # Shielded so a reader that disconnects does not cancel the call the others are waiting on
+        return await asyncio.shield(self._refresh(key, load))
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def info(self) -> dict:
+        return {
+            "size": len(self._entries), "inflight": len(self._inflight), "ttl": self.ttl, "stale_ttl": self.stale_ttl,
+            **self.stats.as_dict()
+        }
+
+    def _refresh(self, key: str, load: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._load(key, load))
+            # A background refresh may fail with nobody awaiting it; it is counted in upstream_errors
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
+
+    async def _load(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        self.stats.upstream_calls += 1
+        try:
+            value = await load()
+        except BaseException:
+            self.stats.upstream_errors += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        self.set(key, value)
+        return value
+
+
+def create_cache(backend: str = CACHE_BACKEND, workers: int = WEB_CONCURRENCY):
+    if backend == "redis":
+        return RedisCache()
+    if backend == "none":
+        return NullCache()
+    if workers > 1:
+        # Other workers would keep serving entries this one evicted, and ETags built from them
+        raise RuntimeError(
+            f"CACHE_BACKEND=memory cannot be invalidated across {workers} workers; use redis or none"
+        )
+    return LRUCache()
+
+
+cache = create_cache()
+
+
+def cache_key(model, ident, field: str = "id") -> str:
+    if field == "id":
+        return f"{model.__tablename__}:{ident}"
+    return f"{model.__tablename__}:{field}={ident}"
+
+
+def snapshot(instance) -> Dict[str, Any]:
+    """Plain column values of an ORM instance, safe to keep after its session is gone"""
+    return {attribute.key: getattr(instance, attribute.key) for attribute in inspect(instance).mapper.column_attrs}
+
+
+def call(method: Callable, *args) -> Any:
+    """Call a cache method from sync code.
+
+    Under AsyncSession.run_sync sync code runs in a greenlet on the event loop thread, so a blocking
+    backend is called from a worker thread there while the greenlet waits, like the async DB driver does.
+    """
+    if cache.blocking and in_greenlet():
+        return await_only(run_in_thread(method, *args))
+    return method(*args)
+
+
+async def call_async(method: Callable, *args) -> Any:
+    """Call a cache method from a coroutine without blocking the event loop"""
+    if cache.blocking:
+        return await run_in_thread(method, *args)
+    return method(*args)
+
+
+def cached(model, ident, load: Callable[[], Optional[Any]], field: str = "id") -> Optional[Dict[str, Any]]:
+    """Read-through lookup: return the cached snapshot or load the instance and cache its snapshot.
+
+    Misses are not cached, so a row created after a 404 is visible immediately.
+    """
+    key = cache_key(model, ident, field)
+    value = call(cache.get, key)
+    if value is None:
+        instance = load()
+        if instance is None:
+            return None
+        value = snapshot(instance)
+        call(cache.set, key, value)
+
+    return value
+
+
+async def cached_async(model, ident, load: Callable[[], Awaitable[Optional[Any]]], field: str = "id") -> Optional[Dict[str, Any]]:
+    """cached() for async handlers, with load awaited on an AsyncSession"""
+    key = cache_key(model, ident, field)
+    value = await call_async(cache.get, key)
+    if value is None:
+        instance = await load()
+        if instance is None:
+            return None
+        value = snapshot(instance)
+        await call_async(cache.set, key, value)
+
+    return value
+
+
+def invalidate(db: Session, model, *idents, field: str = "id") -> None:
+    """Drop cached snapshots now and again once the transaction commits.
+
+    The second pass removes snapshots that a concurrent reader cached from the old row in between.
+    """
+    keys = [cache_key(model, ident, field) for ident in idents]
+    if not keys:
+        return
+
+    cache.stats.invalidations += len(keys)
+    call(cache.delete, *keys)
+    after_commit(db, lambda: call(cache.delete, *keys))
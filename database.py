@@ -1,17 +1,260 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from dotenv import load_dotenv
+from typing import Callable, List, Optional, Tuple
+import ast
+import asyncio
+import os
 
+load_dotenv()
 
-DATABASE_URL = "sqlite:///./order_tracking.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./order_tracking.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Serve the hot endpoints with async handlers and an AsyncSession instead of threadpool-bound sync ones
+USE_ASYNC_DB = os.getenv("DB_ASYNC", "false").lower() == "true"
+
+# Only applied to SQLite connections
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Negative values are KiB, so this is a 64MB page cache per connection
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-64000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000")),
+}
+
+
+def set_sqlite_pragmas(engine, pragmas: dict = SQLITE_PRAGMAS) -> None:
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def engine_options(
+        url: str,
+        pool_size: int = DB_POOL_SIZE,
+        max_overflow: int = DB_MAX_OVERFLOW,
+        pool_pre_ping: bool = DB_POOL_PRE_PING,
+        pool_recycle: int = DB_POOL_RECYCLE
+    ) -> dict:
+    options = {"pool_pre_ping": pool_pre_ping, "pool_recycle": pool_recycle}
+    is_sqlite = url.startswith("sqlite")
+
+    if is_sqlite:
+        options["connect_args"] = {"check_same_thread": False}
+
+    # In-memory SQLite uses a per-thread singleton pool that takes no size settings
+    if not (is_sqlite and ":memory:" in url):
+        options.update(pool_size=pool_size, max_overflow=max_overflow)
+
+    return options
+
+
+def create_db_engine(url: str = DATABASE_URL, sqlite_pragmas: dict = SQLITE_PRAGMAS, **pool_settings):
+    engine = create_engine(url, **engine_options(url, **pool_settings))
+
+    if url.startswith("sqlite") and sqlite_pragmas:
+        set_sqlite_pragmas(engine, sqlite_pragmas)
+
+    return engine
+
+
+def async_database_url(url: str) -> str:
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+def create_async_db_engine(url: str = None, sqlite_pragmas: dict = SQLITE_PRAGMAS, **pool_settings):
+    url = url or async_database_url(DATABASE_URL)
+    options = engine_options(url, **pool_settings)
+
+    # aiosqlite defaults to NullPool, which would reopen the file and rerun the pragmas on every request
+    if url.startswith("sqlite") and "pool_size" in options:
+        options["poolclass"] = AsyncAdaptedQueuePool
+
+    async_engine = create_async_engine(url, **options)
+
+    if url.startswith("sqlite") and sqlite_pragmas:
+        set_sqlite_pragmas(async_engine.sync_engine, sqlite_pragmas)
+
+    return async_engine
+
+
+engine = create_db_engine()
 Base = declarative_base()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_db_engine() if USE_ASYNC_DB else None
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+ALEMBIC_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+MIGRATION_VERSIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations", "versions")
+# Databases created with create_all before migrations existed are stamped at this revision
+BASELINE_REVISION = "8f3a1c2d9b10"
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_CONFIG)
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def head_revision() -> str:
+    """The newest migration, read straight from the revision files.
+
+    Importing Alembic to ask it costs a worker more than create_all did, so startup parses the
+    revision/down_revision assignments itself.
+    """
+    revisions, parents = set(), set()
+    for name in os.listdir(MIGRATION_VERSIONS):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(MIGRATION_VERSIONS, name)) as script:
+            for line in script:
+                target, _, value = line.partition("=")
+                target = target.split(":")[0].strip()
+                if target == "revision":
+                    revisions.add(ast.literal_eval(value.strip()))
+                elif target == "down_revision":
+                    parent = ast.literal_eval(value.strip())
+                    parents.update(parent if isinstance(parent, tuple) else (parent,))
+
+    heads = revisions - parents
+    if len(heads) != 1:
+        raise RuntimeError(f"Expected a single migration head, found {sorted(heads)}")
+    return heads.pop()
+
+
+def schema_revisions(bind=None) -> Tuple[Optional[str], str]:
+    """(revision the database is at, revision the code expects)"""
+    try:
+        with (bind or engine).connect() as connection:
+            current = connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except DBAPIError:
+        # No alembic_version table: never migrated
+        current = None
+    return current, head_revision()
+
+
+def verify_schema(bind=None) -> None:
+    """Fail fast when migrations have not been applied; one small read instead of create_all's per-table reflection"""
+    current, head = schema_revisions(bind)
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current or 'none'} but the code expects {head}; "
+            "run `python manage.py upgrade`"
+        )
+
+
+def create_missing_indexes(connection) -> List[str]:
+    """Create indexes declared on the models that existing tables lack, returning their names"""
+    from sqlalchemy import inspect
+    import models  # noqa: F401, registers the tables on Base.metadata
+
+    inspector = inspect(connection)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=connection)
+                created.append(index.name)
+    return created
+
+
+def upgrade_database(bind=None) -> Tuple[Optional[str], str]:
+    """Apply pending migrations and return (revision before, revision after).
+
+    A database that create_all built before migrations existed has tables but no alembic_version;
+    it is stamped at the baseline, whose schema it has, and the revisions after it add the rest.
+    Such a database is reported as starting from the baseline.
+    """
+    from alembic import command
+    from alembic.runtime.migration import MigrationContext
+    from sqlalchemy import inspect
+
+    config = alembic_config()
+    with (bind or engine).begin() as connection:
+        config.attributes["connection"] = connection
+        before = MigrationContext.configure(connection).get_current_revision()
+
+        if before is None and inspect(connection).has_table("orders"):
+            command.stamp(config, BASELINE_REVISION)
+            before = BASELINE_REVISION
+
+        command.upgrade(config, "head")
+        after = MigrationContext.configure(connection).get_current_revision()
+
+    return before, after
+
+
+def after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """Run callback once the session's current transaction commits; a rollback drops it.
+
+    In-process state derived from the database (caches, the product leaderboard) is only touched
+    from these callbacks, so a rolled-back write never leaks into it.
+    """
+    db.info.setdefault("after_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def run_after_commit_callbacks(session):
+    for callback in session.info.pop("after_commit", []):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_after_commit_callbacks(session):
+    session.info.pop("after_commit", None)
+
+
+def dialect_insert(db, model):
+    """INSERT construct for the session's backend, which adds on_conflict_do_update on SQLite and PostgreSQL"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+async def run_in_thread(function, *args):
+    """Run blocking Session work off the event loop.
+
+    Cancelling the caller waits for the thread to finish first, so the session is never closed
+    while a statement or commit is still running on it.
+    """
+    work = asyncio.ensure_future(asyncio.to_thread(function, *args))
+    try:
+        return await asyncio.shield(work)
+    except asyncio.CancelledError:
+        await asyncio.wait([work])
+        raise
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
-    finally: 
-        db.close()
\ No newline at end of file
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
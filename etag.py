@@ -0,0 +1,73 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def make_etag(*parts) -> str:
+    """Weak validator derived from whatever identifies a representation, usually (kind, id, updated_at)"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    # Timestamps are stored as naive UTC
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def validators(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag}
+    # Last-Modified has whole seconds, so it is only sent once that second is over: another write in
+    # the same second would carry the same date and If-Modified-Since would answer 304 for it (RFC 9110 8.8.2.2)
+    if last_modified and last_modified.replace(microsecond=0) + timedelta(seconds=1) <= datetime.utcnow():
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def is_fresh(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """True when the client's cached copy is current. If-None-Match wins over If-Modified-Since (RFC 9110)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        opaque = lambda tag: tag.strip().removeprefix("W/")
+        return opaque(etag) in {opaque(tag) for tag in if_none_match.split(",")}
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+    return False
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """A bodiless 304 carrying the validators, or None when the client needs the full response"""
+    if is_fresh(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators(etag, last_modified))
+    return None
+
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime] = None) -> None:
+    response.headers.update(validators(etag, last_modified))
+
+
+def conditional_json(request: Request, content) -> Response:
+    """Serialize content and answer 304 if its hash matches If-None-Match.
+
+    For responses without a cheap version to check, like reports built from several tables;
+    this saves the transfer, not the query.
+    """
+    body = json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+    etag = f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+    return not_modified(request, etag) or Response(
+        content=body, media_type=JSONResponse.media_type, headers=validators(etag)
+    )
@@ -0,0 +1,323 @@
+import cProfile
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Adds X-Request-Time, X-DB-* and Server-Timing headers to every response; meant for development
+INSTRUMENTATION_HEADERS = os.getenv("INSTRUMENTATION_HEADERS", "false").lower() == "true"
+# A statement repeated more than this many times in one request is reported as an N+1 pattern
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Fraction of requests profiled into PROFILE_DIR, 0 turns profiling off
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# cprofile (stdlib) or pyinstrument, which follows awaits but has to be installed separately
+PROFILER = os.getenv("PROFILER", "cprofile")
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.objects_loaded = 0
+        self.repeated = Counter()
+
+    def n_plus_one(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        return [(statement, count) for statement, count in self.repeated.most_common() if count > threshold]
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class MetricsRegistry:
+    """Counters and histograms in Prometheus text format, per process: each worker is scraped on its own"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, tuple], float] = {}
+        self.histograms: Dict[Tuple[str, tuple], list] = {}
+        self.help: Dict[str, Tuple[str, str]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        self.help[name] = (kind, help_text)
+
+    def inc(self, name: str, labels: dict, value: float = 1) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: dict, value: float, buckets: tuple) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [buckets, [0] * len(buckets), 0.0, 0]
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram[1][index] += 1
+            histogram[2] += value
+            histogram[3] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+
+        described = set()
+        for (name, labels), value in counters:
+            lines += self._header(name, described)
+            lines.append(f"{name}{format_labels(labels)} {value:g}")
+
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            lines += self._header(name, described)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total:g}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name: str, described: set) -> List[str]:
+        if name in described or name not in self.help:
+            return []
+        described.add(name)
+        kind, help_text = self.help[name]
+        return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def render_gauges(prefix: str, values: dict) -> str:
+    """Numeric fields of a stats dict (cache.info() for instance) as gauges, string fields become labels"""
+    labels = tuple(sorted((key, value) for key, value in values.items() if isinstance(value, str)))
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key}{format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+metrics = MetricsRegistry()
+metrics.describe("http_requests_total", "counter", "Requests handled, by route and status")
+metrics.describe("http_request_duration_seconds", "histogram", "Wall time per request")
+metrics.describe("db_statements_per_request", "histogram", "SQL statements sent per request")
+metrics.describe("db_time_seconds_total", "counter", "Time spent executing SQL, by route")
+metrics.describe("db_rows_total", "counter", "Rows reported by the driver (written rows, and selected rows on drivers that count them)")
+metrics.describe("orm_objects_loaded_total", "counter", "ORM instances materialized from query results")
+metrics.describe("n_plus_one_requests_total", "counter", f"Requests that repeated one statement more than {N_PLUS_ONE_THRESHOLD} times")
+metrics.describe("slow_queries_total", "counter", f"Statements slower than {SLOW_QUERY_MS:g} ms")
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._instrumentation_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_instrumentation_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        metrics.inc("slow_queries_total", {})
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split()))
+
+    stats = current_request.get()
+    if stats is None:
+        return
+    stats.statements += 1
+    stats.db_time += elapsed
+    # SQLite only reports rowcount for writes; PostgreSQL drivers also report it for SELECT
+    stats.rows += max(cursor.rowcount, 0)
+    stats.repeated[statement] += 1
+
+
+def on_load(instance, context):
+    stats = current_request.get()
+    if stats is not None:
+        stats.objects_loaded += 1
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement on a sync Engine; for an AsyncEngine pass its sync_engine"""
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def instrument_models(base) -> None:
+    event.listen(base, "load", on_load, propagate=True)
+
+
+def route_label(scope) -> str:
+    # Templated paths keep the label set small; requests that matched no route share one label
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+profile_numbers = itertools.count()
+
+
+class Profiler:
+    # cProfile and pyinstrument allow one profile per thread and every request starts on the event loop
+    # thread, so a request is only sampled while no other one is being profiled in this process
+    active = threading.Lock()
+
+    def __init__(self, kind: str = PROFILER):
+        self.kind = kind
+        if kind == "pyinstrument":
+            from pyinstrument import Profiler as PyinstrumentProfiler
+
+            self.profiler = PyinstrumentProfiler(async_mode="enabled")
+        else:
+            # cProfile only sees the event loop thread; sync endpoints running in the threadpool show up as awaits
+            self.profiler = cProfile.Profile()
+
+    def start(self) -> None:
+        if self.kind == "pyinstrument":
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self, method: str, path: str, directory: str = PROFILE_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        name = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(profile_numbers)}-"
+            f"{method}-{path.strip('/').replace('/', '_') or 'root'}"
+        )
+
+        if self.kind == "pyinstrument":
+            self.profiler.stop()
+            filename = os.path.join(directory, name + ".html")
+            with open(filename, "w") as output:
+                output.write(self.profiler.output_html())
+        else:
+            self.profiler.disable()
+            filename = os.path.join(directory, name + ".prof")
+            self.profiler.dump_stats(filename)
+        return filename
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware recording wall time and SQL statistics for each HTTP request.
+
+    Statements are attributed through a context variable, which Starlette copies into threadpool
+    workers and AsyncSession.run_sync greenlets, so sync and async handlers are both covered.
+    Statements a StreamingResponse issues after the headers are sent count towards the metrics but
+    not the headers.
+    """
+
+    def __init__(
+            self,
+            app,
+            headers: bool = INSTRUMENTATION_HEADERS,
+            sample_rate: float = PROFILE_SAMPLE_RATE,
+            n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD
+        ):
+        self.app = app
+        self.headers = headers
+        self.sample_rate = sample_rate
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        sampled = bool(self.sample_rate) and random.random() < self.sample_rate and Profiler.active.acquire(blocking=False)
+        profiler = None
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.headers:
+                    message["headers"] = list(message.get("headers", [])) + self.debug_headers(stats, started)
+            await send(message)
+
+        try:
+            if sampled:
+                sample = Profiler()
+                sample.start()
+                profiler = sample
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            self.record(scope, stats, status, elapsed)
+            try:
+                if profiler is not None:
+                    logger.info("Profiled %s %s into %s", scope["method"], scope["path"], profiler.stop(scope["method"], scope["path"]))
+            finally:
+                if sampled:
+                    Profiler.active.release()
+
+    def debug_headers(self, stats: RequestStats, started: float) -> List[Tuple[bytes, bytes]]:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        db_ms = stats.db_time * 1000
+        headers = [
+            ("x-request-time", f"{elapsed_ms:.1f}ms"),
+            ("x-db-statements", str(stats.statements)),
+            ("x-db-time", f"{db_ms:.1f}ms"),
+            ("x-db-rows", str(stats.rows)),
+            ("x-orm-objects", str(stats.objects_loaded)),
+            ("server-timing", f'db;dur={db_ms:.1f};desc="{stats.statements} statements", app;dur={elapsed_ms:.1f}'),
+        ]
+        repeated = stats.n_plus_one(self.n_plus_one_threshold)
+        if repeated:
+            headers.append(("x-n-plus-one", ", ".join(f"{count}x {' '.join(statement.split())[:80].rstrip()}" for statement, count in repeated)))
+        return [(name.encode(), value.encode("latin-1", "replace")) for name, value in headers]
+
+    def record(self, scope, stats: RequestStats, status: int, elapsed: float) -> None:
+        route = route_label(scope)
+        method = scope["method"]
+
+        metrics.inc("http_requests_total", {"method": method, "route": route, "status": status})
+        metrics.observe("http_request_duration_seconds", {"method": method, "route": route}, elapsed, REQUEST_BUCKETS)
+        metrics.observe("db_statements_per_request", {"method": method, "route": route}, stats.statements, STATEMENT_BUCKETS)
+        metrics.inc("db_time_seconds_total", {"route": route}, stats.db_time)
+        metrics.inc("db_rows_total", {"route": route}, stats.rows)
+        metrics.inc("orm_objects_loaded_total", {"route": route}, stats.objects_loaded)
+
+        repeated = stats.n_plus_one(self.n_plus_one_threshold)
+        if repeated:
+            metrics.inc("n_plus_one_requests_total", {"method": method, "route": route})
+            statement, count = repeated[0]
+            logger.warning(
+                "Possible N+1 in %s %s: statement ran %d times: %s", method, route, count, " ".join(statement.split())
+            )
@@ -1,23 +1,50 @@
 from fastapi import FastAPI
-from database import Base, engine
-from routers import vendor_router, product_router, client_router, order_router, invoice_router, expense_router, shipping_router, reporting_router
+from contextlib import asynccontextmanager
+from database import Base, async_engine, engine, verify_schema
+from instrumentation import InstrumentationMiddleware, instrument_engine, instrument_models
+from routers import vendor_router, product_router, client_router, order_router, invoice_router, expense_router, shipping_router, reporting_router, cache_router, export_router, metrics_router
+from services import payment_service, tracking_service, DHL_service
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from starlette.requests import Request
+import asyncio
 
 
-# Drop all tables (use only in development!)
-# Base.metadata.drop_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Migrations run once per release (`python manage.py upgrade`), not on every worker boot
+    verify_schema()
+    # One pooled carrier connection per worker instead of a new TCP/TLS handshake per call
+    DHL_service.open_client()
+    workers = []
+    if payment_service.PAYMENT_INTENT_WORKER_ENABLED:
+        workers.append(asyncio.create_task(payment_service.run_payment_intent_worker()))
+    if tracking_service.TRACKING_POLL_ENABLED:
+        workers.append(asyncio.create_task(tracking_service.run_tracking_worker()))
+    yield
+    for worker in workers:
+        worker.cancel()
+    # Let the workers unwind before the client and engines they use are closed
+    await asyncio.gather(*workers, return_exceptions=True)
+    await DHL_service.close_client()
+    payment_service.close_payment_client()
 
-# Recreate the tables
-Base.metadata.create_all(bind=engine) 
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 app = FastAPI(
-    title="Order Tracking System"
+    title="Order Tracking System",
+    lifespan=lifespan
 )
 
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+instrument_models(Base)
+app.add_middleware(InstrumentationMiddleware)
+
 app.include_router(vendor_router.router)
 app.include_router(product_router.router)
 app.include_router(client_router.router)
@@ -26,6 +53,9 @@ app.include_router(invoice_router.router)
 app.include_router(expense_router.router)
 app.include_router(shipping_router.router)
 app.include_router(reporting_router.router)
+app.include_router(cache_router.router)
+app.include_router(export_router.router)
+app.include_router(metrics_router.router)
 
 
 templates = Jinja2Templates(directory="templates")
@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+from sqlalchemy import insert, select
+from database import BASELINE_REVISION, SessionLocal, create_missing_indexes, engine, upgrade_database
+from services import aggregate_service, payment_service
+import models
+
+
+def backfill_order_history(args):
+    """Give every legacy order without history a row reflecting its current status"""
+    for index in models.OrderHistory.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    with SessionLocal() as db:
+        missing = select(
+            models.Order.id, models.Order.status, models.Order.created_at
+        ).where(
+            ~select(models.OrderHistory.id).where(models.OrderHistory.order_id == models.Order.id).exists()
+        )
+        result = db.execute(
+            insert(models.OrderHistory).from_select(["order_id", "status", "changed_at"], missing)
+        )
+        db.commit()
+
+    print(f"Backfilled history for {result.rowcount} orders")
+
+
+def rebuild_daily_rollups(args):
+    models.DailyOrderRollup.__table__.create(bind=engine, checkfirst=True)
+
+    with SessionLocal() as db:
+        days = aggregate_service.rebuild_daily_rollups(db)
+        db.commit()
+
+    print(f"Rebuilt daily order rollups for {days} days")
+
+
+def rebuild_product_sales(args):
+    models.ProductDailySales.__table__.create(bind=engine, checkfirst=True)
+
+    with SessionLocal() as db:
+        out_of_sync = aggregate_service.rebuild_product_sales(db)
+        db.commit()
+
+    print(f"Rebuilt product sales counters, {out_of_sync} products were out of sync")
+
+
+def rebuild_client_stats(args):
+    models.ClientStats.__table__.create(bind=engine, checkfirst=True)
+
+    with SessionLocal() as db:
+        clients = aggregate_service.rebuild_client_stats(db)
+        db.commit()
+
+    print(f"Rebuilt client stats for {clients} clients")
+
+
+def rebuild_vendor_sales(args):
+    models.VendorDailySales.__table__.create(bind=engine, checkfirst=True)
+
+    with SessionLocal() as db:
+        rows = aggregate_service.rebuild_vendor_sales(db)
+        db.commit()
+
+    print(f"Rebuilt vendor sales, {rows} vendor-days")
+
+
+def create_indexes(args):
+    """Add indexes declared in models.py that an existing database predates; create_all skips existing tables"""
+    with engine.begin() as connection:
+        created = create_missing_indexes(connection)
+
+    print(f"Created {len(created)} indexes" + "".join(f"\n  {name}" for name in created))
+
+
+def upgrade(args):
+    before, after = upgrade_database()
+
+    if before == after:
+        print(f"Database schema is up to date at {after}")
+    else:
+        print(f"Upgraded database schema from {before or 'an unversioned database'} to {after}")
+
+    if before == BASELINE_REVISION and after != before:
+        print(
+            "The maintained aggregates start empty on a database upgraded from the baseline; run "
+            "rebuild-daily-rollups, rebuild-product-sales, rebuild-client-stats and rebuild-vendor-sales"
+        )
+
+
+def confirm_payments(args):
+    try:
+        with SessionLocal() as db:
+            totals = asyncio.run(payment_service.confirm_payments(db=db, batch_size=args.batch_size, concurrency=args.concurrency))
+    finally:
+        payment_service.close_payment_client()
+
+    print(
+        f"Checked {totals['checked']} pending orders: {totals['approved']} approved, "
+        f"{totals['unpaid']} not paid yet, {totals['failed']} lookups failed, "
+        f"{totals['skipped']} paid but no longer pending"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order Tracking System maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "upgrade", help="Apply pending schema migrations (also adopts databases created before migrations existed)"
+    ).set_defaults(handler=upgrade)
+
+    commands.add_parser(
+        "backfill-order-history", help="Create history rows for orders that predate write-time history"
+    ).set_defaults(handler=backfill_order_history)
+
+    commands.add_parser(
+        "rebuild-daily-rollups", help="Recompute daily_order_rollup from the orders table"
+    ).set_defaults(handler=rebuild_daily_rollups)
+
+    commands.add_parser(
+        "rebuild-product-sales", help="Check and recompute per-product sales counters from order_product"
+    ).set_defaults(handler=rebuild_product_sales)
+
+    commands.add_parser(
+        "rebuild-client-stats", help="Recompute client_stats from orders and invoices"
+    ).set_defaults(handler=rebuild_client_stats)
+
+    commands.add_parser(
+        "rebuild-vendor-sales", help="Snapshot vendor_id on legacy order lines and recompute vendor_daily_sales"
+    ).set_defaults(handler=rebuild_vendor_sales)
+
+    commands.add_parser(
+        "create-indexes", help="Create indexes declared on the models that are missing from the database"
+    ).set_defaults(handler=create_indexes)
+
+    confirm = commands.add_parser(
+        "confirm-payments", help="Verify the PaymentIntents of pending orders and approve the paid ones"
+    )
+    confirm.add_argument("--batch-size", type=int, default=payment_service.PAYMENT_CONFIRM_BATCH_SIZE)
+    confirm.add_argument("--concurrency", type=int, default=payment_service.PAYMENT_CONFIRM_CONCURRENCY)
+    confirm.set_defaults(handler=confirm_payments)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
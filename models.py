@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Date, Text, Float, ForeignKey, Boolean, Index
 from database import Base
 from sqlalchemy import Enum as SQLAlchemyEnum
 from enum import Enum
@@ -15,6 +15,7 @@ class Vendor(Base):
     address = Column(String)
     type = Column(String)
     is_deleted = Column(Boolean, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     products = relationship("Product", back_populates="vendor")
 
@@ -32,6 +33,8 @@ class Product(Base):
     category = Column(String)
     vendor_id = Column(Integer, ForeignKey("vendors.id", ondelete="SET NULL"))
     is_deleted = Column(Boolean, default=False)
+    units_sold = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     vendor = relationship("Vendor", back_populates="products")
 
@@ -63,11 +66,17 @@ class OrderStatusEnum(str, Enum):
 class Order(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id", ondelete="SET NULL"))
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="SET NULL"), index=True)
     status = Column(SQLAlchemyEnum(OrderStatusEnum), nullable=False, index=True, default=OrderStatusEnum.PENDING)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     total_amount = Column(Float, nullable=False)
     payment_intent_id = Column(String)
+    payment_pending = Column(Boolean, default=True, index=True)
+    # Outbox bookkeeping for the PaymentIntent worker: failed creations back off, and a worker claims
+    # a row by pushing payment_next_attempt_at past its lease
+    payment_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    payment_next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     client = relationship("Client", back_populates="orders")
     shipments = relationship("Shipment", back_populates="order")
@@ -83,14 +92,69 @@ class OrderHistory(Base):
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
     status = Column(SQLAlchemyEnum(OrderStatusEnum), nullable=False)
-    changed_at = Column(DateTime, default=datetime.utcnow)  
+    changed_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     order = relationship("Order", back_populates="history")  
 
+    __table_args__ = (
+        Index("ix_order_history_order_id_changed_at", "order_id", "changed_at"),
+    )
+
     def __repr__(self):
         return f"<Order(status={self.status}, changed_at={self.changed_at})>"
 
 
+class DailyOrderRollup(Base):
+    __tablename__ = "daily_order_rollup"
+    day = Column(Date, primary_key=True)
+    revenue = Column(Float, nullable=False, default=0)
+    order_count = Column(Integer, nullable=False, default=0)
+    pending_count = Column(Integer, nullable=False, default=0)
+    approved_count = Column(Integer, nullable=False, default=0)
+    shipped_count = Column(Integer, nullable=False, default=0)
+    delivered_count = Column(Integer, nullable=False, default=0)
+    cancelled_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyOrderRollup(day={self.day}, revenue={self.revenue}, order_count={self.order_count})>"
+
+
+class ProductDailySales(Base):
+    __tablename__ = "product_daily_sales"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    quantity = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ProductDailySales(product_id={self.product_id}, day={self.day}, quantity={self.quantity})>"
+
+
+class ClientStats(Base):
+    __tablename__ = "client_stats"
+    client_id = Column(Integer, ForeignKey("clients.id"), primary_key=True)
+    lifetime_spend = Column(Float, nullable=False, default=0, index=True)
+    order_count = Column(Integer, nullable=False, default=0, index=True)
+    last_order_date = Column(DateTime, index=True)
+    invoice_total = Column(Float, nullable=False, default=0, index=True)
+    invoice_count = Column(Integer, nullable=False, default=0)
+
+    client = relationship("Client")
+
+    def __repr__(self):
+        return f"<ClientStats(client_id={self.client_id}, lifetime_spend={self.lifetime_spend}, order_count={self.order_count})>"
+
+
+class VendorDailySales(Base):
+    __tablename__ = "vendor_daily_sales"
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    total_sales = Column(Float, nullable=False, default=0)
+    units_sold = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<VendorDailySales(vendor_id={self.vendor_id}, day={self.day}, total_sales={self.total_sales})>"
+
+
 class ExpensecategoryEnum(str, Enum):
     SHIPPING = "shipping"
     SUPPLIES = "supplies"
@@ -101,10 +165,14 @@ class ExpensecategoryEnum(str, Enum):
 class Expense(Base):
     __tablename__ = "expenses"
     id = Column(Integer, primary_key=True, index=True)
-    category = Column(SQLAlchemyEnum(ExpensecategoryEnum), nullable=False, index=True)
+    category = Column(SQLAlchemyEnum(ExpensecategoryEnum), nullable=False)
     amount = Column(Float)
     description = Column(Text)
-    date = Column(DateTime, default=datetime.utcnow)
+    date = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        Index("ix_expenses_category_date", "category", "date"),
+    )
 
     def __repr__(self):
         return f"<Expense(category={self.category}, amount={self.amount})>"
@@ -121,10 +189,13 @@ class ShipmentStatusEnum(str, Enum):
 class Shipment(Base):
     __tablename__ = "shipments"
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     tracking_number = Column(String(100))
     status = Column(SQLAlchemyEnum(ShipmentStatusEnum), nullable=False, index=True, default=ShipmentStatusEnum.PENDING)
     estimated_delivery_date = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # When the tracking poller should next ask the carrier; NULL once the shipment needs no more polling
+    next_check_at = Column(DateTime, index=True)
 
     order = relationship("Order", back_populates="shipments")
 
@@ -142,10 +213,11 @@ class InvoiceStatusEnum(str, Enum):
 class Invoice(Base):
     __tablename__ = "invoices"
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     amount = Column(Float)
     status = Column(SQLAlchemyEnum(InvoiceStatusEnum), nullable=False, index=True, default=InvoiceStatusEnum.PENDING)
-    due_date = Column(DateTime)
+    due_date = Column(DateTime, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     order = relationship("Order", back_populates="invoices")
 
@@ -167,8 +239,10 @@ class User(Base):
 class OrderProduct(Base):
     __tablename__ = "order_product"
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id", ondelete="SET NULL"))
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="SET NULL"), index=True)
+    # Vendor of the product when the line was ordered, kept even if the product later changes vendor
+    vendor_id = Column(Integer, ForeignKey("vendors.id", ondelete="SET NULL"), index=True)
     quantity = Column(Integer, default=1, nullable=False)
     price = Column(Float, nullable=False)
 
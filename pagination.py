@@ -0,0 +1,74 @@
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+from typing import List, Optional, Sequence
+from datetime import datetime
+import base64
+import binascii
+import json
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keyset: Sequence) -> List:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(payload, list) or len(payload) != len(keyset):
+            raise ValueError(cursor)
+
+        return [
+            datetime.fromisoformat(value) if column.type.python_type is datetime else value
+            for column, value in zip(keyset, payload)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def paginate(
+        query: Query,
+        keyset: Sequence,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        descending: bool = False
+    ) -> Query:
+    """Order by the keyset columns and page with either skip/limit or an opaque cursor.
+
+    In cursor mode skip is ignored: the page starts right after the row the cursor was taken from,
+    so the database seeks through the index instead of walking past skip rows. A full page always
+    gets a next cursor, so a cursor may lead to an empty page: that is the end of the list, and
+    callers return it empty instead of answering 404.
+    """
+    query = query.order_by(*(column.desc() for column in keyset) if descending else keyset)
+
+    if cursor is not None:
+        values = decode_cursor(cursor, keyset)
+        position = keyset[0] if len(keyset) == 1 else tuple_(*keyset)
+        after = values[0] if len(keyset) == 1 else tuple_(*values)
+        query = query.filter(position < after if descending else position > after)
+    else:
+        query = query.offset(skip)
+
+    return query.limit(limit)
+
+
+def next_cursor(items: Sequence, keyset: Sequence, limit: int) -> Optional[str]:
+    if not items or len(items) < limit:
+        return None
+
+    return encode_cursor([getattr(items[-1], column.key) for column in keyset])
+
+
+def set_next_cursor(response: Response, items: Sequence, keyset: Sequence, limit: int) -> None:
+    cursor = next_cursor(items, keyset, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
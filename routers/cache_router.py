@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from cache import cache
+from services import DHL_service
+
+
+router = APIRouter(
+    tags=["Cache"]
+)
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    return cache.info()
+
+@router.get("/cache/tracking/stats")
+def get_tracking_cache_stats():
+    return DHL_service.tracking_cache.info()
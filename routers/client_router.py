@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from services import client_service
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
+from pagination import set_next_cursor
 import schemas
 
 
@@ -19,11 +20,15 @@ def create_client(
 
 @router.get("/clients/", response_model=List[schemas.ClientResponse])
 def get_clients(
+    response: Response,
     db: Session = Depends(get_db),
     skip: int = 0,
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None
 ):
-    return client_service.get_clients(db=db, skip=skip, limit=limit)
+    clients = client_service.get_clients(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, clients, client_service.CLIENTS_KEYSET, limit)
+    return clients
 
 @router.patch("/clients/{client_id}", response_model=schemas.ClientResponse)
 def update_client(
@@ -33,6 +38,14 @@ def update_client(
 ):
     return client_service.update_client(client_id=client_id, client_update=client_update, db=db)
 
+@router.delete("/clients/")
+def delete_clients(
+    ids: List[int] = Query(...),
+    db: Session = Depends(get_db)
+):
+    result = client_service.delete_clients(client_ids=ids, db=db)
+    return {"message": "Clients marked as deleted and orders updated", **result}
+
 @router.delete("/clients/{client_id}")
 def delete_client(
     client_id: int,
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Response, status
 from services import expense_service
 from sqlalchemy.orm import Session
 from typing import Optional
 from database import get_db
+from pagination import set_next_cursor
 from datetime import datetime
 import schemas
 
@@ -24,29 +25,37 @@ def get_expense_categories():
 
 @router.get("/expenses/")
 def get_expenses(
+    response: Response,
     db: Session = Depends(get_db), 
     skip: int = 0, 
     limit: int = 10, 
     start_date: Optional[datetime] = None, 
     end_date: Optional[datetime] = None, 
-    category: Optional[schemas.ExpensecategoryEnum] = None
+    category: Optional[schemas.ExpensecategoryEnum] = None,
+    cursor: Optional[str] = None
 ):
-    return expense_service.get_expenses(
+    expenses = expense_service.get_expenses(
     db=db,
     skip=skip,
     limit=limit,
     start_date=start_date,
     end_date=end_date,
-    category=category
+    category=category,
+    cursor=cursor
     )
+    set_next_cursor(response, expenses, expense_service.EXPENSES_KEYSET, limit)
+    return expenses
 
 @router.get("/expenses/summary/")
 def get_expense_summary(
     db: Session = Depends(get_db), 
     start_date: Optional[datetime] = None, 
-    end_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None,
+    granularity: Optional[schemas.ExpenseGranularityEnum] = None
 ):
-    return expense_service.get_expense_summary(db=db, start_date=start_date, end_date=end_date)
+    return expense_service.get_expense_summary(
+        db=db, start_date=start_date, end_date=end_date, granularity=granularity
+    )
 
 @router.patch("/expenses/{expense_id}", response_model=schemas.ExpenseResponse)
 def update_expense(
@@ -0,0 +1,55 @@
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from services import export_service
+from typing import Iterator, Optional
+from datetime import datetime
+import schemas
+
+
+router = APIRouter(
+    tags=["Export"]
+)
+
+MEDIA_TYPES = {
+    schemas.ExportFormatEnum.NDJSON: "application/x-ndjson",
+    schemas.ExportFormatEnum.CSV: "text/csv",
+}
+
+def export_response(chunks: Iterator[str], name: str, format: schemas.ExportFormatEnum) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format.value}"'}
+    )
+
+# No session dependency here: the service opens its own session inside the generator that feeds the response
+
+@router.get("/export/orders")
+def export_orders(
+    format: schemas.ExportFormatEnum = schemas.ExportFormatEnum.NDJSON,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    status: Optional[schemas.OrderStatusEnum] = None
+):
+    chunks = export_service.export_orders(format=format, start_date=start_date, end_date=end_date, status=status)
+    return export_response(chunks, "orders", format)
+
+@router.get("/export/invoices")
+def export_invoices(
+    format: schemas.ExportFormatEnum = schemas.ExportFormatEnum.NDJSON,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    status: Optional[schemas.InvoiceStatusEnum] = None
+):
+    chunks = export_service.export_invoices(format=format, start_date=start_date, end_date=end_date, status=status)
+    return export_response(chunks, "invoices", format)
+
+@router.get("/export/expenses")
+def export_expenses(
+    format: schemas.ExportFormatEnum = schemas.ExportFormatEnum.NDJSON,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    category: Optional[schemas.ExpensecategoryEnum] = None
+):
+    chunks = export_service.export_expenses(format=format, start_date=start_date, end_date=end_date, category=category)
+    return export_response(chunks, "expenses", format)
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from services import invoice_service
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
+from pagination import set_next_cursor
+from etag import make_etag, not_modified, set_validators
 import schemas
 
 
@@ -19,11 +21,15 @@ def generate_invoice(
 
 @router.get("/invoices/", response_model=List[schemas.InvoiceResponse])
 def get_invoices(
+    response: Response,
     db: Session = Depends(get_db),
     skip: int = 0,
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None
 ):
-    return invoice_service.get_invoices(db=db, skip=skip, limit=limit)
+    invoices = invoice_service.get_invoices(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, invoices, invoice_service.INVOICES_KEYSET, limit)
+    return invoices
 
 @router.patch("/invoices/{invoice_id}", response_model=schemas.InvoiceResponse)
 def edit_invoice(
@@ -43,6 +49,16 @@ def delete_invoice(
 @router.get("/invoices/{invoice_id}/status/")
 def track_invoice_payment_status(
     invoice_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
-    return invoice_service.track_invoice_payment_status(db=db, invoice_id=invoice_id)
\ No newline at end of file
+    invoice = invoice_service.get_invoice_snapshot(db=db, invoice_id=invoice_id)
+    etag = make_etag("invoice", invoice["id"], invoice["updated_at"])
+
+    cached_response = not_modified(request, etag, invoice["updated_at"])
+    if cached_response:
+        return cached_response
+
+    set_validators(response, etag, invoice["updated_at"])
+    return invoice_service.invoice_payment_status(invoice)
\ No newline at end of file
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from cache import cache
+from instrumentation import metrics, render_gauges
+from services import DHL_service
+
+
+router = APIRouter(
+    tags=["Metrics"]
+)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Prometheus text exposition format; every worker process keeps and serves its own counters
+    return PlainTextResponse(
+        metrics.render()
+        + render_gauges("cache", cache.info())
+        + render_gauges("tracking_cache", DHL_service.tracking_cache.info()),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,8 +1,14 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from services import order_service, payment_service
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from database import get_db
+from datetime import datetime
+from database import USE_ASYNC_DB, get_async_db, get_db
+from pagination import set_next_cursor
+from etag import make_etag, not_modified, set_validators
+from bulk import read_records
 import schemas
 
 
@@ -10,20 +16,63 @@ router = APIRouter(
     tags=["Order"]
 )
 
-@router.get("/orders/", response_model=List[schemas.OrderResponse])
-def get_orders(
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 10
-):
-    return order_service.get_orders(db=db, skip=skip, limit=limit)
+if USE_ASYNC_DB:
+    @router.get("/orders/", response_model=List[schemas.OrderResponse])
+    async def get_orders(
+        response: Response,
+        db: AsyncSession = Depends(get_async_db),
+        skip: int = 0,
+        limit: int = 10,
+        cursor: Optional[str] = None
+    ):
+        orders = await order_service.get_orders_async(db=db, skip=skip, limit=limit, cursor=cursor)
+        set_next_cursor(response, orders, order_service.ORDERS_KEYSET, limit)
+        return orders
 
-@router.post("/orders/", status_code=status.HTTP_201_CREATED)
-def create_order(
-    order: schemas.OrderCreate,
-    db: Session = Depends(get_db)
-):
-    return order_service.create_order(db=db, order=order)
+    @router.post("/orders/", status_code=status.HTTP_201_CREATED)
+    async def create_order(
+        order: schemas.OrderCreate,
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        return await order_service.create_order_async(db=db, order=order)
+
+    @router.post("/orders/bulk")
+    async def create_orders_bulk(
+        request: Request,
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        """Accepts a JSON array of orders or an NDJSON body (Content-Type: application/x-ndjson)"""
+        entries = await read_records(request, limit=order_service.BULK_ORDER_LIMIT)
+        return await order_service.create_orders_bulk_async(entries=entries, db=db)
+
+else:
+    @router.get("/orders/", response_model=List[schemas.OrderResponse])
+    def get_orders(
+        response: Response,
+        db: Session = Depends(get_db),
+        skip: int = 0,
+        limit: int = 10,
+        cursor: Optional[str] = None
+    ):
+        orders = order_service.get_orders(db=db, skip=skip, limit=limit, cursor=cursor)
+        set_next_cursor(response, orders, order_service.ORDERS_KEYSET, limit)
+        return orders
+
+    @router.post("/orders/", status_code=status.HTTP_201_CREATED)
+    def create_order(
+        order: schemas.OrderCreate,
+        db: Session = Depends(get_db)
+    ):
+        return order_service.create_order(db=db, order=order)
+
+    @router.post("/orders/bulk")
+    async def create_orders_bulk(
+        request: Request,
+        db: Session = Depends(get_db)
+    ):
+        """Accepts a JSON array of orders or an NDJSON body (Content-Type: application/x-ndjson)"""
+        entries = await read_records(request, limit=order_service.BULK_ORDER_LIMIT)
+        return await run_in_threadpool(order_service.create_orders_bulk, entries=entries, db=db)
 
 @router.put("/order/{order_id}/product/", response_model=schemas.OrderResponse)
 def edit_order(
@@ -49,18 +98,52 @@ def manual_update_order_status(
 ):
     return order_service.manual_update_order_status(order_id=order_id, new_status=new_status, db=db)
 
-@router.get("/order/{order_id}/status/")
-def track_order_status(
-    order_id: int,
-    db: Session = Depends(get_db)
-):
-    return order_service.track_order_status(db=db, order_id=order_id)
+if USE_ASYNC_DB:
+    @router.get("/order/{order_id}/status/")
+    async def track_order_status(
+        order_id: int,
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        order = await order_service.get_order_snapshot_async(db=db, order_id=order_id)
+        etag = make_etag("order", order["id"], order["updated_at"])
+
+        cached_response = not_modified(request, etag, order["updated_at"])
+        if cached_response:
+            return cached_response
+
+        set_validators(response, etag, order["updated_at"])
+        return order_service.order_status(order)
+
+else:
+    @router.get("/order/{order_id}/status/")
+    def track_order_status(
+        order_id: int,
+        request: Request,
+        response: Response,
+        db: Session = Depends(get_db)
+    ):
+        order = order_service.get_order_snapshot(db=db, order_id=order_id)
+        etag = make_etag("order", order["id"], order["updated_at"])
+
+        cached_response = not_modified(request, etag, order["updated_at"])
+        if cached_response:
+            return cached_response
+
+        set_validators(response, etag, order["updated_at"])
+        return order_service.order_status(order)
 
 @router.get("/orders/order_history/")
 def orders_history(
+    response: Response,
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 10, 
-    order_id: Optional[int] = None
+    order_id: Optional[int] = None,
+    before: Optional[datetime] = None,
+    cursor: Optional[str] = None
 ):
-    return order_service.orders_history(db=db, skip=skip, limit=limit, order_id=order_id)
\ No newline at end of file
+    history = order_service.orders_history(db=db, skip=skip, limit=limit, order_id=order_id, before=before, cursor=cursor)
+    set_next_cursor(response, history, order_service.ORDER_HISTORY_KEYSET, limit)
+    return history
\ No newline at end of file
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from services import product_service
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
+from pagination import set_next_cursor
+from etag import make_etag, not_modified, set_validators
+from bulk import iter_records
 import schemas
 
 
@@ -17,13 +20,35 @@ def create_product(
 ):
     return product_service.create_product(product=product, db=db)
 
+@router.post("/products/bulk")
+async def upsert_products(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """Catalog sync: a JSON array, NDJSON (application/x-ndjson) or CSV (text/csv) body of products to create or update"""
+    return await product_service.upsert_products(iter_records(request), db=db)
+
 @router.get("/products/", response_model=List[schemas.ProductResponse])
 def get_products(
-    db: Session = Depends(get_db), 
-    skip: int = 0, 
-    limit: int = 10
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None
 ):
-    return product_service.get_products(db=db, skip=skip, limit=limit)
+    product_count, last_modified = product_service.get_products_version(db=db)
+    etag = make_etag("products", skip, limit, cursor, product_count, last_modified)
+
+    # A 304 has no body, so it carries no X-Next-Cursor either; clients keep the one from their cached page
+    cached_response = not_modified(request, etag, last_modified)
+    if cached_response:
+        return cached_response
+
+    products = product_service.get_products(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, products, product_service.PRODUCTS_KEYSET, limit)
+    set_validators(response, etag, last_modified)
+    return products
 
 @router.patch("/products/{product_id}", response_model=schemas.ProductResponse)
 def update_product(
@@ -33,6 +58,14 @@ def update_product(
 ):
     return product_service.update_product(product_id=product_id, product_update=product_update, db=db)
 
+@router.delete("/products/")
+def delete_products(
+    ids: List[int] = Query(...),
+    db: Session = Depends(get_db)
+):
+    result = product_service.delete_products(product_ids=ids, db=db)
+    return {"message": "Products marked as deleted and orders updated", **result}
+
 @router.delete("/products/{product_id}")
 def delete_product(
     product_id: int,
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from services import reporting_service
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import USE_ASYNC_DB, get_async_db, get_db
+from etag import conditional_json
 from typing import Optional
 from datetime import datetime
 import schemas
@@ -11,42 +13,168 @@ router = APIRouter(
     tags=["Report"]
 )
 
-@router.get("/reports/revenue/")
-def get_total_revenue(
-    db: Session = Depends(get_db),
-    start_date: Optional[datetime] = None, 
-    end_date: Optional[datetime] = None, 
-):
-    return reporting_service.get_total_revenue(db=db, start_date=start_date, end_date=end_date)
+if USE_ASYNC_DB:
+    @router.get("/reports/revenue/")
+    async def get_total_revenue(
+        request: Request,
+        db: AsyncSession = Depends(get_async_db),
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ):
+        report = await reporting_service.get_total_revenue_async(db=db, start_date=start_date, end_date=end_date)
+        return conditional_json(request, report)
 
-@router.get("/reports/orders")
-def get_no_of_orders(
-        db: Session = Depends(get_db),
-        start_date: Optional[datetime] = None, 
-        end_date: Optional[datetime] = None, 
-):
-    return reporting_service.get_no_of_orders(db=db, start_date=start_date, end_date=end_date)
+    @router.get("/reports/orders")
+    async def get_no_of_orders(
+            request: Request,
+            db: AsyncSession = Depends(get_async_db),
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+    ):
+        report = await reporting_service.get_no_of_orders_async(db=db, start_date=start_date, end_date=end_date)
+        return conditional_json(request, report)
+
+    @router.get("/reports/popular_product")
+    async def get_popular_product(
+            request: Request,
+            db: AsyncSession = Depends(get_async_db),
+            limit: Optional[int] = None,
+            category: Optional[str] = None,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+    ):
+        report = await reporting_service.get_popular_product_async(
+            db=db, limit=limit, category=category, start_date=start_date, end_date=end_date
+        )
+        return conditional_json(request, report)
+
+    @router.get("/reports/expense/")
+    async def get_expense_report(
+            request: Request,
+            db: AsyncSession = Depends(get_async_db),
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+    ):
+        report = await reporting_service.get_expense_report_async(db=db, start_date=start_date, end_date=end_date)
+        return conditional_json(request, report)
 
-@router.get("/reports/popular_product")
-def get_popular_product(db: Session = Depends(get_db)):
-    return reporting_service.get_popular_product(db=db)
+    @router.get("/reports/client/")
+    async def get_client_report(
+            request: Request,
+            db: AsyncSession = Depends(get_async_db),
+            sort_by: schemas.ClientReportSortEnum = schemas.ClientReportSortEnum.TOTAL_SPENT,
+            descending: bool = True,
+            skip: int = 0,
+            limit: int = 10
+    ):
+        report = await reporting_service.get_client_report_async(
+            db=db, sort_by=sort_by, descending=descending, skip=skip, limit=limit
+        )
+        return conditional_json(request, report)
 
-@router.get("/reports/expense/")
-def get_expense_report(
+    @router.get("/reports/client_history/")
+    async def get_client_report_with_history(
+            request: Request,
+            db: AsyncSession = Depends(get_async_db),
+            sort_by: schemas.ClientReportSortEnum = schemas.ClientReportSortEnum.TOTAL_SPENT,
+            descending: bool = True,
+            skip: int = 0,
+            limit: int = 10
+    ):
+        report = await reporting_service.get_client_report_with_history_async(
+            db=db, sort_by=sort_by, descending=descending, skip=skip, limit=limit
+        )
+        return conditional_json(request, report)
+
+    @router.get("/reports/vendor/")
+    async def get_vendor_report(
+            request: Request,
+            db: AsyncSession = Depends(get_async_db),
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+    ):
+        report = await reporting_service.get_vendor_report_async(db=db, start_date=start_date, end_date=end_date)
+        return conditional_json(request, report)
+
+else:
+    @router.get("/reports/revenue/")
+    def get_total_revenue(
+        request: Request,
         db: Session = Depends(get_db),
-        start_date: Optional[datetime] = None, 
-        end_date: Optional[datetime] = None, 
-):
-    return reporting_service.get_expense_report(db=db, start_date=start_date, end_date=end_date)
-
-@router.get("/reports/client/")
-def get_client_report(db: Session = Depends(get_db)):
-    return reporting_service.get_client_report(db=db)
-
-@router.get("/reports/client_history/")
-def get_client_report_with_history(db: Session = Depends(get_db)):
-    return reporting_service.get_client_report_with_history(db=db)
-
-@router.get("/reports/vendor/")
-def get_vendor_report(db: Session = Depends(get_db)):
-    return reporting_service.get_vendor_report(db=db)
\ No newline at end of file
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ):
+        report = reporting_service.get_total_revenue(db=db, start_date=start_date, end_date=end_date)
+        return conditional_json(request, report)
+
+    @router.get("/reports/orders")
+    def get_no_of_orders(
+            request: Request,
+            db: Session = Depends(get_db),
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+    ):
+        report = reporting_service.get_no_of_orders(db=db, start_date=start_date, end_date=end_date)
+        return conditional_json(request, report)
+
+    @router.get("/reports/popular_product")
+    def get_popular_product(
+            request: Request,
+            db: Session = Depends(get_db),
+            limit: Optional[int] = None,
+            category: Optional[str] = None,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+    ):
+        report = reporting_service.get_popular_product(
+            db=db, limit=limit, category=category, start_date=start_date, end_date=end_date
+        )
+        return conditional_json(request, report)
+
+    @router.get("/reports/expense/")
+    def get_expense_report(
+            request: Request,
+            db: Session = Depends(get_db),
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+    ):
+        report = reporting_service.get_expense_report(db=db, start_date=start_date, end_date=end_date)
+        return conditional_json(request, report)
+
+    @router.get("/reports/client/")
+    def get_client_report(
+            request: Request,
+            db: Session = Depends(get_db),
+            sort_by: schemas.ClientReportSortEnum = schemas.ClientReportSortEnum.TOTAL_SPENT,
+            descending: bool = True,
+            skip: int = 0,
+            limit: int = 10
+    ):
+        report = reporting_service.get_client_report(
+            db=db, sort_by=sort_by, descending=descending, skip=skip, limit=limit
+        )
+        return conditional_json(request, report)
+
+    @router.get("/reports/client_history/")
+    def get_client_report_with_history(
+            request: Request,
+            db: Session = Depends(get_db),
+            sort_by: schemas.ClientReportSortEnum = schemas.ClientReportSortEnum.TOTAL_SPENT,
+            descending: bool = True,
+            skip: int = 0,
+            limit: int = 10
+    ):
+        report = reporting_service.get_client_report_with_history(
+            db=db, sort_by=sort_by, descending=descending, skip=skip, limit=limit
+        )
+        return conditional_json(request, report)
+
+    @router.get("/reports/vendor/")
+    def get_vendor_report(
+            request: Request,
+            db: Session = Depends(get_db),
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+    ):
+        report = reporting_service.get_vendor_report(db=db, start_date=start_date, end_date=end_date)
+        return conditional_json(request, report)
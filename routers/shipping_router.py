@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from services import shipping_service
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import USE_ASYNC_DB, get_async_db, get_db
+from etag import make_etag, not_modified, set_validators
 import schemas
 
 
@@ -16,12 +19,64 @@ def create_shipment(
 ):
     return shipping_service.create_shipments(order_id=order_id, db=db)
 
-@router.get("/shipments/{order_id}/")
-def track_shipments(
-    order_id: int, 
+@router.post("/shipments/wave")
+def create_shipment_wave(
+    wave: schemas.ShipmentWave,
     db: Session = Depends(get_db)
 ):
-    return shipping_service.track_shipments(order_id=order_id, db=db)
+    return shipping_service.create_shipment_wave(db=db, order_ids=wave.order_ids, limit=wave.limit)
+
+if USE_ASYNC_DB:
+    @router.get("/shipments/{order_id}/")
+    async def track_shipments(
+        order_id: int,
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        shipment = await shipping_service.get_shipment_snapshot_async(order_id=order_id, db=db)
+        etag = make_etag("shipment", shipment["id"], shipment["updated_at"])
+
+        cached_response = not_modified(request, etag, shipment["updated_at"])
+        if cached_response:
+            return cached_response
+
+        set_validators(response, etag, shipment["updated_at"])
+        return shipping_service.shipment_tracking(shipment)
+
+    @router.get("/shipments/{order_id}/carrier_status")
+    async def track_shipment_with_carrier(
+        order_id: int,
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        shipment = await shipping_service.get_shipment_snapshot_async(order_id=order_id, db=db)
+        return await shipping_service.carrier_tracking(shipment)
+
+else:
+    @router.get("/shipments/{order_id}/")
+    def track_shipments(
+        order_id: int, 
+        request: Request,
+        response: Response,
+        db: Session = Depends(get_db)
+    ):
+        shipment = shipping_service.get_shipment_snapshot(order_id=order_id, db=db)
+        etag = make_etag("shipment", shipment["id"], shipment["updated_at"])
+
+        cached_response = not_modified(request, etag, shipment["updated_at"])
+        if cached_response:
+            return cached_response
+
+        set_validators(response, etag, shipment["updated_at"])
+        return shipping_service.shipment_tracking(shipment)
+
+    @router.get("/shipments/{order_id}/carrier_status")
+    async def track_shipment_with_carrier(
+        order_id: int,
+        db: Session = Depends(get_db)
+    ):
+        shipment = await run_in_threadpool(shipping_service.get_shipment_snapshot, order_id=order_id, db=db)
+        return await shipping_service.carrier_tracking(shipment)
 
 @router.patch("/shipments/{order_id}/update")
 def update_shipment(
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from services import vendor_service
 from sqlalchemy.orm import Session
 from database import get_db
-from typing import List
+from pagination import set_next_cursor
+from typing import List, Optional
 import schemas
 
 
@@ -19,11 +20,15 @@ def create_vendor(
 
 @router.get("/vendors/", response_model=List[schemas.VendorResponse])
 def get_vendors(
+    response: Response,
     db: Session = Depends(get_db),
     skip: int = 0,
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None
 ):
-    return vendor_service.get_vendors(db=db, skip=skip, limit=limit)
+    vendors = vendor_service.get_vendors(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, vendors, vendor_service.VENDORS_KEYSET, limit)
+    return vendors
 
 @router.patch("/vendors/{vendor_id}", response_model=schemas.VendorResponse)
 def update_vendor(
@@ -33,6 +38,14 @@ def update_vendor(
 ):
     return vendor_service.update_vendor(vendor_id=vendor_id, vendor_update=vendor_update, db=db)
 
+@router.delete("/vendors/")
+def delete_vendors(
+    ids: List[int] = Query(...),
+    db: Session = Depends(get_db)
+):
+    result = vendor_service.delete_vendors(vendor_ids=ids, db=db)
+    return {"message": "Vendors marked as deleted and products updated", **result}
+
 @router.delete("/vendors/{vendor_id}")
 def delete_vendor(
     vendor_id: int,
@@ -26,6 +26,17 @@ class ProductUpdate(BaseModel):
     vendor_id: Optional[int] = None
 
 
+class ProductUpsert(BaseModel):
+    """A catalog sync row, matched to an existing product by id or else by (name, vendor_id)"""
+    id: Optional[int] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    stock: Optional[int] = None
+    category: Optional[str] = None
+    vendor_id: Optional[int] = None
+
+
 class VendorBase(BaseModel):
     name: str
 
@@ -117,7 +128,7 @@ class OrderResponse(BaseModel):
     client_id: int
     total_amount: float
     status: OrderStatusEnum
-    payment_intent: str
+    payment_intent: Optional[str] = None
     products: List[OrderProductCreate]
 
     class Config:
@@ -141,7 +152,7 @@ class OrderUpdateResponse(BaseModel):
 
 
 class OrderHistory(BaseModel):
-    # id: int
+    id: int
     order_id: int
     status: OrderStatusEnum
     changed_at: datetime
@@ -150,6 +161,13 @@ class OrderHistory(BaseModel):
         from_attributes = True
 
 
+class ClientReportSortEnum(str, Enum):
+    TOTAL_SPENT = "total_spent"
+    LIFETIME_SPEND = "lifetime_spend"
+    TOTAL_ORDERS = "total_orders"
+    LATEST_ORDER_DATE = "latest_order_date"
+
+
 class InvoiceStatusEnum(str, Enum):
     PENDING = "pending"
     PAID = "paid"
@@ -181,6 +199,17 @@ class ExpensecategoryEnum(str, Enum):
     OTHER = "other"
 
 
+class ExportFormatEnum(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class ExpenseGranularityEnum(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
 class ExpenseCreate(BaseModel):
     category: ExpensecategoryEnum
     amount: float
@@ -216,4 +245,10 @@ class ShipmentUpdate(BaseModel):
     estimated_delivery_date: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class ShipmentWave(BaseModel):
+    """Orders to ship together: the listed order_ids, or else the oldest `limit` approved orders"""
+    order_ids: Optional[List[int]] = None
+    limit: Optional[int] = None
\ No newline at end of file
@@ -1,8 +1,16 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
+from typing import Optional, Union
+from cache import AsyncCache
 import httpx
 from dotenv import load_dotenv
+import asyncio
+import importlib.util
+import logging
 import os
+import random
+import ssl
+import time
 import models
 
 load_dotenv()
@@ -10,16 +18,190 @@ load_dotenv()
 DHL_API_KEY = os.getenv("DHL_API_KEY")
 DHL_API_SECRET = os.getenv("DHL_API_SECRET")
 
-DHL_API_URL_CREATE = "https://api-sandbox.dhl.com/dgff/transportation/shipment-booking"
-DHL_API_URL_TRACK = "https://api-sandbox.dhl.com/dgff/transportation/v2/shipment-tracking"
+DHL_API_URL = os.getenv("DHL_API_URL", "https://api-sandbox.dhl.com")
+DHL_API_URL_CREATE = "/dgff/transportation/shipment-booking"
+DHL_API_URL_TRACK = "/dgff/transportation/v2/shipment-tracking"
 
+DHL_CONNECT_TIMEOUT = float(os.getenv("DHL_CONNECT_TIMEOUT", "5"))
+DHL_READ_TIMEOUT = float(os.getenv("DHL_READ_TIMEOUT", "15"))
+# How long a call waits for a free connection once DHL_MAX_CONNECTIONS are in use
+DHL_POOL_TIMEOUT = float(os.getenv("DHL_POOL_TIMEOUT", "10"))
+DHL_MAX_CONNECTIONS = int(os.getenv("DHL_MAX_CONNECTIONS", "20"))
+# Fewer idle connections than max connections makes a busy pool close and reopen them on every call
+DHL_MAX_KEEPALIVE = int(os.getenv("DHL_MAX_KEEPALIVE", str(DHL_MAX_CONNECTIONS)))
+DHL_KEEPALIVE_EXPIRY = float(os.getenv("DHL_KEEPALIVE_EXPIRY", "30"))
+DHL_MAX_RETRIES = int(os.getenv("DHL_MAX_RETRIES", "3"))
+DHL_RETRY_BACKOFF = float(os.getenv("DHL_RETRY_BACKOFF", "0.5"))
+DHL_RETRY_BACKOFF_MAX = float(os.getenv("DHL_RETRY_BACKOFF_MAX", "8"))
+# Calls per second across the whole worker, retries included; 0 turns the limiter off
+DHL_RATE_LIMIT = float(os.getenv("DHL_RATE_LIMIT", "10"))
+# Tracking answers are reused for DHL_TRACKING_CACHE_TTL seconds, then served stale for up to
+# DHL_TRACKING_STALE_TTL more while one background call refreshes them
+DHL_TRACKING_CACHE_TTL = float(os.getenv("DHL_TRACKING_CACHE_TTL", "60"))
+DHL_TRACKING_STALE_TTL = float(os.getenv("DHL_TRACKING_STALE_TTL", "600"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# A booking that failed with one of these was never processed, so resending it cannot book twice
+RETRY_STATUSES_UNSAFE = {429, 503}
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Token bucket: up to rate calls per second on average, in bursts of at most burst"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # Waiters queue on the lock, so tokens go out in arrival order
+        async with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 1
+                self.updated = time.monotonic()
+            self.tokens -= 1
+
+
+class DHLClient:
+    """Pooled connection to the DHL API shared by every request for the lifetime of the app.
+
+    Connections are kept alive between calls and HTTP/2 is used when the h2 package is installed.
+    At most max_connections calls are in flight, however many streams HTTP/2 would multiplex over
+    those connections; the rest wait up to the pool timeout for a slot.
+    Rate limits (429) and server errors are retried with jittered exponential backoff, honouring
+    Retry-After. Calls, retries included, are spread out to rate_limit per second.
+    Pass an httpx.MockTransport as transport to run without the network.
+    """
+
+    def __init__(
+            self,
+            base_url: str = DHL_API_URL,
+            api_key: Optional[str] = DHL_API_KEY,
+            transport: Optional[httpx.AsyncBaseTransport] = None,
+            max_connections: int = DHL_MAX_CONNECTIONS,
+            max_keepalive: int = DHL_MAX_KEEPALIVE,
+            max_retries: int = DHL_MAX_RETRIES,
+            backoff: float = DHL_RETRY_BACKOFF,
+            backoff_max: float = DHL_RETRY_BACKOFF_MAX,
+            timeout: Optional[httpx.Timeout] = None,
+            verify: Union[bool, ssl.SSLContext] = True,
+            rate_limit: float = DHL_RATE_LIMIT
+        ):
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Content-Type": "application/json", "DHL-API-Key": api_key or ""},
+            timeout=timeout or httpx.Timeout(DHL_READ_TIMEOUT, connect=DHL_CONNECT_TIMEOUT, pool=DHL_POOL_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=DHL_KEEPALIVE_EXPIRY
+            ),
+            http2=importlib.util.find_spec("h2") is not None,
+            verify=verify,
+            transport=transport
+        )
+        # httpx only bounds connections, and one HTTP/2 connection carries any number of streams
+        self.in_flight = asyncio.Semaphore(max_connections)
+        self.pool_timeout = self.client.timeout.pool
+
+    def retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        # Full jitter, so callers rejected together do not come back together
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    async def send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        try:
+            async with asyncio.timeout(self.pool_timeout):
+                await self.in_flight.acquire()
+        except TimeoutError:
+            raise httpx.PoolTimeout(f"No free DHL slot within {self.pool_timeout}s")
+
+        try:
+            return await self.client.request(method, url, **kwargs)
+        finally:
+            self.in_flight.release()
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        # A booking is not idempotent: after a read timeout or a 500 it may have gone through
+        idempotent = method in ("GET", "HEAD")
+        retry_statuses = RETRY_STATUSES if idempotent else RETRY_STATUSES_UNSAFE
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            try:
+                response = await self.send(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # Nothing reached DHL, so every method can be retried
+                if last_attempt:
+                    raise
+                logger.warning("DHL %s %s failed (%s), retrying", method, url, e.__class__.__name__)
+                await asyncio.sleep(self.retry_delay(attempt))
+                continue
+            except httpx.TransportError as e:
+                if last_attempt or not idempotent:
+                    raise
+                logger.warning("DHL %s %s failed (%s), retrying", method, url, e.__class__.__name__)
+                await asyncio.sleep(self.retry_delay(attempt))
+                continue
+
+            if response.status_code not in retry_statuses or last_attempt:
+                return response
+            logger.warning("DHL %s %s returned %d, retrying", method, url, response.status_code)
+            await asyncio.sleep(self.retry_delay(attempt, response))
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
 
-async def create_shipment(order_id: int, db: Session):
-    headers = {
-        "Content-Type": "application/json",
-        "DHL-API-Key": DHL_API_KEY,
-    }
 
+dhl_client: Optional[DHLClient] = None
+tracking_cache = AsyncCache(ttl=DHL_TRACKING_CACHE_TTL, stale_ttl=DHL_TRACKING_STALE_TTL)
+
+
+def open_client(**options) -> DHLClient:
+    """Create the shared client; called from the app lifespan"""
+    global dhl_client
+    dhl_client = DHLClient(**options)
+    return dhl_client
+
+
+async def close_client() -> None:
+    global dhl_client
+    if dhl_client is not None:
+        await dhl_client.aclose()
+        dhl_client = None
+
+
+def get_client() -> DHLClient:
+    # Scripts that never run the lifespan get a client on first use
+    return dhl_client or open_client()
+
+
+async def call_dhl(method: str, url: str, client: Optional[DHLClient] = None, **kwargs) -> httpx.Response:
+    try:
+        return await (client or get_client()).request(method, url, **kwargs)
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="DHL API timed out")
+    except httpx.TransportError:
+        raise HTTPException(status_code=502, detail="Could not reach DHL API")
+
+
+async def create_shipment(order_id: int, db: Session):
     order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if not order:
         raise HTTPException(
@@ -62,8 +244,7 @@ async def create_shipment(order_id: int, db: Session):
 }
 
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(DHL_API_URL_CREATE, json=shipment_data, headers=headers)
+    response = await call_dhl("POST", DHL_API_URL_CREATE, json=shipment_data)
 
     if response.status_code != 200:
         raise HTTPException(
@@ -89,26 +270,26 @@ async def create_shipment(order_id: int, db: Session):
 
     return tracking_number
 
-async def track_dhl_shipment(tracking_number: str):
-    headers = {
-        "Content-type": "application/json",
-        "DHL-API-Key": DHL_API_KEY,
-    }
-
+async def track_dhl_shipment(tracking_number: str, client: Optional[DHLClient] = None):
     params = {
         "trackingNumber": tracking_number,
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(DHL_API_URL_TRACK, params=params, headers=headers)
+    response = await call_dhl("GET", DHL_API_URL_TRACK, client=client, params=params)
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Error calling DHL API")
+
+    data = response.json()
+
+    if "shipments" not in data or not data["shipments"]:
+        raise HTTPException(status_code=404, detail="Shipment not found")
 
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Error calling DHL API")
-        
-        data = response.json()
+    shipment_status = data["shipments"][0].get("status", "Status not available")
+    return shipment_status
 
-        if "shipments" not in data or not data["shipments"]:
-            raise HTTPException(status_code=404, detail="Shipment not found")
-        
-        shipment_status = data["shipments"][0].get("status", "Status not available")
-        return shipment_status
\ No newline at end of file
+async def cached_tracking_status(tracking_number: str, client: Optional[DHLClient] = None):
+    """track_dhl_shipment behind tracking_cache: many readers of one shipment share one carrier call"""
+    return await tracking_cache.get_or_load(
+        tracking_number, lambda: track_dhl_shipment(tracking_number=tracking_number, client=client)
+    )
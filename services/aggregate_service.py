@@ -0,0 +1,444 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import case, delete, func, insert, select, update
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
+from bisect import bisect_left, insort
+from database import after_commit, dialect_insert
+import os
+import threading
+import models
+
+
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "30"))
+
+# Aggregates are written in the same transaction as the order change they reflect,
+# so a rollback leaves them consistent with the orders table. In-process state is
+# only touched from after_commit callbacks for the same reason.
+
+
+def status_column(status: models.OrderStatusEnum) -> str:
+    return f"{status.value}_count"
+
+
+def increment_daily_rollups(db: Session, increments: Dict[date, Dict[str, float]]) -> None:
+    if not increments:
+        return
+
+    columns = ["revenue", "order_count"] + [status_column(status) for status in models.OrderStatusEnum]
+    rows = [
+        {"day": day, **{column: values.get(column, 0) for column in columns}}
+        for day, values in increments.items()
+    ]
+
+    statement = dialect_insert(db, models.DailyOrderRollup).values(rows)
+    table = models.DailyOrderRollup.__table__
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.day],
+        set_={column: table.c[column] + statement.excluded[column] for column in columns}
+    ))
+
+
+def record_order_created(db: Session, created_at: datetime, total_amount: float, status: models.OrderStatusEnum = models.OrderStatusEnum.PENDING) -> None:
+    increment_daily_rollups(db, {
+        created_at.date(): {"revenue": total_amount, "order_count": 1, status_column(status): 1}
+    })
+
+
+def record_order_amount_changed(db: Session, created_at: datetime, difference: float) -> None:
+    if difference:
+        increment_daily_rollups(db, {created_at.date(): {"revenue": difference}})
+
+
+def record_order_status_changed(db: Session, created_at: datetime, old_status: models.OrderStatusEnum, new_status: models.OrderStatusEnum) -> None:
+    if old_status != new_status:
+        increment_daily_rollups(db, {
+            created_at.date(): {status_column(old_status): -1, status_column(new_status): 1}
+        })
+
+
+def split_range(start_date: Optional[datetime], end_date: Optional[datetime]) -> Tuple[Optional[tuple], List[tuple]]:
+    """Split an inclusive [start_date, end_date] range into whole days and at most two partial-day edges.
+
+    Returns (full_days, edges). full_days is a (first_day, last_day) pair where None means unbounded,
+    or None when the range covers no whole day. Each edge is (lower, upper, upper_inclusive).
+    """
+    if start_date and end_date:
+        if start_date > end_date:
+            return None, []
+        if start_date.date() == end_date.date():
+            return None, [(start_date, end_date, True)]
+
+    edges = []
+    first_day = last_day = None
+
+    if start_date:
+        first_day = start_date.date()
+        if start_date.time() != time.min:
+            first_day += timedelta(days=1)
+            edges.append((start_date, datetime.combine(first_day, time.min), False))
+
+    if end_date:
+        last_day = end_date.date() - timedelta(days=1)
+        edges.append((datetime.combine(end_date.date(), time.min), end_date, True))
+
+    if first_day and last_day and first_day > last_day:
+        return None, edges
+
+    return (first_day, last_day), edges
+
+
+def order_totals(db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Tuple[float, int]:
+    """Revenue and order count for orders created within [start_date, end_date]"""
+    full_days, edges = split_range(start_date, end_date)
+    revenue, order_count = 0.0, 0
+
+    if full_days:
+        first_day, last_day = full_days
+        query = db.query(func.sum(models.DailyOrderRollup.revenue), func.sum(models.DailyOrderRollup.order_count))
+        if first_day:
+            query = query.filter(models.DailyOrderRollup.day >= first_day)
+        if last_day:
+            query = query.filter(models.DailyOrderRollup.day <= last_day)
+
+        day_revenue, day_count = query.one()
+        revenue += day_revenue or 0
+        order_count += day_count or 0
+
+    for lower, upper, upper_inclusive in edges:
+        query = db.query(func.sum(models.Order.total_amount), func.count(models.Order.id)).filter(
+            models.Order.created_at >= lower,
+            models.Order.created_at <= upper if upper_inclusive else models.Order.created_at < upper
+        )
+
+        edge_revenue, edge_count = query.one()
+        revenue += edge_revenue or 0
+        order_count += edge_count or 0
+
+    return revenue, order_count
+
+
+def rebuild_daily_rollups(db: Session) -> int:
+    day = func.date(models.Order.created_at)
+    statuses = [
+        func.sum(case((models.Order.status == status, 1), else_=0))
+        for status in models.OrderStatusEnum
+    ]
+
+    db.execute(delete(models.DailyOrderRollup))
+    result = db.execute(insert(models.DailyOrderRollup).from_select(
+        ["day", "revenue", "order_count"] + [status_column(status) for status in models.OrderStatusEnum],
+        select(day, func.sum(models.Order.total_amount), func.count(models.Order.id), *statuses)
+        .where(models.Order.created_at.is_not(None))
+        .group_by(day)
+    ))
+
+    return result.rowcount
+
+
+class Ranking:
+    """Products kept sorted by units sold so the top N is a slice"""
+
+    def __init__(self):
+        self.entries = []
+        self.quantities = {}
+
+    def add(self, product_id: int, quantity: int) -> None:
+        old = self.quantities.get(product_id)
+        if old is not None:
+            del self.entries[bisect_left(self.entries, (-old, product_id))]
+
+        new = (old or 0) + quantity
+        self.quantities[product_id] = new
+        insort(self.entries, (-new, product_id))
+
+    def discard(self, product_id: int) -> None:
+        old = self.quantities.pop(product_id, None)
+        if old is not None:
+            del self.entries[bisect_left(self.entries, (-old, product_id))]
+
+    def top(self, limit: int) -> List[Tuple[int, int]]:
+        return [(product_id, -quantity) for quantity, product_id in self.entries[:limit] if quantity < 0]
+
+
+class ProductLeaderboard:
+    """Lifetime top sellers, overall and per category, kept in process memory.
+
+    Loaded from products.units_sold and updated by this process's own commits; it is reloaded every
+    LEADERBOARD_REFRESH_SECONDS so writes made by other workers show up too.
+    """
+
+    def __init__(self, refresh_seconds: float = LEADERBOARD_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        self.loaded_at = None
+        self.overall = Ranking()
+        self.by_category = {}
+        self.categories = {}
+
+    def load(self, db: Session) -> None:
+        # Query without holding the lock: under DB_ASYNC this runs inside AsyncSession.run_sync, which
+        # yields to the event loop mid-query, and another request waiting on a threading.Lock would
+        # block the loop thread for good. Only the swap of the rankings happens under the lock.
+        rows = db.query(models.Product.id, models.Product.category, models.Product.units_sold).filter(
+            models.Product.units_sold > 0, models.Product.is_deleted.isnot(True)).all()
+
+        overall, by_category, categories = Ranking(), {}, {}
+        for product_id, category, units_sold in rows:
+            categories[product_id] = category
+            overall.add(product_id, units_sold)
+            by_category.setdefault(category, Ranking()).add(product_id, units_sold)
+
+        # Sales committed between the query and the swap are applied to the rankings being replaced;
+        # the next refresh picks them up
+        with self.lock:
+            self.overall, self.by_category, self.categories = overall, by_category, categories
+            self.loaded_at = datetime.utcnow()
+
+    def apply(self, quantities: Dict[int, int]) -> None:
+        with self.lock:
+            if self.loaded_at is None:
+                return
+
+            for product_id, quantity in quantities.items():
+                if product_id not in self.categories:
+                    # Category unknown to this process yet, pick it up on the next read
+                    self.loaded_at = None
+                    return
+
+                self.overall.add(product_id, quantity)
+                self.by_category[self.categories[product_id]].add(product_id, quantity)
+
+    def remove(self, product_id: int) -> None:
+        with self.lock:
+            category = self.categories.pop(product_id, None)
+            self.overall.discard(product_id)
+            if category in self.by_category:
+                self.by_category[category].discard(product_id)
+
+    def top(self, db: Session, limit: int = 1, category: Optional[str] = None) -> List[Tuple[int, int]]:
+        loaded_at = self.loaded_at
+        if loaded_at is None or datetime.utcnow() - loaded_at > timedelta(seconds=self.refresh_seconds):
+            self.load(db)
+
+        with self.lock:
+            ranking = self.overall if category is None else self.by_category.get(category, Ranking())
+            return ranking.top(limit)
+
+
+product_leaderboard = ProductLeaderboard()
+
+
+def record_product_sales(db: Session, day: date, quantities: Dict[int, int]) -> None:
+    """Add per-product unit deltas (negative for removals) to units_sold and product_daily_sales"""
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity and product_id}
+    if not quantities:
+        return
+
+    db.execute(
+        update(models.Product)
+        .where(models.Product.id.in_(quantities))
+        .values(units_sold=func.coalesce(models.Product.units_sold, 0) + case(quantities, value=models.Product.id))
+        .execution_options(synchronize_session=False)
+    )
+
+    statement = dialect_insert(db, models.ProductDailySales).values([
+        {"product_id": product_id, "day": day, "quantity": quantity}
+        for product_id, quantity in quantities.items()
+    ])
+    table = models.ProductDailySales.__table__
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.product_id, table.c.day],
+        set_={"quantity": table.c.quantity + statement.excluded.quantity}
+    ))
+
+    after_commit(db, lambda: product_leaderboard.apply(quantities))
+
+
+def top_products(
+        db: Session,
+        limit: int = 1,
+        category: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[Tuple[int, int]]:
+    """(product_id, units sold) pairs, best seller first"""
+    if start_date is None and end_date is None:
+        return product_leaderboard.top(db=db, limit=limit, category=category)
+
+    # Time windows are answered from the per-day table at day granularity
+    total_quantity = func.sum(models.ProductDailySales.quantity)
+    query = db.query(models.ProductDailySales.product_id, total_quantity).join(
+        models.Product, models.Product.id == models.ProductDailySales.product_id).filter(
+            models.Product.is_deleted.isnot(True))
+
+    if start_date:
+        query = query.filter(models.ProductDailySales.day >= start_date.date())
+    if end_date:
+        query = query.filter(models.ProductDailySales.day <= end_date.date())
+    if category is not None:
+        query = query.filter(models.Product.category == category)
+
+    rows = query.group_by(models.ProductDailySales.product_id).having(total_quantity > 0).order_by(
+        total_quantity.desc(), models.ProductDailySales.product_id).limit(limit).all()
+
+    return [(product_id, quantity) for product_id, quantity in rows]
+
+
+def rebuild_product_sales(db: Session) -> int:
+    """Recompute product_daily_sales and units_sold from order_product; returns how many products were out of sync"""
+    day = func.date(models.Order.created_at)
+    line_totals = select(
+        models.OrderProduct.product_id, day, func.sum(models.OrderProduct.quantity)
+    ).join(models.Order, models.Order.id == models.OrderProduct.order_id).where(
+        models.OrderProduct.product_id.is_not(None)).group_by(models.OrderProduct.product_id, day)
+
+    db.execute(delete(models.ProductDailySales))
+    db.execute(insert(models.ProductDailySales).from_select(["product_id", "day", "quantity"], line_totals))
+
+    recomputed = select(func.coalesce(func.sum(models.ProductDailySales.quantity), 0)).where(
+        models.ProductDailySales.product_id == models.Product.id).scalar_subquery()
+
+    out_of_sync = db.query(func.count(models.Product.id)).filter(
+        func.coalesce(models.Product.units_sold, 0) != recomputed).scalar()
+
+    db.execute(
+        update(models.Product).values(units_sold=recomputed).execution_options(synchronize_session=False)
+    )
+
+    after_commit(db, product_leaderboard.invalidate)
+    return out_of_sync
+
+
+def increment_client_stats(db: Session, client_id: Optional[int], last_order_date: Optional[datetime] = None, **increments) -> None:
+    """Add to a client's lifetime_spend/order_count/invoice_total/invoice_count and move last_order_date forward"""
+    if client_id is None:
+        return
+
+    columns = ["lifetime_spend", "order_count", "invoice_total", "invoice_count"]
+    statement = dialect_insert(db, models.ClientStats).values(
+        client_id=client_id,
+        last_order_date=last_order_date,
+        **{column: increments.get(column, 0) for column in columns}
+    )
+    table = models.ClientStats.__table__
+    latest = case(
+        (statement.excluded.last_order_date.is_(None), table.c.last_order_date),
+        (table.c.last_order_date >= statement.excluded.last_order_date, table.c.last_order_date),
+        else_=statement.excluded.last_order_date
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.client_id],
+        set_={"last_order_date": latest, **{column: table.c[column] + statement.excluded[column] for column in columns}}
+    ))
+
+
+def rebuild_client_stats(db: Session) -> int:
+    invoices = select(models.Invoice.amount).join(models.Order, models.Order.id == models.Invoice.order_id)
+    client_orders = models.Order.__table__.alias("client_orders")
+    invoice_total = invoices.with_only_columns(func.coalesce(func.sum(models.Invoice.amount), 0)).where(
+        models.Order.client_id == client_orders.c.client_id).scalar_subquery()
+    invoice_count = invoices.with_only_columns(func.count(models.Invoice.id)).where(
+        models.Order.client_id == client_orders.c.client_id).scalar_subquery()
+
+    db.execute(delete(models.ClientStats))
+    result = db.execute(insert(models.ClientStats).from_select(
+        ["client_id", "lifetime_spend", "order_count", "last_order_date", "invoice_total", "invoice_count"],
+        select(
+            client_orders.c.client_id,
+            func.sum(client_orders.c.total_amount),
+            func.count(client_orders.c.id),
+            func.max(client_orders.c.created_at),
+            invoice_total,
+            invoice_count
+        ).where(client_orders.c.client_id.is_not(None)).group_by(client_orders.c.client_id)
+    ))
+
+    return result.rowcount
+
+
+def add_vendor_sale(sales: Dict[int, List[float]], vendor_id: Optional[int], amount: float, units: int) -> None:
+    if vendor_id is not None:
+        totals = sales.setdefault(vendor_id, [0.0, 0])
+        totals[0] += amount
+        totals[1] += units
+
+
+def record_vendor_sales(db: Session, day: date, sales: Dict[int, List[float]]) -> None:
+    """Add per-vendor (amount, units) deltas built with add_vendor_sale to vendor_daily_sales"""
+    if not sales:
+        return
+
+    statement = dialect_insert(db, models.VendorDailySales).values([
+        {"vendor_id": vendor_id, "day": day, "total_sales": amount, "units_sold": units}
+        for vendor_id, (amount, units) in sales.items()
+    ])
+    table = models.VendorDailySales.__table__
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.vendor_id, table.c.day],
+        set_={
+            "total_sales": table.c.total_sales + statement.excluded.total_sales,
+            "units_sold": table.c.units_sold + statement.excluded.units_sold
+        }
+    ))
+
+
+def vendor_totals(db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Dict[int, List[float]]:
+    """{vendor_id: [total_sales, units_sold]} for order lines whose order was created within [start_date, end_date]"""
+    full_days, edges = split_range(start_date, end_date)
+    totals = {}
+
+    if full_days:
+        first_day, last_day = full_days
+        query = db.query(
+            models.VendorDailySales.vendor_id,
+            func.sum(models.VendorDailySales.total_sales),
+            func.sum(models.VendorDailySales.units_sold)
+        )
+        if first_day:
+            query = query.filter(models.VendorDailySales.day >= first_day)
+        if last_day:
+            query = query.filter(models.VendorDailySales.day <= last_day)
+
+        for vendor_id, amount, units in query.group_by(models.VendorDailySales.vendor_id):
+            add_vendor_sale(totals, vendor_id, amount or 0, units or 0)
+
+    for lower, upper, upper_inclusive in edges:
+        query = db.query(
+            models.OrderProduct.vendor_id, func.sum(models.OrderProduct.price), func.sum(models.OrderProduct.quantity)
+        ).join(models.Order, models.Order.id == models.OrderProduct.order_id).filter(
+            models.OrderProduct.vendor_id.is_not(None),
+            models.Order.created_at >= lower,
+            models.Order.created_at <= upper if upper_inclusive else models.Order.created_at < upper
+        )
+
+        for vendor_id, amount, units in query.group_by(models.OrderProduct.vendor_id):
+            add_vendor_sale(totals, vendor_id, amount or 0, units or 0)
+
+    return totals
+
+
+def rebuild_vendor_sales(db: Session) -> int:
+    """Snapshot vendor_id onto legacy order lines and recompute vendor_daily_sales from them"""
+    current_vendor = select(models.Product.vendor_id).where(
+        models.Product.id == models.OrderProduct.product_id).scalar_subquery()
+    db.execute(
+        update(models.OrderProduct)
+        .where(models.OrderProduct.vendor_id.is_(None))
+        .values(vendor_id=current_vendor)
+        .execution_options(synchronize_session=False)
+    )
+
+    day = func.date(models.Order.created_at)
+    db.execute(delete(models.VendorDailySales))
+    result = db.execute(insert(models.VendorDailySales).from_select(
+        ["vendor_id", "day", "total_sales", "units_sold"],
+        select(
+            models.OrderProduct.vendor_id, day, func.sum(models.OrderProduct.price), func.sum(models.OrderProduct.quantity)
+        ).join(models.Order, models.Order.id == models.OrderProduct.order_id).where(
+            models.OrderProduct.vendor_id.is_not(None)).group_by(models.OrderProduct.vendor_id, day)
+    ))
+
+    return result.rowcount
@@ -1,10 +1,16 @@
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select, update
 from typing import List, Optional
+from pagination import paginate
+from cache import invalidate
 import schemas
 import models
 
 
+CLIENTS_KEYSET = (models.Client.id,)
+
+
 def create_client(client: schemas.ClientCreate, db: Session) -> models.Client:
     db_client = db.query(models.Client).filter(
         models.Client.email == client.email
@@ -28,9 +34,9 @@ def create_client(client: schemas.ClientCreate, db: Session) -> models.Client:
 
     return new_client
 
-def get_clients(db: Session, skip: int = 0, limit: int = 10) -> List[models.Client]:
-    db_clients = db.query(models.Client).offset(skip).limit(limit).all()
-    if not db_clients:
+def get_clients(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None) -> List[models.Client]:
+    db_clients = paginate(db.query(models.Client), CLIENTS_KEYSET, skip=skip, limit=limit, cursor=cursor).all()
+    if not db_clients and cursor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Clients not found"
@@ -55,20 +61,39 @@ def update_client(client_id: int, client_update: schemas.ClientUpdate, db: Sessi
     if client_update.phone_number is not None:
         db_client.phone_number=client_update.phone_number
 
+    invalidate(db, models.Client, client_id)
     db.commit()
 
     return db_client
 
 #Soft delete because client cannot be empty in order table
-def delete_client(client_id: int, db: Session):
-    db_client = db.query(models.Client).filter(
-        models.Client.id == client_id, models.Client.is_deleted == False).first()
-    
-    if db_client:
-        db_client.is_deleted = True
-        for order in db_client.orders:
-            order.client_id = None
+def delete_clients(client_ids: List[int], db: Session) -> dict:
+    """Soft delete clients and detach their orders with set-based UPDATEs in one transaction.
+
+    Orders are never loaded; the UPDATE returns their ids so their cache entries can be evicted.
+    """
+    deleted = db.scalars(
+        select(models.Client.id).where(models.Client.id.in_(client_ids), models.Client.is_deleted.isnot(True))
+    ).all()
+
+    if deleted:
+        db.execute(
+            update(models.Client).where(models.Client.id.in_(deleted)).values(is_deleted=True)
+            .execution_options(synchronize_session=False)
+        )
+        order_ids = db.scalars(
+            update(models.Order).where(models.Order.client_id.in_(deleted)).values(client_id=None)
+            .returning(models.Order.id).execution_options(synchronize_session=False)
+        ).all()
+
+        invalidate(db, models.Order, *order_ids)
+        invalidate(db, models.Client, *deleted)
         db.commit()
+
+    return {"deleted": deleted, "not_found": sorted(set(client_ids) - set(deleted))}
+
+def delete_client(client_id: int, db: Session):
+    if delete_clients([client_id], db)["deleted"]:
         return {"message": "Client marked as deleted and orders updated"}
     
     else:
@@ -1,11 +1,16 @@
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy import Date, cast, func
 from typing import Optional
 from datetime import datetime
+from pagination import paginate
 import schemas
 import models
 
 
+EXPENSES_KEYSET = (models.Expense.date, models.Expense.id)
+
+
 def create_expense(expense: schemas.ExpenseCreate, db: Session) -> models.Expense:
     
     new_expense = models.Expense(
@@ -35,7 +40,8 @@ def get_expenses(
         limit: int = 10, 
         start_date: Optional[datetime] = None, 
         end_date: Optional[datetime] = None, 
-        category: Optional[schemas.ExpensecategoryEnum] = None
+        category: Optional[schemas.ExpensecategoryEnum] = None,
+        cursor: Optional[str] = None
     ):
     
     expense = db.query(models.Expense)
@@ -45,18 +51,60 @@ def get_expenses(
     if category:
         expense = expense.filter(models.Expense.category == category)
 
-    return expense.offset(skip).limit(limit).all()
+    return paginate(expense, EXPENSES_KEYSET, skip=skip, limit=limit, cursor=cursor).all()
+
+def expense_period(db: Session, granularity: schemas.ExpenseGranularityEnum):
+    """Expression truncating Expense.date to the start of its day, ISO week (Monday) or month"""
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.date_trunc(granularity.value, models.Expense.date), Date)
+
+    if granularity == schemas.ExpenseGranularityEnum.WEEK:
+        return func.date(models.Expense.date, "weekday 0", "-6 days")
+    if granularity == schemas.ExpenseGranularityEnum.MONTH:
+        return func.date(models.Expense.date, "start of month")
+    return func.date(models.Expense.date)
+
+def get_expense_summary(
+        db: Session,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        granularity: Optional[schemas.ExpenseGranularityEnum] = None
+    ):
+    columns = [models.Expense.category, func.sum(models.Expense.amount)]
+    if granularity:
+        period = expense_period(db, granularity)
+        columns.insert(0, period)
+
+    result = db.query(*columns)
+    if start_date:
+        result = result.filter(models.Expense.date >= start_date)
+
+    if end_date:
+        result = result.filter(models.Expense.date <= end_date)
 
-def get_expense_summary(db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
-    expenses = get_expenses(db=db, start_date=start_date, end_date=end_date, skip=0, limit=10)
+    result = result.group_by(*columns[:-1])
+    if granularity:
+        result = result.order_by(period)
 
+    empty_categories = lambda: {category.value: 0 for category in schemas.ExpensecategoryEnum}
     summary = {
-        "total_amount": sum(expense.amount for expense in expenses),
-        "categories": {category.value: 0 for category in schemas.ExpensecategoryEnum}
+        "total_amount": 0,
+        "categories": empty_categories()
     }
+    periods = {}
+
+    for row in result:
+        category, amount = row[-2], row[-1] or 0
+        summary["total_amount"] += amount
+        summary["categories"][category.value] += amount
+
+        if granularity:
+            bucket = periods.setdefault(row[0], {"period": row[0], "total_amount": 0, "categories": empty_categories()})
+            bucket["total_amount"] += amount
+            bucket["categories"][category.value] += amount
 
-    for expense in expenses:
-        summary["categories"][expense.category.value] += expense.amount
+    if granularity:
+        summary["periods"] = list(periods.values())
 
     return summary
 
@@ -0,0 +1,183 @@
+from sqlalchemy import select
+from typing import Iterable, Iterator, List, Optional
+from datetime import datetime
+from enum import Enum
+from itertools import groupby
+from operator import itemgetter
+from database import SessionLocal
+import csv
+import io
+import json
+import os
+import schemas
+import models
+
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+ORDER_CSV_COLUMNS = ["order_id", "client_id", "status", "created_at", "total_amount", "product_id", "vendor_id", "quantity", "line_total"]
+INVOICE_CSV_COLUMNS = ["id", "order_id", "amount", "status", "due_date"]
+EXPENSE_CSV_COLUMNS = ["id", "category", "amount", "description", "date"]
+
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def ndjson_chunks(records: Iterable[dict], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, default=json_default))
+        if len(lines) == batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def csv_chunks(rows: Iterable[list], columns: List[str], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([csv_value(value) for value in row])
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def stream_rows(statement, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator:
+    """Iterate a SELECT in batches on a session owned by the generator.
+
+    FastAPI tears down yield dependencies before a StreamingResponse body is sent,
+    so the request's session would already be closed by the time rows are read.
+    """
+    with SessionLocal() as db:
+        # Plain rows through the connection skip ORM result processing; yield_per also
+        # turns on server-side cursors where the driver supports them
+        yield from db.connection().execute(statement.execution_options(yield_per=batch_size))
+
+
+def date_filters(column, start_date: Optional[datetime], end_date: Optional[datetime]) -> list:
+    filters = []
+    if start_date:
+        filters.append(column >= start_date)
+    if end_date:
+        filters.append(column <= end_date)
+    return filters
+
+
+def export_order(date_column, id_column, start_date: Optional[datetime], end_date: Optional[datetime]) -> tuple:
+    """Date-filtered exports follow the date index so only the range is read and nothing is sorted;
+    full exports walk the primary key"""
+    if start_date or end_date:
+        return (date_column, id_column)
+    return (id_column,)
+
+
+def order_records(rows: Iterable) -> Iterator[dict]:
+    # Lines of an order are adjacent because the order id is the last order key before the line id, so each order is assembled without buffering others
+    for order_id, lines in groupby(rows, key=itemgetter(0)):
+        products = []
+        for _, client_id, order_status, created_at, total_amount, product_id, vendor_id, quantity, price in lines:
+            if quantity is not None:
+                products.append({"product_id": product_id, "vendor_id": vendor_id, "quantity": quantity, "price": price})
+
+        yield {
+            "id": order_id,
+            "client_id": client_id,
+            "status": order_status,
+            "created_at": created_at,
+            "total_amount": total_amount,
+            "products": products
+        }
+
+
+def export_orders(
+        format: schemas.ExportFormatEnum = schemas.ExportFormatEnum.NDJSON,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        status: Optional[schemas.OrderStatusEnum] = None
+    ) -> Iterator[str]:
+    statement = select(
+        models.Order.id, models.Order.client_id, models.Order.status, models.Order.created_at, models.Order.total_amount,
+        models.OrderProduct.product_id, models.OrderProduct.vendor_id, models.OrderProduct.quantity, models.OrderProduct.price
+    ).outerjoin(
+        models.OrderProduct, models.OrderProduct.order_id == models.Order.id
+    ).where(
+        *date_filters(models.Order.created_at, start_date, end_date)
+    ).order_by(
+        *export_order(models.Order.created_at, models.Order.id, start_date, end_date), models.OrderProduct.id
+    )
+
+    if status:
+        statement = statement.where(models.Order.status == status)
+
+    rows = stream_rows(statement)
+
+    if format == schemas.ExportFormatEnum.CSV:
+        # One CSV row per order line, orders without lines get a single row with empty line columns
+        return csv_chunks(rows, ORDER_CSV_COLUMNS)
+
+    return ndjson_chunks(order_records(rows))
+
+
+def export_table(
+        columns: list,
+        csv_columns: List[str],
+        format: schemas.ExportFormatEnum,
+        filters: list,
+        order_by: tuple
+    ) -> Iterator[str]:
+    rows = stream_rows(select(*columns).where(*filters).order_by(*order_by))
+
+    if format == schemas.ExportFormatEnum.CSV:
+        return csv_chunks(rows, csv_columns)
+    return ndjson_chunks(dict(zip(csv_columns, row)) for row in rows)
+
+
+def export_invoices(
+        format: schemas.ExportFormatEnum = schemas.ExportFormatEnum.NDJSON,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        status: Optional[schemas.InvoiceStatusEnum] = None
+    ) -> Iterator[str]:
+    filters = date_filters(models.Invoice.due_date, start_date, end_date)
+    if status:
+        filters.append(models.Invoice.status == status)
+
+    return export_table(
+        [models.Invoice.id, models.Invoice.order_id, models.Invoice.amount, models.Invoice.status, models.Invoice.due_date],
+        INVOICE_CSV_COLUMNS, format, filters, export_order(models.Invoice.due_date, models.Invoice.id, start_date, end_date)
+    )
+
+
+def export_expenses(
+        format: schemas.ExportFormatEnum = schemas.ExportFormatEnum.NDJSON,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        category: Optional[schemas.ExpensecategoryEnum] = None
+    ) -> Iterator[str]:
+    filters = date_filters(models.Expense.date, start_date, end_date)
+    if category:
+        filters.append(models.Expense.category == category)
+
+    return export_table(
+        [models.Expense.id, models.Expense.category, models.Expense.amount, models.Expense.description, models.Expense.date],
+        EXPENSE_CSV_COLUMNS, format, filters, export_order(models.Expense.date, models.Expense.id, start_date, end_date)
+    )
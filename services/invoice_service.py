@@ -2,9 +2,15 @@ from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import timedelta
+from pagination import paginate
+from services import aggregate_service
+from cache import cached, invalidate
 import schemas
 import models
 
+
+INVOICES_KEYSET = (models.Invoice.id,)
+
 def generate_invoice(order_id: int, db: Session) -> models.Invoice:
     order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if not order:
@@ -28,6 +34,9 @@ def generate_invoice(order_id: int, db: Session) -> models.Invoice:
         )
 
         db.add(new_invoice)
+        aggregate_service.increment_client_stats(
+            db=db, client_id=order.client_id, invoice_total=new_invoice.amount, invoice_count=1
+        )
         db.commit()
         db.refresh(new_invoice)
 
@@ -39,9 +48,9 @@ def generate_invoice(order_id: int, db: Session) -> models.Invoice:
             due_date=new_invoice.due_date
         )
     
-def get_invoices(db: Session, skip: int = 0, limit: int = 10) ->List[models.Invoice]:
-    db_invoices = db.query(models.Invoice).offset(skip).limit(limit).all()
-    if not db_invoices:
+def get_invoices(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None) ->List[models.Invoice]:
+    db_invoices = paginate(db.query(models.Invoice), INVOICES_KEYSET, skip=skip, limit=limit, cursor=cursor).all()
+    if not db_invoices and cursor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Invoices not found"
@@ -58,6 +67,10 @@ def edit_invoice(invoice_id: int, invoice_update: schemas.InvoiceUpdate, db: Ses
         )
     
     if invoice_update.amount is not None:
+        if db_invoice.order is not None:
+            aggregate_service.increment_client_stats(
+                db=db, client_id=db_invoice.order.client_id, invoice_total=invoice_update.amount - (db_invoice.amount or 0)
+            )
         db_invoice.amount=invoice_update.amount
 
     if invoice_update.status is not None:
@@ -66,6 +79,7 @@ def edit_invoice(invoice_id: int, invoice_update: schemas.InvoiceUpdate, db: Ses
     if invoice_update.due_date is not None:
         db_invoice.due_date=invoice_update.due_date
 
+    invalidate(db, models.Invoice, invoice_id)
     db.commit()
 
     return db_invoice
@@ -80,6 +94,7 @@ def delete_invoice(invoice_id: int, db: Session) -> None:
         )
     
     db_invoice.status = models.InvoiceStatusEnum.CANCELLED
+    invalidate(db, models.Invoice, invoice_id)
     db.commit()
     db.refresh(db_invoice)
 
@@ -91,12 +106,20 @@ def delete_invoice(invoice_id: int, db: Session) -> None:
         due_date=db_invoice.due_date
     )
 
-def track_invoice_payment_status(invoice_id: int, db: Session) -> dict:
-    invoice = db.query(models.Invoice).filter(models.Invoice.id == invoice_id).first()
+def get_invoice_snapshot(invoice_id: int, db: Session) -> dict:
+    invoice = cached(
+        models.Invoice, invoice_id, lambda: db.query(models.Invoice).filter(models.Invoice.id == invoice_id).first()
+    )
     if not invoice:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Invoice not found"
         )
     
-    return {"order_id": invoice.id, "status": invoice.status}
\ No newline at end of file
+    return invoice
+
+def invoice_payment_status(invoice: dict) -> dict:
+    return {"order_id": invoice["id"], "status": invoice["status"]}
+
+def track_invoice_payment_status(invoice_id: int, db: Session) -> dict:
+    return invoice_payment_status(get_invoice_snapshot(invoice_id=invoice_id, db=db))
\ No newline at end of file
@@ -1,91 +1,160 @@
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import case, insert, select, update
+from typing import Any, Dict, List, Optional
 from datetime import datetime
+from pydantic import ValidationError
+from pagination import paginate
+from services import aggregate_service
+from cache import cached, cached_async, invalidate
+import os
 import schemas
 import models
-import stripe
 
 
+ORDERS_KEYSET = (models.Order.id,)
+# Newest first; id breaks ties between the many entries a bulk write stamps with one changed_at
+ORDER_HISTORY_KEYSET = (models.OrderHistory.changed_at, models.OrderHistory.id)
+BULK_ORDER_LIMIT = int(os.getenv("BULK_ORDER_LIMIT", "10000"))
+# Rows per IN list or CASE, well below SQLite's bound-parameter limit
+BULK_BATCH_SIZE = 500
+# Times a bulk order allocates stock, re-reading it after concurrent checkouts took some; at least once
+BULK_STOCK_ATTEMPTS = max(1, int(os.getenv("BULK_STOCK_ATTEMPTS", "3")))
+
+
+def reserve_stock(items: List[schemas.OrderProductCreate], db: Session) -> Dict[int, models.Product]:
+    """Load every requested product in one query and decrement stock with a single conditional UPDATE"""
+    quantities = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    if not quantities:
+        return {}
+
+    db_products = {
+        product.id: product
+        for product in db.query(models.Product).filter(models.Product.id.in_(quantities)).all()
+    }
+
+    for product_id, quantity in quantities.items():
+        db_product = db_products.get(product_id)
+        if not db_product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with ID {product_id} not found"
+            )
+
+        if db_product.is_deleted:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Product {db_product.name} has been deleted"
+            )
+
+        if (db_product.stock or 0) < quantity:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Not enough stock for product {db_product.name}. Available: {db_product.stock}, Required: {quantity}"
+            )
+
+    decrement_stock(quantities=quantities, db=db)
+    return db_products
+
+def try_decrement_stock(quantities: Dict[int, int], db: Session) -> List[int]:
+    """Take {product_id: quantity} out of stock with conditional UPDATEs.
+
+    Returns the products that ran short, after rolling the transaction back; nothing was taken then.
+    """
+    product_ids = list(quantities)
+
+    for start in range(0, len(product_ids), BULK_BATCH_SIZE):
+        batch = {product_id: quantities[product_id] for product_id in product_ids[start:start + BULK_BATCH_SIZE]}
+
+        # The WHERE clause re-checks stock so a concurrent checkout cannot oversell between the read and the write
+        reserved_quantity = case(batch, value=models.Product.id)
+        decremented = db.scalars(
+            update(models.Product)
+            .where(models.Product.id.in_(batch), models.Product.stock >= reserved_quantity)
+            .values(stock=models.Product.stock - reserved_quantity)
+            .returning(models.Product.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        if len(decremented) != len(batch):
+            db.rollback()
+            return sorted(set(batch) - set(decremented))
+
+    invalidate(db, models.Product, *quantities)
+    return []
+
+def decrement_stock(quantities: Dict[int, int], db: Session) -> None:
+    """Take {product_id: quantity} out of stock, rolling back with a 409 if any product ran short"""
+    if try_decrement_stock(quantities=quantities, db=db):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Stock changed while the order was being placed, please retry"
+        )
+
 def create_order(order: schemas.OrderCreate, db: Session) -> models.Order:
-    db_client = db.query(models.Client).filter(models.Client.id == order.client_id).first()
+    db_client = cached(
+        models.Client, order.client_id, lambda: db.query(models.Client).filter(models.Client.id == order.client_id).first()
+    )
     if not db_client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Client not found"
         )
     
-    if db_client.is_deleted:
+    if db_client["is_deleted"]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="client has been deleted"
             )
     
+    db_products = reserve_stock(items=order.products, db=db)
+
     total_amount = 0.0
 
     order_products = []
+    units_sold = {}
+    vendor_sales = {}
 
     for item in order.products:
-        db_product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-        if not db_product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Product with ID {item.product_id} not found"
-            )
-        
-        if db_product.is_deleted:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Product {db_product.name} has been deleted"
-            )
-        
-        if db_product.stock < item.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Not enough stock for product {db_product.name}. Available: {db_product.stock}, Required: {item.quantity}"
-            )
+        db_product = db_products[item.product_id]
 
-        
         price = db_product.price * item.quantity
         total_amount += price
+        units_sold[item.product_id] = units_sold.get(item.product_id, 0) + item.quantity
+        aggregate_service.add_vendor_sale(vendor_sales, db_product.vendor_id, price, item.quantity)
 
         order_product = models.OrderProduct(
             product_id=item.product_id,
+            vendor_id=db_product.vendor_id,
             quantity=item.quantity,
             price=price
         )
         order_products.append(order_product)
 
-        db_product.stock -= item.quantity
+    # The PaymentIntent is created later by payment_service's worker so no Stripe call happens inside this transaction
+    created_at = datetime.utcnow()
 
     new_order = models.Order(
         client_id=order.client_id,
         total_amount=total_amount,
-        status=models.OrderStatusEnum.PENDING
+        status=models.OrderStatusEnum.PENDING,
+        created_at=created_at,
+        payment_pending=True,
+        order_product=order_products,
+        history=[models.OrderHistory(status=models.OrderStatusEnum.PENDING, changed_at=created_at)]
     )
 
     db.add(new_order)
-    db.flush() 
-
-    try:
-        payment_intent = stripe.PaymentIntent.create(
-            amount=int(total_amount * 100),  
-            currency="usd",  
-            metadata={"order_id": new_order.id} 
-        )
-        new_order.payment_intent_id = payment_intent.id  
-        db.commit()
-    except stripe.error.StripeError as e:
-        db.rollback()  
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error creating PaymentIntent: {str(e)}"
-        )
-
-    for order_product in order_products:
-        order_product.order_id = new_order.id 
-
-    db.add_all(order_products)
+    aggregate_service.record_order_created(db=db, created_at=created_at, total_amount=total_amount)
+    aggregate_service.record_product_sales(db=db, day=created_at.date(), quantities=units_sold)
+    aggregate_service.record_vendor_sales(db=db, day=created_at.date(), sales=vendor_sales)
+    aggregate_service.increment_client_stats(
+        db=db, client_id=order.client_id, last_order_date=created_at, lifetime_spend=total_amount, order_count=1
+    )
     db.commit()
 
     return schemas.OrderResponse(
@@ -97,33 +166,214 @@ def create_order(order: schemas.OrderCreate, db: Session) -> models.Order:
         products=order.products
     )
 
-def get_orders(db: Session, skip: int = 0, limit: int = 10) -> List[schemas.OrderResponse]:
-    db_orders = db.query(models.Order).options(
+async def create_order_async(order: schemas.OrderCreate, db: AsyncSession) -> schemas.OrderResponse:
+    return await db.run_sync(lambda session: create_order(order=order, db=session))
+
+def load_in_batches(db: Session, columns: list, key, ids) -> dict:
+    """{id: row} for the given ids, fetched with IN lists of at most BULK_BATCH_SIZE"""
+    ids = list(ids)
+    rows = {}
+    for start in range(0, len(ids), BULK_BATCH_SIZE):
+        for row in db.execute(select(key, *columns).where(key.in_(ids[start:start + BULK_BATCH_SIZE]))):
+            rows[row[0]] = row
+    return rows
+
+def create_orders_bulk(entries: List[Any], db: Session) -> dict:
+    """Validate and place many orders in one transaction, reporting a result per entry.
+
+    Clients and products are loaded once for the whole batch, stock is allocated in memory in entry order
+    and then reserved with set-based UPDATEs, and orders, lines and history rows are inserted with executemany.
+    Entries that fail validation are rejected individually; the rest are still created. If concurrent
+    checkouts took stock in between, stock is re-read for the products that ran short and the entries
+    that no longer fit are rejected instead of failing the whole batch.
+    """
+    results = [None] * len(entries)
+    orders = {}
+
+    for index, entry in enumerate(entries):
+        try:
+            orders[index] = schemas.OrderCreate.model_validate(entry)
+        except ValidationError as error:
+            results[index] = {
+                "index": index, "status": "rejected",
+                "detail": error.errors(include_url=False, include_context=False, include_input=False)
+            }
+
+    clients = load_in_batches(
+        db, [models.Client.is_deleted], models.Client.id, {order.client_id for order in orders.values()}
+    )
+    products = load_in_batches(
+        db, [models.Product.name, models.Product.price, models.Product.stock, models.Product.is_deleted, models.Product.vendor_id],
+        models.Product.id, {item.product_id for order in orders.values() for item in order.products}
+    )
+    stock = {product_id: product.stock or 0 for product_id, product in products.items()}
+
+    def allocate() -> tuple:
+        """Give stock to entries in order against the current stock figures: (accepted, reserved, rejections)"""
+        available = dict(stock)
+        reserved, accepted, rejections = {}, [], {}
+        for index, order in orders.items():
+            client = clients.get(order.client_id)
+            quantities = {}
+            for item in order.products:
+                quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+            detail = None
+            if not client:
+                detail = "Client not found"
+            elif client.is_deleted:
+                detail = "client has been deleted"
+            else:
+                for product_id, quantity in quantities.items():
+                    product = products.get(product_id)
+                    if not product:
+                        detail = f"Product with ID {product_id} not found"
+                    elif product.is_deleted:
+                        detail = f"Product {product.name} has been deleted"
+                    elif available[product_id] < quantity:
+                        detail = f"Not enough stock for product {product.name}. Available: {available[product_id]}, Required: {quantity}"
+                    if detail:
+                        break
+
+            if detail:
+                rejections[index] = {"index": index, "status": "rejected", "detail": detail}
+                continue
+
+            for product_id, quantity in quantities.items():
+                available[product_id] -= quantity
+                reserved[product_id] = reserved.get(product_id, 0) + quantity
+            accepted.append(index)
+        return accepted, reserved, rejections
+
+    for attempt in range(1, BULK_STOCK_ATTEMPTS + 1):
+        accepted, reserved, rejections = allocate()
+        if not accepted:
+            break
+
+        short = try_decrement_stock(quantities=reserved, db=db)
+        if not short:
+            break
+
+        # Concurrent checkouts took stock since the snapshot: re-read it for the products that ran short
+        # and allocate again, so only the entries that no longer fit are rejected
+        if attempt == BULK_STOCK_ATTEMPTS:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Stock kept changing while the orders were being placed, please retry"
+            )
+        stock.update({
+            product_id: value or 0
+            for product_id, value in db.query(models.Product.id, models.Product.stock).filter(models.Product.id.in_(short))
+        })
+
+    for index, rejection in rejections.items():
+        results[index] = rejection
+
+    if accepted:
+        created_at = datetime.utcnow()
+        day = created_at.date()
+        order_rows = []
+        for index in accepted:
+            order = orders[index]
+            total_amount = sum(products[item.product_id].price * item.quantity for item in order.products)
+            order_rows.append({
+                "client_id": order.client_id,
+                "total_amount": total_amount,
+                "status": models.OrderStatusEnum.PENDING,
+                "created_at": created_at,
+                "payment_pending": True
+            })
+
+        order_ids = db.scalars(
+            insert(models.Order).returning(models.Order.id, sort_by_parameter_order=True), order_rows
+        ).all()
+
+        line_rows = []
+        vendor_sales = {}
+        client_totals = {}
+        for index, order_id, order_row in zip(accepted, order_ids, order_rows):
+            for item in orders[index].products:
+                product = products[item.product_id]
+                price = product.price * item.quantity
+                line_rows.append({
+                    "order_id": order_id, "product_id": item.product_id, "vendor_id": product.vendor_id,
+                    "quantity": item.quantity, "price": price
+                })
+                aggregate_service.add_vendor_sale(vendor_sales, product.vendor_id, price, item.quantity)
+
+            spend, count = client_totals.get(order_row["client_id"], (0.0, 0))
+            client_totals[order_row["client_id"]] = (spend + order_row["total_amount"], count + 1)
+            results[index] = {"index": index, "status": "created", "order_id": order_id, "total_amount": order_row["total_amount"]}
+
+        db.execute(insert(models.OrderProduct), line_rows)
+        db.execute(insert(models.OrderHistory), [
+            {"order_id": order_id, "status": models.OrderStatusEnum.PENDING, "changed_at": created_at} for order_id in order_ids
+        ])
+
+        aggregate_service.increment_daily_rollups(db, {day: {
+            "revenue": sum(order_row["total_amount"] for order_row in order_rows),
+            "order_count": len(order_rows),
+            aggregate_service.status_column(models.OrderStatusEnum.PENDING): len(order_rows)
+        }})
+        reserved_ids = list(reserved)
+        for start in range(0, len(reserved_ids), BULK_BATCH_SIZE):
+            aggregate_service.record_product_sales(db=db, day=day, quantities={
+                product_id: reserved[product_id] for product_id in reserved_ids[start:start + BULK_BATCH_SIZE]
+            })
+        aggregate_service.record_vendor_sales(db=db, day=day, sales=vendor_sales)
+        for client_id, (spend, count) in client_totals.items():
+            aggregate_service.increment_client_stats(
+                db=db, client_id=client_id, last_order_date=created_at, lifetime_spend=spend, order_count=count
+            )
+
+        db.commit()
+
+    return {
+        "created": len(accepted),
+        "rejected": len(entries) - len(accepted),
+        "results": results
+    }
+
+async def create_orders_bulk_async(entries: List[Any], db: AsyncSession) -> dict:
+    return await db.run_sync(lambda session: create_orders_bulk(entries=entries, db=session))
+
+def get_orders(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None) -> List[schemas.OrderResponse]:
+    query = db.query(models.Order).options(
         joinedload(models.Order.order_product).joinedload(models.OrderProduct.product)
-        ).offset(skip).limit(limit).all()
-    if not db_orders:
+        )
+    db_orders = paginate(query, ORDERS_KEYSET, skip=skip, limit=limit, cursor=cursor).all()
+    if not db_orders and cursor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Orders not found"
         )
     
-    order_responses= []
-    for order in db_orders:
-        order_response = schemas.OrderResponse(
-            id=order.id,
-            client_id=order.client_id,
-            total_amount=order.total_amount,
-            status=order.status,
-            payment_intent=order.payment_intent_id,
-            products=[
-                schemas.OrderProductCreate(product_id=op.product_id, quantity=op.quantity)
-                for op in order.order_product
-            ]
+    return [to_order_response(order) for order in db_orders]
+
+async def get_orders_async(db: AsyncSession, skip: int = 0, limit: int = 10, cursor: Optional[str] = None) -> List[schemas.OrderResponse]:
+    query = select(models.Order).options(selectinload(models.Order.order_product))
+    result = await db.execute(paginate(query, ORDERS_KEYSET, skip=skip, limit=limit, cursor=cursor))
+    db_orders = result.scalars().all()
+    if not db_orders and cursor is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Orders not found"
         )
-    
-        order_responses.append(order_response)
 
-    return order_responses
+    return [to_order_response(order) for order in db_orders]
+
+def to_order_response(order: models.Order) -> schemas.OrderResponse:
+    return schemas.OrderResponse(
+        id=order.id,
+        client_id=order.client_id,
+        total_amount=order.total_amount,
+        status=order.status,
+        payment_intent=order.payment_intent_id,
+        products=[
+            schemas.OrderProductCreate(product_id=op.product_id, quantity=op.quantity)
+            for op in order.order_product
+        ]
+    )
 
 def edit_order(db: Session, order_id: int, order_update: schemas.OrderUpdate) -> models.Order:
     db_order = db.query(models.Order).filter(models.Order.id == order_id).first()
@@ -169,20 +419,27 @@ def edit_order(db: Session, order_id: int, order_update: schemas.OrderUpdate) ->
             models.OrderProduct.product_id == order_update.product_id
         ).first()
 
+        sales_difference = db_product.price * order_update.quantity
+
         if order_product:
             order_product.quantity += order_update.quantity
+            order_product.price += sales_difference
+            line_vendor_id = order_product.vendor_id
         
         else:
             new_order_product = models.OrderProduct(
                 order_id=order_id,
                 product_id=order_update.product_id,
+                vendor_id=db_product.vendor_id,
                 quantity=order_update.quantity,
-                price=db_product.price
+                price=sales_difference
             )
 
             db.add(new_order_product)
+            line_vendor_id = db_product.vendor_id
         db_product.stock -= order_update.quantity
         total_amount += (db_product.price * order_update.quantity)
+        units_sold_difference = order_update.quantity
 
     
     elif order_update.action == schemas.ActionEnum.REMOVE:
@@ -199,6 +456,9 @@ def edit_order(db: Session, order_id: int, order_update: schemas.OrderUpdate) ->
         
         db_product.stock += order_update.quantity
         total_amount -= (db_product.price * order_product.quantity)
+        units_sold_difference = -order_product.quantity
+        sales_difference = -order_product.price
+        line_vendor_id = order_product.vendor_id
         db.delete(order_product)
 
     elif order_update.action == schemas.ActionEnum.UPDATE:
@@ -225,6 +485,10 @@ def edit_order(db: Session, order_id: int, order_update: schemas.OrderUpdate) ->
         total_amount -= db_product.price * order_product.quantity
         total_amount += db_product.price * order_update.quantity
         order_product.quantity = order_update.quantity
+        units_sold_difference = quantity_difference
+        sales_difference = db_product.price * order_update.quantity - order_product.price
+        order_product.price = db_product.price * order_update.quantity
+        line_vendor_id = order_product.vendor_id
 
     
     else:
@@ -233,7 +497,21 @@ def edit_order(db: Session, order_id: int, order_update: schemas.OrderUpdate) ->
             detail="Invalid action"
         )
     
+    aggregate_service.record_order_amount_changed(
+        db=db, created_at=db_order.created_at, difference=total_amount - db_order.total_amount
+    )
+    aggregate_service.increment_client_stats(
+        db=db, client_id=db_order.client_id, lifetime_spend=total_amount - db_order.total_amount
+    )
     db_order.total_amount = total_amount
+    aggregate_service.record_product_sales(
+        db=db, day=db_order.created_at.date(), quantities={db_product.id: units_sold_difference}
+    )
+    vendor_sales = {}
+    aggregate_service.add_vendor_sale(vendor_sales, line_vendor_id, sales_difference, units_sold_difference)
+    aggregate_service.record_vendor_sales(db=db, day=db_order.created_at.date(), sales=vendor_sales)
+    invalidate(db, models.Order, db_order.id)
+    invalidate(db, models.Product, db_product.id)
 
     db.commit()
 
@@ -273,6 +551,9 @@ def manual_update_order_status(order_id: int, new_status: schemas.OrderStatusEnu
             detail="Invalid status"
         )
 
+    aggregate_service.record_order_status_changed(
+        db=db, created_at=db_order.created_at, old_status=db_order.status, new_status=new_status
+    )
     db_order.status = new_status
 
     order_history = models.OrderHistory(
@@ -281,57 +562,75 @@ def manual_update_order_status(order_id: int, new_status: schemas.OrderStatusEnu
         changed_at=datetime.utcnow()
     )
     db.add(order_history)
+    invalidate(db, models.Order, db_order.id)
 
     db.commit()
 
     return {"message": f"Order status updated to {new_status}"}
 
-def track_order_status(order_id: int, db: Session) -> dict:
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+def get_order_snapshot(order_id: int, db: Session) -> dict:
+    order = cached(models.Order, order_id, lambda: db.query(models.Order).filter(models.Order.id == order_id).first())
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
     
-    return {"order_id": order.id, "status": order.status}
+    return order
 
-def orders_history(db: Session, skip: int = 0, limit: int = 10, order_id: Optional[int] = None) -> List[schemas.OrderHistory]:
-    orders = db.query(models.Order).all()
+async def get_order_snapshot_async(order_id: int, db: AsyncSession) -> dict:
+    order = await cached_async(models.Order, order_id, lambda: db.scalar(select(models.Order).where(models.Order.id == order_id)))
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
 
-    for order in orders:
-        existing_history = db.query(models.OrderHistory).filter(models.OrderHistory.order_id == order.id).first()
+    return order
 
-        if not existing_history:
-            new_history = models.OrderHistory(
-                order_id=order.id,
-                status=order.status,
-                changed_at=order.created_at
-            )
+def order_status(order: dict) -> dict:
+    return {"order_id": order["id"], "status": order["status"]}
 
-            db.add(new_history)
+def track_order_status(order_id: int, db: Session) -> dict:
+    return order_status(get_order_snapshot(order_id=order_id, db=db))
 
-    db.commit()
+async def track_order_status_async(order_id: int, db: AsyncSession) -> dict:
+    return order_status(await get_order_snapshot_async(order_id=order_id, db=db))
 
-    query = db.query(models.OrderHistory).order_by(models.OrderHistory.changed_at.desc())
+def orders_history(
+        db: Session,
+        skip: int = 0,
+        limit: int = 10,
+        order_id: Optional[int] = None,
+        before: Optional[datetime] = None,
+        cursor: Optional[str] = None
+    ) -> List[schemas.OrderHistory]:
+    query = db.query(models.OrderHistory)
 
     if order_id:
-        query = query.filter(models.OrderHistory.order_id == order_id)
-
-        order_exists = db.query(models.Order).filter(models.Order.id == order_id).first()
+        order_exists = db.query(models.Order.id).filter(models.Order.id == order_id).first()
 
         if not order_exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Order {order_id} not found"
             )
-        
-    history_entries = query.offset(skip).limit(limit).all()
+
+        query = query.filter(models.OrderHistory.order_id == order_id)
+
+    # Only entries older than this; page through them with cursor, not by moving before
+    if before:
+        query = query.filter(models.OrderHistory.changed_at < before)
+
+    history_entries = paginate(
+        query, ORDER_HISTORY_KEYSET, skip=skip, limit=limit, cursor=cursor, descending=True
+    ).all()
 
     return [
         schemas.OrderHistory(
+            id=entry.id,
             order_id=entry.order_id,
             status=entry.status,
             changed_at=entry.changed_at
         )for entry in history_entries
-    ]
\ No newline at end of file
+    ]
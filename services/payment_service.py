@@ -1,7 +1,17 @@
 import stripe
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy import bindparam, insert, select, update
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Optional
+from uuid import uuid4
+from database import SessionLocal, run_in_thread
+from services import aggregate_service
+from cache import invalidate
+import asyncio
+import logging
 import models
 import schemas
 import os
@@ -10,6 +20,94 @@ from dotenv import load_dotenv
 load_dotenv()
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 
+PAYMENT_CLIENT = os.getenv("PAYMENT_CLIENT", "stripe")
+PAYMENT_INTENT_BATCH_SIZE = int(os.getenv("PAYMENT_INTENT_BATCH_SIZE", "100"))
+PAYMENT_INTENT_POLL_INTERVAL = float(os.getenv("PAYMENT_INTENT_POLL_INTERVAL", "1.0"))
+# Every worker may run the outbox; rows are claimed atomically so each order is sent by one of them
+PAYMENT_INTENT_WORKER_ENABLED = os.getenv("PAYMENT_INTENT_WORKER_ENABLED", "true").lower() == "true"
+# A claimed row is left alone by other workers for this long, then retried if it was never written back
+PAYMENT_INTENT_LEASE = timedelta(seconds=float(os.getenv("PAYMENT_INTENT_LEASE_SECONDS", "120")))
+PAYMENT_INTENT_MAX_ATTEMPTS = int(os.getenv("PAYMENT_INTENT_MAX_ATTEMPTS", "10"))
+PAYMENT_INTENT_RETRY_BASE = float(os.getenv("PAYMENT_INTENT_RETRY_BASE_SECONDS", "30"))
+PAYMENT_INTENT_RETRY_MAX = float(os.getenv("PAYMENT_INTENT_RETRY_MAX_SECONDS", "3600"))
+PAYMENT_CONFIRM_BATCH_SIZE = int(os.getenv("PAYMENT_CONFIRM_BATCH_SIZE", "500"))
+# PaymentIntent lookups in flight at once; Stripe's read rate limit is 100 per second in live mode
+PAYMENT_CONFIRM_CONCURRENCY = int(os.getenv("PAYMENT_CONFIRM_CONCURRENCY", "20"))
+
+logger = logging.getLogger(__name__)
+
+
+stripe_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_stripe_executor() -> ThreadPoolExecutor:
+    """The process-wide pool Stripe calls run in, created on first use"""
+    global stripe_executor
+    if stripe_executor is None:
+        # The default executor has min(32, cpus + 4) threads, too few to keep many lookups in flight
+        stripe_executor = ThreadPoolExecutor(max_workers=PAYMENT_CONFIRM_CONCURRENCY, thread_name_prefix="stripe")
+    return stripe_executor
+
+
+def close_payment_client() -> None:
+    """Shut the Stripe pool down; called from the app lifespan and the confirm-payments command"""
+    global stripe_executor
+    if stripe_executor is not None:
+        stripe_executor.shutdown()
+        stripe_executor = None
+
+
+class StripePaymentClient:
+    """Talks to Stripe; the SDK is blocking so calls run in the shared stripe_executor"""
+
+    async def call(self, method, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(get_stripe_executor(), partial(method, **kwargs))
+
+    async def create_payment_intent(self, order_id: int, amount: float) -> str:
+        payment_intent = await self.call(
+            stripe.PaymentIntent.create,
+            amount=int(amount * 100),
+            currency="usd",
+            metadata={"order_id": order_id},
+            # Retries after a crash between the Stripe call and the backfill must not create a second intent
+            idempotency_key=f"order-{order_id}-payment-intent"
+        )
+        return payment_intent.id
+
+    async def retrieve_payment_intent(self, payment_intent_id: str) -> str:
+        payment_intent = await self.call(stripe.PaymentIntent.retrieve, id=payment_intent_id)
+        return payment_intent.status
+
+
+class FakePaymentClient:
+    """In-memory stand-in for Stripe used in tests and benchmarks"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.intents = {}
+
+    async def create_payment_intent(self, order_id: int, amount: float) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        payment_intent_id = f"pi_fake_{uuid4().hex}"
+        self.intents[payment_intent_id] = {"order_id": order_id, "amount": int(amount * 100), "status": "requires_payment_method"}
+        return payment_intent_id
+
+    async def retrieve_payment_intent(self, payment_intent_id: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if payment_intent_id not in self.intents:
+            raise LookupError(f"No such payment_intent: {payment_intent_id}")
+        return self.intents[payment_intent_id]["status"]
+
+
+def get_payment_client():
+    if PAYMENT_CLIENT == "fake":
+        return FakePaymentClient()
+    return StripePaymentClient()
+
 def verify_payment(payment_intent_id: str, db: Session) -> bool:
     try:
         payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
@@ -42,10 +140,10 @@ def update_order_status_to_approved(order_id: int, payment_intent_id: str, db: S
     
     verify_payment(payment_intent_id=payment_intent_id, db=db)
    
+    aggregate_service.record_order_status_changed(
+        db=db, created_at=db_order.created_at, old_status=db_order.status, new_status=models.OrderStatusEnum.APPROVED
+    )
     db_order.status = schemas.OrderStatusEnum.APPROVED
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
 
     new_history = models.OrderHistory(
         order_id=db_order.id,
@@ -53,6 +151,197 @@ def update_order_status_to_approved(order_id: int, payment_intent_id: str, db: S
         changed_at=datetime.utcnow()
     )
     db.add(new_history)
+    invalidate(db, models.Order, db_order.id)
+    db.commit()
+
+    return {"message": "Order approved successfully"}
+
+def payment_retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(PAYMENT_INTENT_RETRY_MAX, PAYMENT_INTENT_RETRY_BASE * 2 ** (attempts - 1)))
+
+def claim_pending_payment_intents(db: Session, batch_size: int = PAYMENT_INTENT_BATCH_SIZE, lease: timedelta = PAYMENT_INTENT_LEASE) -> list:
+    """Lease the next due orders to this worker and return their (id, total_amount, payment_attempts).
+
+    Selection and claim are one UPDATE, so two workers never get the same order. Orders that used
+    up PAYMENT_INTENT_MAX_ATTEMPTS stay pending with their attempt count for someone to look at.
+    """
+    now = datetime.utcnow()
+    due = (
+        models.Order.payment_pending == True,
+        models.Order.payment_attempts < PAYMENT_INTENT_MAX_ATTEMPTS,
+        models.Order.payment_next_attempt_at <= now
+    )
+    claimed = db.execute(
+        update(models.Order)
+        .where(models.Order.id.in_(select(models.Order.id).where(*due).order_by(models.Order.id).limit(batch_size)), *due)
+        # Leasing is bookkeeping, not a change to the order its validators should report
+        .values(payment_next_attempt_at=now + lease, updated_at=models.Order.updated_at)
+        .returning(models.Order.id, models.Order.total_amount, models.Order.payment_attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
     db.commit()
+    return sorted(claimed)
+
+def record_payment_intents(db: Session, claimed: list, results: list) -> int:
+    """Write back the PaymentIntents created for claimed orders and schedule retries for the failures"""
+    now = datetime.utcnow()
+    backfill, retries = [], []
+    for (order_id, _, attempts), result in zip(claimed, results):
+        if not isinstance(result, Exception):
+            backfill.append({"id": order_id, "payment_intent_id": result, "payment_pending": False})
+            continue
+
+        attempts += 1
+        if attempts >= PAYMENT_INTENT_MAX_ATTEMPTS:
+            logger.error("Giving up on a PaymentIntent for order %s after %s attempts: %s", order_id, attempts, result)
+        else:
+            logger.warning("Creating PaymentIntent for order %s failed (attempt %s): %s", order_id, attempts, result)
+        retries.append({"order_id": order_id, "attempts": attempts, "next_attempt_at": now + payment_retry_delay(attempts)})
+
+    if backfill:
+        db.execute(update(models.Order), backfill)
+        invalidate(db, models.Order, *(row["id"] for row in backfill))
+    if retries:
+        orders = models.Order.__table__
+        db.execute(
+            update(orders).where(orders.c.id == bindparam("order_id")).values(
+                payment_attempts=bindparam("attempts"), payment_next_attempt_at=bindparam("next_attempt_at"),
+                updated_at=orders.c.updated_at
+            ),
+            retries
+        )
+    db.commit()
+
+    return len(backfill)
+
+async def create_pending_payment_intents(db: Session, client, batch_size: int = PAYMENT_INTENT_BATCH_SIZE) -> int:
+    """Create PaymentIntents for one batch of due orders; returns how many orders were claimed"""
+    # Session work runs in a thread so a busy database never blocks the event loop
+    claimed = await run_in_thread(claim_pending_payment_intents, db, batch_size)
+
+    if not claimed:
+        return 0
+
+    results = await asyncio.gather(
+        *(client.create_payment_intent(order_id=order_id, amount=total_amount) for order_id, total_amount, _ in claimed),
+        return_exceptions=True
+    )
+
+    await run_in_thread(record_payment_intents, db, claimed, results)
+    return len(claimed)
+
+async def run_payment_intent_worker(
+        client=None,
+        batch_size: int = PAYMENT_INTENT_BATCH_SIZE,
+        poll_interval: float = PAYMENT_INTENT_POLL_INTERVAL
+    ):
+    client = client or get_payment_client()
+
+    while True:
+        try:
+            with SessionLocal() as db:
+                claimed = await create_pending_payment_intents(db=db, client=client, batch_size=batch_size)
+        except Exception:
+            logger.exception("Payment intent worker iteration failed")
+            claimed = 0
+
+        # Keep draining while full batches come back, otherwise wait for new orders
+        if claimed < batch_size:
+            await asyncio.sleep(poll_interval)
+
+async def confirm_pending_payments(
+        db: Session,
+        client,
+        batch_size: int = PAYMENT_CONFIRM_BATCH_SIZE,
+        concurrency: int = PAYMENT_CONFIRM_CONCURRENCY,
+        after_id: int = 0
+    ) -> dict:
+    """Verify the PaymentIntents of one page of pending orders and approve the paid ones in bulk.
+
+    Pages are keyed on order id: pass the returned last_id back as after_id for the next page, so
+    orders that are still unpaid are not fetched again in the same run. Paid orders that were approved
+    or cancelled by someone else while the lookups ran are counted as skipped.
+    """
+    pending = db.query(models.Order.id, models.Order.payment_intent_id, models.Order.created_at).filter(
+        models.Order.status == models.OrderStatusEnum.PENDING,
+        models.Order.payment_intent_id != None,
+        models.Order.id > after_id
+    ).order_by(models.Order.id).limit(batch_size).all()
+    # Release the read transaction before waiting on the payment provider
+    db.commit()
+
+    if not pending:
+        return {"checked": 0, "approved": 0, "unpaid": 0, "failed": 0, "skipped": 0, "last_id": after_id}
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def retrieve(payment_intent_id: str) -> str:
+        async with semaphore:
+            return await client.retrieve_payment_intent(payment_intent_id)
+
+    results = await asyncio.gather(*(retrieve(order.payment_intent_id) for order in pending), return_exceptions=True)
+
+    paid, failed = {}, 0
+    for order, result in zip(pending, results):
+        if isinstance(result, Exception):
+            logger.warning("Retrieving PaymentIntent %s for order %s failed: %s", order.payment_intent_id, order.id, result)
+            failed += 1
+        elif result == "succeeded":
+            paid[order.id] = order.created_at
+
+    approved = []
+    if paid:
+        # Guarded by the status: orders approved or cancelled while we waited on the provider are left alone
+        approved = db.scalars(
+            update(models.Order)
+            .where(models.Order.id.in_(paid), models.Order.status == models.OrderStatusEnum.PENDING)
+            .values(status=models.OrderStatusEnum.APPROVED)
+            .returning(models.Order.id).execution_options(synchronize_session=False)
+        ).all()
+
+    if approved:
+        now = datetime.utcnow()
+        db.execute(insert(models.OrderHistory), [
+            {"order_id": order_id, "status": models.OrderStatusEnum.APPROVED, "changed_at": now} for order_id in approved
+        ])
+
+        approved_per_day = {}
+        for order_id in approved:
+            day = paid[order_id].date()
+            approved_per_day[day] = approved_per_day.get(day, 0) + 1
+        aggregate_service.increment_daily_rollups(db, {
+            day: {
+                aggregate_service.status_column(models.OrderStatusEnum.PENDING): -count,
+                aggregate_service.status_column(models.OrderStatusEnum.APPROVED): count
+            }
+            for day, count in approved_per_day.items()
+        })
+
+        invalidate(db, models.Order, *approved)
+        db.commit()
+
+    return {
+        "checked": len(pending), "approved": len(approved),
+        "unpaid": len(pending) - len(paid) - failed, "failed": failed, "skipped": len(paid) - len(approved),
+        "last_id": pending[-1].id
+    }
+
+async def confirm_payments(
+        db: Session,
+        client=None,
+        batch_size: int = PAYMENT_CONFIRM_BATCH_SIZE,
+        concurrency: int = PAYMENT_CONFIRM_CONCURRENCY
+    ) -> dict:
+    """Reconcile every pending order that has a PaymentIntent, one page at a time"""
+    client = client or get_payment_client()
+    totals = {"checked": 0, "approved": 0, "unpaid": 0, "failed": 0, "skipped": 0}
+    after_id = 0
+
+    while True:
+        page = await confirm_pending_payments(db=db, client=client, batch_size=batch_size, concurrency=concurrency, after_id=after_id)
+        for key in totals:
+            totals[key] += page[key]
+        after_id = page["last_id"]
 
-    return {"message": "Order approved successfully"}
\ No newline at end of file
+        if page["checked"] < batch_size:
+            return totals
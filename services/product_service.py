@@ -1,10 +1,27 @@
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import func, select, update
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from datetime import datetime
+from pydantic import ValidationError
+from pagination import paginate
+from services import aggregate_service
+from database import after_commit, dialect_insert
+from cache import cached, invalidate
+import os
 import models
 import schemas
 
 
+PRODUCTS_KEYSET = (models.Product.id,)
+# Rows per upsert transaction; also the size of the IN lists used to look them up
+PRODUCT_UPSERT_BATCH_SIZE = int(os.getenv("PRODUCT_UPSERT_BATCH_SIZE", "500"))
+# Rejected rows reported back in detail, the rest are only counted
+PRODUCT_UPSERT_MAX_ERRORS = 100
+UPSERT_COLUMNS = ("name", "description", "price", "stock", "category", "vendor_id")
+
+
 def create_product(product: schemas.ProductCreate, db: Session) -> models.Product:
     db_product = db.query(models.Product).filter(
         models.Product.name == product.name,
@@ -18,7 +35,10 @@ def create_product(product: schemas.ProductCreate, db: Session) -> models.Produc
         )
     
     if product.vendor_id:
-        db_vendor = db.query(models.Vendor).filter(models.Vendor.id == product.vendor_id).first()
+        db_vendor = cached(
+            models.Vendor, product.vendor_id,
+            lambda: db.query(models.Vendor).filter(models.Vendor.id == product.vendor_id).first()
+        )
 
         if not db_vendor:
             raise HTTPException(
@@ -26,7 +46,7 @@ def create_product(product: schemas.ProductCreate, db: Session) -> models.Produc
                 detail="Vendor not found"
             )
         
-        if db_vendor.is_deleted:
+        if db_vendor["is_deleted"]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Vendor has been deleted"
@@ -48,15 +68,25 @@ def create_product(product: schemas.ProductCreate, db: Session) -> models.Produc
 
     return new_product
 
-def get_products(db: Session, skip: int = 0, limit: int = 10) -> List[models.Product]:
-    db_products = db.query(models.Product).offset(skip).limit(limit).all()
-    if not db_products:
+def get_products(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None) -> List[models.Product]:
+    db_products = paginate(db.query(models.Product), PRODUCTS_KEYSET, skip=skip, limit=limit, cursor=cursor).all()
+    if not db_products and cursor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Products Not found"
           )
     return db_products
 
+def get_products_version(db: Session) -> Tuple[int, Optional[datetime]]:
+    """Row count and latest change across products and their vendors, enough to tell whether any page changed.
+
+    Soft deletes bump updated_at, and a vendor rename shows up in every product listing.
+    """
+    product_count, products_changed = db.query(func.count(models.Product.id), func.max(models.Product.updated_at)).one()
+    vendors_changed = db.query(func.max(models.Vendor.updated_at)).scalar()
+
+    return product_count, max(filter(None, (products_changed, vendors_changed)), default=None)
+
 def update_product(product_id: int, product_update: schemas.ProductUpdate, db: Session) -> Optional[models.Product]:
     db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if not db_product:
@@ -83,20 +113,37 @@ def update_product(product_id: int, product_update: schemas.ProductUpdate, db: S
     if product_update.vendor_id is not None:
         db_product.vendor_id=product_update.vendor_id    
 
+    invalidate(db, models.Product, product_id)
     db.commit()
 
     return db_product
 
-def delete_product(product_id: int, db: Session) -> None:
-    db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    if db_product:
-        db_product.is_deleted = True
+def delete_products(product_ids: List[int], db: Session) -> dict:
+    """Soft delete products and detach their order lines with set-based UPDATEs in one transaction"""
+    deleted = db.scalars(select(models.Product.id).where(models.Product.id.in_(product_ids), models.Product.is_deleted.isnot(True))).all()
+
+    if deleted:
+        db.execute(
+            update(models.Product).where(models.Product.id.in_(deleted)).values(is_deleted=True)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            update(models.OrderProduct).where(models.OrderProduct.product_id.in_(deleted)).values(product_id=None)
+            .execution_options(synchronize_session=False)
+        )
 
-        for order_product in db_product.order_product:
-            order_product.product_id = None
+        def remove_from_leaderboard():
+            for product_id in deleted:
+                aggregate_service.product_leaderboard.remove(product_id)
 
+        after_commit(db, remove_from_leaderboard)
+        invalidate(db, models.Product, *deleted)
         db.commit()
 
+    return {"deleted": deleted, "not_found": sorted(set(product_ids) - set(deleted))}
+
+def delete_product(product_id: int, db: Session) -> None:
+    if delete_products([product_id], db)["deleted"]:
         return {"message": "Product marked as deleted and orders updated"}
     
     else:
@@ -107,14 +154,182 @@ def delete_product(product_id: int, db: Session) -> None:
 
 
 def product_availability(product_id: int, db: Session) -> dict:
-    available_product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    available_product = cached(
+        models.Product, product_id, lambda: db.query(models.Product).filter(models.Product.id == product_id).first()
+    )
     if not available_product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product Not found"
           )
     
-    if available_product.stock > 0 and not available_product.is_deleted:
+    if available_product["stock"] > 0 and not available_product["is_deleted"]:
         return {"status": "available", "product": available_product}
     else:
-        return {"message": f"Product with the ID {product_id} is out of stock and needs to be ordered"}
\ No newline at end of file
+        return {"message": f"Product with the ID {product_id} is out of stock and needs to be ordered"}
+
+
+def match_upsert_rows(rows: Dict[int, schemas.ProductUpsert], db: Session, vendors: Dict[int, Any], summary: dict) -> Tuple[list, Dict[int, schemas.ProductUpsert]]:
+    """Match rows to existing products and check them, returning (accepted rows, rows deferred to the next pass).
+
+    A row that touches a product or name already claimed earlier in the pass is deferred, so each
+    INSERT ... ON CONFLICT statement affects a product at most once and later rows still win.
+    """
+    ids = {row.id for row in rows.values() if row.id is not None}
+    names = {row.name for row in rows.values() if row.name is not None}
+    columns = [models.Product.id, models.Product.is_deleted, *(getattr(models.Product, column) for column in UPSERT_COLUMNS)]
+    existing = {}
+    if ids:
+        existing.update((product.id, product) for product in db.execute(select(*columns).where(models.Product.id.in_(ids))))
+    by_name = {}
+    if names:
+        for product in db.execute(select(*columns).where(models.Product.name.in_(names))):
+            existing[product.id] = product
+            by_name[product.name] = product
+
+    accepted = []
+    deferred = {}
+    claimed = set()
+    for index, row in rows.items():
+        # null, like an empty CSV cell, leaves the current value alone
+        fields = row.model_dump(exclude_unset=True, exclude_none=True, exclude={"id"})
+        if row.id is not None:
+            product = existing.get(row.id)
+            if not product:
+                reject_upsert_row(summary, index, f"Product with ID {row.id} not found")
+                continue
+        elif row.name is None or row.vendor_id is None:
+            reject_upsert_row(summary, index, "Either id or both name and vendor_id are required")
+            continue
+        else:
+            product = by_name.get(row.name)
+            if product and product.vendor_id != row.vendor_id:
+                reject_upsert_row(summary, index, f"Product {row.name} belongs to another vendor")
+                continue
+
+        if product and product.is_deleted:
+            reject_upsert_row(summary, index, f"Product {product.name} has been deleted")
+            continue
+
+        if row.name is not None and product and row.name != product.name and row.name in by_name:
+            reject_upsert_row(summary, index, f"Product {row.name} already exists")
+            continue
+
+        vendor_id = fields.get("vendor_id")
+        if vendor_id is not None:
+            vendor = vendors.get(vendor_id)
+            if not vendor:
+                reject_upsert_row(summary, index, "Vendor not found")
+                continue
+            if vendor.is_deleted:
+                reject_upsert_row(summary, index, "Vendor has been deleted")
+                continue
+
+        keys = {("name", row.name)} if row.name is not None else set()
+        if product:
+            keys |= {("id", product.id), ("name", product.name)}
+        if keys & claimed:
+            deferred[index] = row
+            continue
+        claimed |= keys
+
+        if product:
+            values = {column: getattr(product, column) for column in UPSERT_COLUMNS}
+            values.update(fields)
+        else:
+            try:
+                values = schemas.ProductCreate.model_validate(fields).model_dump(include=set(UPSERT_COLUMNS))
+            except ValidationError as error:
+                reject_upsert_row(summary, index, error.errors(include_url=False, include_context=False, include_input=False))
+                continue
+
+        accepted.append((product.id if product else None, tuple(sorted(fields)), values))
+
+    return accepted, deferred
+
+
+def reject_upsert_row(summary: dict, index: int, detail) -> None:
+    summary["rejected"] += 1
+    if len(summary["errors"]) < PRODUCT_UPSERT_MAX_ERRORS:
+        summary["errors"].append({"index": index, "detail": detail})
+
+
+def upsert_product_batch(entries: List[Any], db: Session, summary: dict, offset: int = 0) -> None:
+    """Create or update a batch of catalog rows in one transaction and add the outcome to summary.
+
+    Rows with an id update that product; rows without one are matched on name, which is unique, and must
+    name the same vendor_id as the existing product. Only the fields present in a row are written, using
+    INSERT ... ON CONFLICT DO UPDATE grouped by conflict target and field set. Vendors are checked with a
+    single query for the whole batch.
+    """
+    pending = {}
+    for position, entry in enumerate(entries, start=offset):
+        try:
+            pending[position] = schemas.ProductUpsert.model_validate(entry)
+        except ValidationError as error:
+            reject_upsert_row(summary, position, error.errors(include_url=False, include_context=False, include_input=False))
+
+    vendor_ids = {row.vendor_id for row in pending.values() if row.vendor_id is not None}
+    vendors = {}
+    if vendor_ids:
+        vendors = {
+            vendor.id: vendor
+            for vendor in db.execute(select(models.Vendor.id, models.Vendor.is_deleted).where(models.Vendor.id.in_(vendor_ids)))
+        }
+
+    updated_ids = []
+    while pending:
+        accepted, pending = match_upsert_rows(pending, db, vendors, summary)
+
+        statements = {}
+        for product_id, fields, values in accepted:
+            target = "id" if product_id is not None else "name"
+            if product_id is not None:
+                values = {"id": product_id, **values}
+                updated_ids.append(product_id)
+            statements.setdefault((target, fields), []).append(values)
+
+        now = datetime.utcnow()
+        table = models.Product.__table__
+        for (target, fields), rows in statements.items():
+            for values in rows:
+                values["updated_at"] = now
+
+            statement = dialect_insert(db, models.Product)
+            set_ = {column: statement.excluded[column] for column in fields}
+            set_["updated_at"] = statement.excluded.updated_at
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[table.c[target]],
+                set_=set_,
+                # A name-keyed row never takes over a product another vendor created in the meantime
+                where=None if target == "id" else table.c.vendor_id == statement.excluded.vendor_id
+            ), rows)
+
+        summary["updated"] += sum(1 for product_id, _, _ in accepted if product_id is not None)
+        summary["created"] += sum(1 for product_id, _, _ in accepted if product_id is None)
+
+    invalidate(db, models.Product, *updated_ids)
+    db.commit()
+
+
+async def upsert_products(records: AsyncIterator[Any], db: Session) -> dict:
+    """Apply a stream of catalog rows in PRODUCT_UPSERT_BATCH_SIZE transactions.
+
+    Only one batch is held in memory at a time. Batches already committed stay applied if the body
+    turns out to be malformed further on.
+    """
+    summary = {"created": 0, "updated": 0, "rejected": 0, "errors": []}
+    batch = []
+    offset = 0
+
+    async for record in records:
+        batch.append(record)
+        if len(batch) == PRODUCT_UPSERT_BATCH_SIZE:
+            await run_in_threadpool(upsert_product_batch, batch, db, summary, offset)
+            offset += len(batch)
+            batch = []
+
+    if batch:
+        await run_in_threadpool(upsert_product_batch, batch, db, summary, offset)
+
+    return summary
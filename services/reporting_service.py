@@ -1,9 +1,12 @@
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func
 from typing import Optional
 from datetime import datetime
+from services import aggregate_service
 import models
+import schemas
 
 
 def get_total_revenue(
@@ -12,17 +15,9 @@ def get_total_revenue(
         end_date: Optional[datetime] = None, 
     ):
 
-    result = db.query(func.sum(models.Order.total_amount))
+    total_revenue, total_orders = aggregate_service.order_totals(db=db, start_date=start_date, end_date=end_date)
 
-    if start_date:
-        result = result.filter(models.Order.created_at >= start_date)
-
-    if end_date:
-        result = result.filter(models.Order.created_at <= end_date)
-
-    total_revenue = result.scalar()
-
-    if total_revenue is None:
+    if not total_orders:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, 
                 detail="No revenue found for the given time period."
@@ -36,39 +31,44 @@ def get_no_of_orders(
         end_date: Optional[datetime] = None, 
 ):
     
-    result = db.query(func.count(models.Order.id))
-
-    if start_date:
-        result = result.filter(models.Order.created_at >= start_date)
-
-    if end_date:
-        result = result.filter(models.Order.created_at <= end_date)
-
-    total_orders = result.scalar()
+    _, total_orders = aggregate_service.order_totals(db=db, start_date=start_date, end_date=end_date)
 
     return (f"Total number of orders: {total_orders}")
 
-def get_popular_product(db: Session):
-    result = db.query(models.Product, func.sum(models.OrderProduct.quantity).label("total_quantity")).join(
-        models.OrderProduct, models.OrderProduct.product_id == models.Product.id).group_by(
-            models.Product.id).order_by(
-                func.sum(models.OrderProduct.quantity).desc()).first()
-    
-    if result is None:
+def get_popular_product(
+        db: Session,
+        limit: Optional[int] = None,
+        category: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+):
+    top = aggregate_service.top_products(
+        db=db, limit=limit or 1, category=category, start_date=start_date, end_date=end_date
+    )
+
+    if not top:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No popular product found.")
-    
-    product = result[0]
-    total_quantity = result[1]
-
-    return {
-        "product_id": product.id,
-        "product_name": product.name,
-        "product_description": product.description,
-        "total_quantity": total_quantity
+
+    products = {
+        product.id: product
+        for product in db.query(models.Product).filter(models.Product.id.in_([product_id for product_id, _ in top])).all()
     }
 
+    popular_products = [
+        {
+            "product_id": product_id,
+            "product_name": products[product_id].name,
+            "product_description": products[product_id].description,
+            "total_quantity": total_quantity
+        }
+        for product_id, total_quantity in top
+    ]
+
+    # Without a limit the endpoint keeps returning the single best seller as before
+    return popular_products if limit else popular_products[0]
+
 def get_expense_report(
         db: Session,
         start_date: Optional[datetime] = None, 
@@ -93,45 +93,127 @@ def get_expense_report(
             for category, total_expense in expense_report
     ]
 
-def get_client_report(db: Session):
-    
-    result = db.query(models.Client.name, func.sum(models.Invoice.amount).label("total_spent")).join(
-        models.Order, models.Order.client_id == models.Client.id).join(
-            models.Invoice, models.Invoice.order_id == models.Order.id).group_by(
-                models.Client.name).all()
-    
+CLIENT_REPORT_SORT_COLUMNS = {
+    schemas.ClientReportSortEnum.TOTAL_SPENT: models.ClientStats.invoice_total,
+    schemas.ClientReportSortEnum.LIFETIME_SPEND: models.ClientStats.lifetime_spend,
+    schemas.ClientReportSortEnum.TOTAL_ORDERS: models.ClientStats.order_count,
+    schemas.ClientReportSortEnum.LATEST_ORDER_DATE: models.ClientStats.last_order_date,
+}
+
+def client_stats_page(
+        db: Session,
+        sort_by: schemas.ClientReportSortEnum = schemas.ClientReportSortEnum.TOTAL_SPENT,
+        descending: bool = True,
+        skip: int = 0,
+        limit: int = 10
+):
+    sort_column = CLIENT_REPORT_SORT_COLUMNS[sort_by]
+    order_by = [sort_column.desc(), models.ClientStats.client_id.desc()] if descending else [sort_column.asc(), models.ClientStats.client_id.asc()]
+
+    return db.query(models.ClientStats, models.Client.name).join(
+        models.Client, models.Client.id == models.ClientStats.client_id).filter(
+            models.Client.is_deleted.isnot(True)).order_by(*order_by).offset(skip).limit(limit).all()
+
+def get_client_report(
+        db: Session,
+        sort_by: schemas.ClientReportSortEnum = schemas.ClientReportSortEnum.TOTAL_SPENT,
+        descending: bool = True,
+        skip: int = 0,
+        limit: int = 10
+):
+    result = client_stats_page(db=db, sort_by=sort_by, descending=descending, skip=skip, limit=limit)
+
     return [
-            {"client_name": client_name, "total_spent": total_spent}
-            for client_name, total_spent in result
+            {"client_id": stats.client_id, "client_name": client_name, "total_spent": stats.invoice_total}
+            for stats, client_name in result
         ]
 
-def get_client_report_with_history(db: Session):
+def get_client_report_with_history(
+        db: Session,
+        sort_by: schemas.ClientReportSortEnum = schemas.ClientReportSortEnum.TOTAL_SPENT,
+        descending: bool = True,
+        skip: int = 0,
+        limit: int = 10
+):
+    result = client_stats_page(db=db, sort_by=sort_by, descending=descending, skip=skip, limit=limit)
 
-    result = db.query(models.Client.name,func.sum(models.Invoice.amount).label("total_spent"),
-                      func.count(models.Order.id).label("total_orders"),
-                      func.max(models.Order.created_at).label("latest_order_date")).join(
-                          models.Order, models.Order.client_id == models.Client.id).join(
-                              models.Invoice, models.Invoice.order_id == models.Order.id).group_by(
-                                  models.Client.name).all()
-    
     return [
             {
+                "client_id": stats.client_id,
                 "client_name": client_name,
-                "total_spent": total_spent,
-                "total_orders": total_orders,
-                "latest_order_date": latest_order_date
+                "total_spent": stats.invoice_total,
+                "lifetime_spend": stats.lifetime_spend,
+                "total_orders": stats.order_count,
+                "latest_order_date": stats.last_order_date
             }
-            for client_name, total_spent, total_orders, latest_order_date in result
+            for stats, client_name in result
         ]
 
-def get_vendor_report(db: Session):
-    result = db.query(models.Vendor.name, func.sum(models.Invoice.amount).label("total_sales")).join(
-        models.Product, models.Product.vendor_id == models.Vendor.id).join(
-            models.OrderProduct, models.OrderProduct.product_id == models.Product.id).join(
-                models.Invoice, models.Invoice.order_id == models.OrderProduct.order_id).group_by(
-                models.Vendor.name).all()
-    
+def get_vendor_report(
+        db: Session,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+):
+    totals = aggregate_service.vendor_totals(db=db, start_date=start_date, end_date=end_date)
+    vendor_names = dict(
+        db.query(models.Vendor.id, models.Vendor.name).filter(models.Vendor.id.in_(totals)).all()
+    ) if totals else {}
+
+    result = sorted(totals.items(), key=lambda vendor: vendor[1][0], reverse=True)
+
     return [
-            {"vendor_name": vendor_name, "total_sales": total_sales}
-            for vendor_name, total_sales in result
-        ]
\ No newline at end of file
+            {
+                "vendor_id": vendor_id,
+                "vendor_name": vendor_names.get(vendor_id),
+                "total_sales": total_sales,
+                "units_sold": units_sold
+            }
+            for vendor_id, (total_sales, units_sold) in result
+        ]
+
+
+# Async variants run the same queries through AsyncSession.run_sync so the event loop is never blocked
+async def get_total_revenue_async(
+        db: AsyncSession,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ):
+    return await db.run_sync(lambda session: get_total_revenue(db=session, start_date=start_date, end_date=end_date))
+
+async def get_no_of_orders_async(
+        db: AsyncSession,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ):
+    return await db.run_sync(lambda session: get_no_of_orders(db=session, start_date=start_date, end_date=end_date))
+
+async def get_popular_product_async(
+        db: AsyncSession,
+        limit: Optional[int] = None,
+        category: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ):
+    return await db.run_sync(lambda session: get_popular_product(
+        db=session, limit=limit, category=category, start_date=start_date, end_date=end_date
+    ))
+
+async def get_expense_report_async(
+        db: AsyncSession,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ):
+    return await db.run_sync(lambda session: get_expense_report(db=session, start_date=start_date, end_date=end_date))
+
+async def get_client_report_async(db: AsyncSession, **options):
+    return await db.run_sync(lambda session: get_client_report(db=session, **options))
+
+async def get_client_report_with_history_async(db: AsyncSession, **options):
+    return await db.run_sync(lambda session: get_client_report_with_history(db=session, **options))
+
+async def get_vendor_report_async(
+        db: AsyncSession,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ):
+    return await db.run_sync(lambda session: get_vendor_report(db=session, start_date=start_date, end_date=end_date))
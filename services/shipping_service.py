@@ -1,9 +1,22 @@
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, select, update
 from datetime import datetime, timedelta
+from typing import List, Optional
 from uuid import uuid4
+from services import aggregate_service, tracking_service, DHL_service
+from cache import cached, cached_async, invalidate
 import schemas
 import models
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Orders one wave may ship; every id is a bound parameter of the validation query
+SHIPMENT_WAVE_LIMIT = int(os.getenv("SHIPMENT_WAVE_LIMIT", "5000"))
+ESTIMATED_DELIVERY = timedelta(days=30)
 
 
 def create_shipments(order_id: int, db: Session):
@@ -28,26 +41,29 @@ def create_shipments(order_id: int, db: Session):
     
     tracking_number = str(uuid4())
 
-    estimated_delivery_date = datetime.utcnow() + timedelta(days=30)
+    estimated_delivery_date = datetime.utcnow() + ESTIMATED_DELIVERY
 
     shipment = models.Shipment(
         order_id=order.id,
         tracking_number=tracking_number,
         status=schemas.ShipmentStatusEnum.PENDING,
-        estimated_delivery_date=estimated_delivery_date
+        estimated_delivery_date=estimated_delivery_date,
+        next_check_at=datetime.utcnow()
     )
 
+    aggregate_service.record_order_status_changed(
+        db=db, created_at=order.created_at, old_status=order.status, new_status=models.OrderStatusEnum.SHIPPED
+    )
     order.status = schemas.OrderStatusEnum.SHIPPED
-
-    db.add(shipment)
-    db.commit()
-    db.refresh(shipment)
+    invalidate(db, models.Order, order.id)
 
     new_history = models.OrderHistory(
         order_id=order.id,
         status=order.status,
         changed_at=datetime.utcnow()
     )
+
+    db.add(shipment)
     db.add(new_history)
     db.commit()
 
@@ -61,22 +77,174 @@ def create_shipments(order_id: int, db: Session):
     }
 }
 
-def track_shipments(order_id: int, db: Session):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+def create_shipment_wave(db: Session, order_ids: Optional[List[int]] = None, limit: Optional[int] = None) -> dict:
+    """Ship many approved orders in one transaction, reporting a result per order.
+
+    The orders are loaded with one query, shipments and history rows are inserted with executemany
+    and the statuses flip in a single UPDATE. Orders that are missing or not approved are rejected
+    individually; the rest still ship. Without order_ids, the oldest `limit` approved orders ship.
+    """
+    if (order_ids is None) == (limit is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either order_ids or limit"
+        )
+
+    wave_size = len(order_ids) if order_ids is not None else limit
+    if wave_size < 1 or wave_size > SHIPMENT_WAVE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A wave ships between 1 and {SHIPMENT_WAVE_LIMIT} orders"
+        )
+
+    query = select(models.Order.id, models.Order.status, models.Order.created_at)
+    if order_ids is not None:
+        order_ids = list(dict.fromkeys(order_ids))
+        orders = {row.id: row for row in db.execute(query.where(models.Order.id.in_(order_ids)))}
+    else:
+        orders = {
+            row.id: row for row in db.execute(
+                query.where(models.Order.status == models.OrderStatusEnum.APPROVED).order_by(models.Order.id).limit(limit)
+            )
+        }
+        order_ids = list(orders)
+
+    results, accepted = {}, []
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        detail = None
+        if not order:
+            detail = "Order not found"
+        elif order.status == models.OrderStatusEnum.SHIPPED:
+            detail = "Order has already been shipped"
+        elif order.status != models.OrderStatusEnum.APPROVED:
+            detail = "Order must be approved to ship"
+
+        if detail:
+            results[order_id] = {"order_id": order_id, "status": "rejected", "detail": detail}
+        else:
+            accepted.append(order)
+
+    if accepted:
+        now = datetime.utcnow()
+        estimated_delivery_date = now + ESTIMATED_DELIVERY
+        accepted_ids = [order.id for order in accepted]
+
+        # Guarded by the status, so a wave racing this one for the same orders cannot ship them twice
+        flipped = db.execute(
+            update(models.Order)
+            .where(models.Order.id.in_(accepted_ids), models.Order.status == models.OrderStatusEnum.APPROVED)
+            .values(status=models.OrderStatusEnum.SHIPPED)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if flipped != len(accepted_ids):
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Some of these orders changed status while the wave was being created; retry the wave"
+            )
+
+        shipment_rows = [
+            {
+                "order_id": order_id, "tracking_number": str(uuid4()), "status": models.ShipmentStatusEnum.PENDING,
+                "estimated_delivery_date": estimated_delivery_date, "updated_at": now, "next_check_at": now
+            }
+            for order_id in accepted_ids
+        ]
+        db.execute(insert(models.Shipment), shipment_rows)
+        db.execute(insert(models.OrderHistory), [
+            {"order_id": order_id, "status": models.OrderStatusEnum.SHIPPED, "changed_at": now} for order_id in accepted_ids
+        ])
+
+        shipped_per_day = {}
+        for order in accepted:
+            day = order.created_at.date()
+            shipped_per_day[day] = shipped_per_day.get(day, 0) + 1
+        aggregate_service.increment_daily_rollups(db, {
+            day: {
+                aggregate_service.status_column(models.OrderStatusEnum.APPROVED): -count,
+                aggregate_service.status_column(models.OrderStatusEnum.SHIPPED): count
+            }
+            for day, count in shipped_per_day.items()
+        })
+
+        invalidate(db, models.Order, *accepted_ids)
+        invalidate(db, models.Shipment, *accepted_ids, field="order_id")
+        db.commit()
+
+        for row in shipment_rows:
+            results[row["order_id"]] = {
+                "order_id": row["order_id"], "status": "shipped", "tracking_number": row["tracking_number"],
+                "estimated_delivery_date": estimated_delivery_date
+            }
+
+    return {
+        "shipped": len(accepted),
+        "rejected": len(order_ids) - len(accepted),
+        "results": [results[order_id] for order_id in order_ids]
+    }
+
+def get_shipment_snapshot(order_id: int, db: Session) -> dict:
+    order = cached(models.Order, order_id, lambda: db.query(models.Order).filter(models.Order.id == order_id).first())
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
     
-    shipment = db.query(models.Shipment).filter(models.Shipment.order_id == order_id).first()
+    shipment = cached(
+        models.Shipment, order_id,
+        lambda: db.query(models.Shipment).filter(models.Shipment.order_id == order_id).first(),
+        field="order_id"
+    )
     if not shipment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Tracking number not found for this order."
         )
 
-    return {"tracking_number": shipment.tracking_number, "status": shipment.status}
+    return shipment
+
+async def get_shipment_snapshot_async(order_id: int, db: AsyncSession) -> dict:
+    order = await cached_async(models.Order, order_id, lambda: db.scalar(select(models.Order).where(models.Order.id == order_id)))
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
+
+    shipment = await cached_async(
+        models.Shipment, order_id,
+        lambda: db.scalar(select(models.Shipment).where(models.Shipment.order_id == order_id).limit(1)),
+        field="order_id"
+    )
+    if not shipment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tracking number not found for this order."
+        )
+
+    return shipment
+
+def shipment_tracking(shipment: dict) -> dict:
+    return {"tracking_number": shipment["tracking_number"], "status": shipment["status"]}
+
+async def carrier_tracking(shipment: dict) -> dict:
+    if not shipment["tracking_number"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tracking number not found for this order."
+        )
+
+    # Cached and coalesced: a popular order page costs one carrier call per TTL, not one per refresh
+    carrier_status = await DHL_service.cached_tracking_status(tracking_number=shipment["tracking_number"])
+    return {**shipment_tracking(shipment), "carrier_status": carrier_status}
+
+def track_shipments(order_id: int, db: Session):
+    return shipment_tracking(get_shipment_snapshot(order_id=order_id, db=db))
+
+async def track_shipments_async(order_id: int, db: AsyncSession):
+    return shipment_tracking(await get_shipment_snapshot_async(order_id=order_id, db=db))
 
 def update_shipment(order_id: int, shipment_update: schemas.ShipmentUpdate, db: Session):
     order = db.query(models.Order).filter(models.Order.id == order_id).first()
@@ -102,6 +270,10 @@ def update_shipment(order_id: int, shipment_update: schemas.ShipmentUpdate, db:
     if shipment_update.estimated_delivery_date is not None:
         shipment.estimated_delivery_date=shipment_update.estimated_delivery_date
 
+    # A manual change takes effect for the poller right away: stop polling finished shipments, recheck the rest now
+    shipment.next_check_at = datetime.utcnow() if shipment.status in tracking_service.ACTIVE_STATUSES else None
+
+    invalidate(db, models.Shipment, order_id, field="order_id")
     db.commit()
 
     return {
@@ -0,0 +1,164 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, select, update
+from datetime import datetime, timedelta
+from typing import Optional
+from database import SessionLocal, run_in_thread
+from services import DHL_service
+from cache import invalidate
+import asyncio
+import logging
+import models
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRACKING_POLL_ENABLED = os.getenv("TRACKING_POLL_ENABLED", "false").lower() == "true"
+TRACKING_BATCH_SIZE = int(os.getenv("TRACKING_BATCH_SIZE", "200"))
+# Tracking calls in flight at once; DHL_RATE_LIMIT still caps calls per second
+TRACKING_CONCURRENCY = int(os.getenv("TRACKING_CONCURRENCY", str(DHL_service.DHL_MAX_CONNECTIONS)))
+# How long the worker sleeps when no shipment is due
+TRACKING_IDLE_INTERVAL = float(os.getenv("TRACKING_IDLE_INTERVAL", "30"))
+TRACKING_MIN_INTERVAL = timedelta(minutes=float(os.getenv("TRACKING_MIN_INTERVAL_MINUTES", "15")))
+TRACKING_MAX_INTERVAL = timedelta(minutes=float(os.getenv("TRACKING_MAX_INTERVAL_MINUTES", "720")))
+# A shipment is polled again after this fraction of the time left until its estimated delivery
+TRACKING_INTERVAL_FRACTION = float(os.getenv("TRACKING_INTERVAL_FRACTION", "0.1"))
+# A claimed shipment is skipped by other workers for this long, then polled again if never written back
+TRACKING_LEASE = timedelta(seconds=float(os.getenv("TRACKING_LEASE_SECONDS", "300")))
+
+ACTIVE_STATUSES = (models.ShipmentStatusEnum.PENDING, models.ShipmentStatusEnum.SHIPPED, models.ShipmentStatusEnum.IN_TRANSIT)
+# Carrier status text, matched in order, to our statuses
+CARRIER_STATUSES = (
+    ("deliver", models.ShipmentStatusEnum.DELIVERED),
+    ("return", models.ShipmentStatusEnum.RETURNED),
+    ("transit", models.ShipmentStatusEnum.IN_TRANSIT),
+    ("picked up", models.ShipmentStatusEnum.SHIPPED),
+    ("shipped", models.ShipmentStatusEnum.SHIPPED),
+)
+
+logger = logging.getLogger(__name__)
+
+
+def carrier_status(text: str) -> Optional[models.ShipmentStatusEnum]:
+    text = text.lower()
+    for fragment, shipment_status in CARRIER_STATUSES:
+        if fragment in text:
+            return shipment_status
+    return None
+
+def next_check(shipment_status: models.ShipmentStatusEnum, estimated_delivery_date: Optional[datetime], now: datetime) -> Optional[datetime]:
+    """When to poll next: rarely while delivery is far off, every TRACKING_MIN_INTERVAL close to or past it, never once done"""
+    if shipment_status not in ACTIVE_STATUSES:
+        return None
+    if estimated_delivery_date is None:
+        return now + TRACKING_MIN_INTERVAL
+
+    interval = (estimated_delivery_date - now) * TRACKING_INTERVAL_FRACTION
+    return now + min(TRACKING_MAX_INTERVAL, max(TRACKING_MIN_INTERVAL, interval))
+
+def claim_due_shipments(db: Session, batch_size: int = TRACKING_BATCH_SIZE, lease: timedelta = TRACKING_LEASE) -> list:
+    """Lease the next due shipments to this worker by pushing next_check_at past the lease.
+
+    Selection and claim are one UPDATE, so workers polling side by side never track the same
+    shipment twice in a round.
+    """
+    shipments = models.Shipment.__table__
+    now = datetime.utcnow()
+    due = (shipments.c.next_check_at <= now, shipments.c.tracking_number != None)
+    claimed = db.execute(
+        update(shipments)
+        .where(shipments.c.id.in_(select(shipments.c.id).where(*due).order_by(shipments.c.next_check_at).limit(batch_size)), *due)
+        .values(next_check_at=now + lease, updated_at=shipments.c.updated_at)
+        .returning(
+            shipments.c.id, shipments.c.order_id, shipments.c.tracking_number, shipments.c.status,
+            shipments.c.estimated_delivery_date, shipments.c.next_check_at
+        )
+    ).all()
+    db.commit()
+    return claimed
+
+def record_tracking_results(db: Session, due: list, results: list) -> int:
+    """Write back statuses and next checks; returns how many shipments were still as claimed"""
+    now = datetime.utcnow()
+    rescheduled, changed, changed_orders = [], [], []
+    for shipment, result in zip(due, results):
+        row = {"shipment_id": shipment.id, "claimed_status": shipment.status, "claimed_check": shipment.next_check_at}
+        if isinstance(result, Exception):
+            logger.warning("Tracking shipment %s failed: %s", shipment.tracking_number, getattr(result, "detail", result))
+            rescheduled.append({**row, "new_check": now + TRACKING_MIN_INTERVAL})
+            continue
+
+        # Readers asking for live status can reuse what the poller just fetched
+        DHL_service.tracking_cache.set(shipment.tracking_number, result)
+        new_status = carrier_status(result) or shipment.status
+        row["new_check"] = next_check(new_status, shipment.estimated_delivery_date, now)
+        if new_status != shipment.status:
+            changed.append({**row, "new_status": new_status})
+            changed_orders.append(shipment.order_id)
+        else:
+            rescheduled.append(row)
+
+    # Only rows still holding the status and lease we claimed them with are written: a manual
+    # update made while the carrier was being asked wins over the poller's answer
+    shipments = models.Shipment.__table__
+    claimed = (
+        shipments.c.id == bindparam("shipment_id"),
+        shipments.c.status == bindparam("claimed_status"),
+        shipments.c.next_check_at == bindparam("claimed_check")
+    )
+    written = 0
+    if rescheduled:
+        written += db.execute(
+            update(shipments).where(*claimed).values(next_check_at=bindparam("new_check"), updated_at=shipments.c.updated_at),
+            rescheduled
+        ).rowcount
+    if changed:
+        written += db.execute(
+            update(shipments).where(*claimed).values(status=bindparam("new_status"), next_check_at=bindparam("new_check"), updated_at=now),
+            changed
+        ).rowcount
+        invalidate(db, models.Shipment, *changed_orders, field="order_id")
+    db.commit()
+
+    return written
+
+async def refresh_tracking_batch(
+        db: Session,
+        client: Optional[DHL_service.DHLClient] = None,
+        batch_size: int = TRACKING_BATCH_SIZE,
+        concurrency: int = TRACKING_CONCURRENCY
+    ) -> int:
+    """Poll the carrier for the shipments that are due and write the results back; returns how many were polled"""
+    # Session work runs in a thread so a busy database never blocks the event loop
+    due = await run_in_thread(claim_due_shipments, db, batch_size)
+
+    if not due:
+        return 0
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def track(tracking_number: str) -> str:
+        async with semaphore:
+            return await DHL_service.track_dhl_shipment(tracking_number=tracking_number, client=client)
+
+    results = await asyncio.gather(*(track(shipment.tracking_number) for shipment in due), return_exceptions=True)
+
+    await run_in_thread(record_tracking_results, db, due, results)
+    return len(due)
+
+async def run_tracking_worker(
+        client: Optional[DHL_service.DHLClient] = None,
+        batch_size: int = TRACKING_BATCH_SIZE,
+        idle_interval: float = TRACKING_IDLE_INTERVAL
+    ):
+    while True:
+        try:
+            with SessionLocal() as db:
+                polled = await refresh_tracking_batch(db=db, client=client, batch_size=batch_size)
+        except Exception:
+            logger.exception("Tracking worker iteration failed")
+            polled = 0
+
+        # Keep paging while full batches are due, otherwise wait for the next ones
+        if polled < batch_size:
+            await asyncio.sleep(idle_interval)
@@ -1,10 +1,16 @@
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy import select, update
 from typing import List, Optional
+from pagination import paginate
+from cache import invalidate
 import models
 import schemas
 
 
+VENDORS_KEYSET = (models.Vendor.id,)
+
+
 def create_vendor(vendor: schemas.VendorCreate, db: Session) -> models.Vendor:
     db_vendor = db.query(models.Vendor).filter(
         models.Vendor.name == vendor.name,
@@ -32,9 +38,9 @@ def create_vendor(vendor: schemas.VendorCreate, db: Session) -> models.Vendor:
 
     return new_vendor
 
-def get_vendors(db: Session, skip: int = 0, limit: int = 10) -> List[models.Vendor]:
-    db_vendors = db.query(models.Vendor).offset(skip).limit(limit).all()
-    if not db_vendors:
+def get_vendors(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None) -> List[models.Vendor]:
+    db_vendors = paginate(db.query(models.Vendor), VENDORS_KEYSET, skip=skip, limit=limit, cursor=cursor).all()
+    if not db_vendors and cursor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Vendor Not found"
@@ -61,20 +67,32 @@ def update_vendor(vendor_id: int, vendor_update: schemas.VendorUpdate, db: Sessi
     if vendor_update.address is not None:
         db_vendor.address=vendor_update.address
 
+    invalidate(db, models.Vendor, vendor_id)
     db.commit()
     return db_vendor
 
-def delete_vendor(vendor_id: int, db: Session) -> None:
-    db_vendor = db.query(models.Vendor).filter(models.Vendor.id == vendor_id).first()
+def delete_vendors(vendor_ids: List[int], db: Session) -> dict:
+    """Soft delete vendors and detach their products with set-based UPDATEs in one transaction"""
+    deleted = db.scalars(select(models.Vendor.id).where(models.Vendor.id.in_(vendor_ids), models.Vendor.is_deleted.isnot(True))).all()
 
-    if db_vendor:
-        db_vendor.is_deleted = True
-
-        for vendor in db_vendor.products:
-            vendor.vendor_id = None
+    if deleted:
+        db.execute(
+            update(models.Vendor).where(models.Vendor.id.in_(deleted)).values(is_deleted=True)
+            .execution_options(synchronize_session=False)
+        )
+        product_ids = db.scalars(
+            update(models.Product).where(models.Product.vendor_id.in_(deleted)).values(vendor_id=None)
+            .returning(models.Product.id).execution_options(synchronize_session=False)
+        ).all()
 
+        invalidate(db, models.Product, *product_ids)
+        invalidate(db, models.Vendor, *deleted)
         db.commit()
 
+    return {"deleted": deleted, "not_found": sorted(set(vendor_ids) - set(deleted))}
+
+def delete_vendor(vendor_id: int, db: Session) -> None:
+    if delete_vendors([vendor_id], db)["deleted"]:
         return {"message": "Vendor marked as deleted and products updated"}
     
     else: